@@ -0,0 +1,515 @@
+# Benchmarks de la botonera sense targeta de so ni teclat real.
+#
+#   python benchmark.py --sortida resultats.json
+#   python benchmark.py --rapid --comparar resultats_anteriors.json
+#
+# Fa servir el controlador d'àudio "dummy" de SDL i un sounddevice fals que crida els
+# callbacks des d'un fil al ritme del temps real (o més de pressa). La graella necessita
+# Tk: en una màquina sense pantalla, executa-ho amb `xvfb-run python benchmark.py`.
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import types
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import numpy as np
+import soundfile as sf
+
+import botonera
+
+VERSIO_RESULTATS = 1
+FORMATS_DESCODIFICACIO = ("wav", "flac", "ogg", "mp3", "npy")
+MIDES_PERFIL = (24, 500, 5000)
+PROVES = ("disparament", "descodificacio", "graella", "perfil", "enregistrament", "captura", "escaleta")
+
+
+# --- Dispositius falsos ---
+class _EstatFals:
+    input_overflow = False
+    output_underflow = False
+
+
+class FluxFals:
+    """Substitut de sd.InputStream / sd.OutputStream: un fil crida el callback a `factor` vegades el temps real."""
+
+    factor = 1.0
+
+    def __init__(self, samplerate: int = botonera.SAMPLERATE, channels: int = 1, dtype: str = botonera.DTYPE,
+                 blocksize: int = botonera.FRAMES_PER_BUFFER, callback=None, **_opcions):
+        self.samplerate = samplerate
+        self.channels = channels
+        self.dtype = dtype
+        self.blocksize = blocksize or botonera.FRAMES_PER_BUFFER
+        self.callback = callback
+        self._actiu = False
+        self._fil: Optional[threading.Thread] = None
+
+    def start(self):
+        self._actiu = True
+        self._fil = threading.Thread(target=self._bucle, name="flux-fals", daemon=True)
+        self._fil.start()
+
+    def stop(self):
+        self._actiu = False
+        if self._fil is not None and self._fil is not threading.current_thread():
+            self._fil.join()
+
+    abort = stop
+
+    def close(self):
+        pass
+
+    def _bucle(self):
+        periode = self.blocksize / self.samplerate / self.factor
+        bloc = np.zeros((self.blocksize, self.channels), dtype=self.dtype)
+        propera = time.perf_counter()
+        while self._actiu:
+            self._cridar(bloc)
+            propera += periode
+            espera = propera - time.perf_counter()
+            if espera > 0:
+                time.sleep(espera)
+
+
+class InputStreamFals(FluxFals):
+    def _cridar(self, bloc: np.ndarray):
+        bloc[:] = 0.25  # el contingut no importa: només es mesura el camí fins al disc
+        self.callback(bloc, self.blocksize, None, _EstatFals())
+
+
+class OutputStreamFals(FluxFals):
+    def _cridar(self, bloc: np.ndarray):
+        self.callback(bloc, self.blocksize, None, _EstatFals())
+
+
+def posar_dispositius_falsos():
+    """Substitueix sounddevice i keyboard dins de botonera (els dos són mòduls mandrosos)."""
+    botonera.sd = types.SimpleNamespace(InputStream=InputStreamFals, OutputStream=OutputStreamFals,
+                                        CallbackStop=Exception)
+    botonera.keyboard = types.SimpleNamespace(
+        add_hotkey=lambda combinacio, callback, **_: (combinacio, callback),
+        remove_hotkey=lambda handle: None,
+        on_press=lambda callback, **_: callback,
+        unhook=lambda handle: None,
+        is_pressed=lambda tecla: False,
+    )
+
+
+# --- Utilitats ---
+def estadistiques(mostres_ms: List[float]) -> Dict[str, Any]:
+    if not mostres_ms:
+        return {"n": 0}
+    valors = np.asarray(mostres_ms, dtype=np.float64)
+    return {
+        "n": len(valors),
+        "mitjana_ms": round(float(valors.mean()), 4),
+        "p50_ms": round(float(np.percentile(valors, 50)), 4),
+        "p95_ms": round(float(np.percentile(valors, 95)), 4),
+        "p99_ms": round(float(np.percentile(valors, 99)), 4),
+        "max_ms": round(float(valors.max()), 4),
+    }
+
+
+def cronometrar(funcio, repeticions: int) -> Dict[str, Any]:
+    temps = []
+    for _ in range(repeticions):
+        t0 = time.perf_counter()
+        funcio()
+        temps.append((time.perf_counter() - t0) * 1000.0)
+    return estadistiques(temps)
+
+
+def escriure_to(cami: Path, segons: float, frequencia: int = 44100, canals: int = 2):
+    t = np.arange(int(segons * frequencia)) / frequencia
+    senyal = (0.3 * np.sin(2 * np.pi * 440 * t)).astype(np.float32)
+    sf.write(str(cami), np.repeat(senyal[:, None], canals, axis=1), frequencia)
+
+
+def configs_de_prova(n: int, arxiu: Optional[str] = None) -> List[botonera.ButtonConfig]:
+    configs = []
+    for i in range(n):
+        configs.append(botonera.ButtonConfig(
+            id=i, nom=f"So {i}", emoji=botonera.LLISTA_EMOJIS[i % len(botonera.LLISTA_EMOJIS)],
+            arxiu=arxiu or f"enregistraments/so_{i}.wav", tecla_assignada=f"f{i % 12 + 1}" if i < 12 else None,
+            pagina=i // botonera.MIDA_PAGINA))
+    return configs
+
+
+class AppMinima:
+    """El que DespatxadorAudio necessita de BotoneraApp, sense Tk."""
+
+    def __init__(self, configs: List[botonera.ButtonConfig], carpeta: Path):
+        self.finestra = None
+        self.cache_mostres = botonera.CacheMostres(botonera.MEMORIA_CACHE_MB * 1024 * 1024)
+        self.index_loudness = botonera.IndexLoudness(carpeta / "loudness.json")
+        self._configs = {c.id: c for c in configs}
+
+    def _executar_a_ui(self, funcio):
+        pass  # no hi ha interfície: els avisos i els canvis d'estat es descarten
+
+    def _config_per_id(self, id_boto: int) -> Optional[botonera.ButtonConfig]:
+        return self._configs.get(id_boto)
+
+    def get_volum_actual(self) -> float:
+        return 0.8
+
+
+def iniciar_despatxador(app: AppMinima, cfg: botonera.ConfiguracioMixer) -> botonera.DespatxadorAudio:
+    despatxador = botonera.DespatxadorAudio(app, botonera.SortidaPygame(cfg))
+    llest = threading.Event()
+    despatxador.executar(lambda: (despatxador.reiniciar_sortida(cfg), llest.set()))
+    llest.wait(10)
+    return despatxador
+
+
+# --- Proves ---
+def prova_disparament(carpeta: Path, repeticions: int) -> Dict[str, Any]:
+    """Des de la crida que fa la tecla global (despatxador.disparar) fins que la sortida ja reprodueix el so."""
+    cami = carpeta / "tret.wav"
+    escriure_to(cami, 0.2)
+    resultats: Dict[str, Any] = {}
+    for motor in botonera.MOTORS_AUDIO:
+        cfg = botonera.ConfiguracioMixer(motor=motor)
+        configs = [botonera.ButtonConfig(id=0, arxiu=str(cami), mode="polifonic", max_veus=4)]
+        app = AppMinima(configs, carpeta)
+        despatxador = iniciar_despatxador(app, cfg)
+        if not botonera.MIXER_OK:
+            resultats[motor] = {"omes": "no s'ha pogut iniciar la sortida d'àudio"}
+            despatxador.tancar()
+            continue
+
+        sortida = despatxador.sortida
+        reproduir = sortida.reproduir
+        sonant = threading.Event()
+
+        def reproduir_cronometrat(*args, **kwargs):
+            veu = reproduir(*args, **kwargs)
+            sonant.set()
+            return veu
+
+        sortida.reproduir = reproduir_cronometrat
+
+        def disparar() -> float:
+            sonant.clear()
+            t0 = time.perf_counter()
+            despatxador.disparar(0)
+            sonant.wait(5)
+            return (time.perf_counter() - t0) * 1000.0
+
+        fred = disparar()  # el primer tret descodifica l'arxiu
+        temps = []
+        for _ in range(repeticions):
+            temps.append(disparar())
+            time.sleep(0.002)
+        resultats[motor] = {"fred_ms": round(fred, 4), "calent": estadistiques(temps),
+                            "latencia_buffer_ms": round(cfg.buffer / cfg.frequencia * 1000.0, 2)}
+        despatxador.tancar()
+    return resultats
+
+
+def prova_descodificacio(carpeta: Path, repeticions: int) -> Dict[str, Any]:
+    """Temps de descodificar 10 s d'àudio estèreo amb cada sortida, per format d'arxiu."""
+    arxius: Dict[str, Path] = {}
+    omesos: Dict[str, str] = {}
+    origen = carpeta / "origen.wav"
+    escriure_to(origen, 10.0)
+    for fmt in FORMATS_DESCODIFICACIO:
+        if fmt == "npy":
+            cami = carpeta / "mostra@44100.npy"  # el format dels paquets
+            np.save(cami, botonera.pcm_int16(botonera.llegir_pcm(origen, 44100)))
+        else:
+            cami = carpeta / f"mostra.{fmt}"
+            try:
+                dades, sr = sf.read(str(origen), dtype="float32")
+                sf.write(str(cami), dades, sr)
+            except Exception as e:
+                omesos[fmt] = f"soundfile no pot escriure {fmt}: {e}"
+                continue
+        arxius[fmt] = cami
+
+    resultats: Dict[str, Any] = {}
+    for motor in botonera.MOTORS_AUDIO:
+        app = AppMinima([], carpeta)
+        despatxador = iniciar_despatxador(app, botonera.ConfiguracioMixer(motor=motor))
+        sortida = despatxador.sortida
+        per_format: Dict[str, Any] = {fmt: {"omes": motiu} for fmt, motiu in omesos.items()}
+        for fmt, cami in arxius.items():
+            try:
+                per_format[fmt] = cronometrar(lambda: sortida.descodificar(cami), repeticions)
+            except Exception as e:
+                per_format[fmt] = {"omes": f"{type(e).__name__}: {e}"}
+        resultats[motor] = per_format
+        despatxador.tancar()
+    return resultats
+
+
+def prova_graella(carpeta: Path, repeticions: int) -> Dict[str, Any]:
+    """Temps de regenerar_graella en passar del format per defecte a cadascun dels formats."""
+    try:
+        arrel = botonera.tk.Tk()
+    except botonera.tk.TclError as e:
+        return {"omes": f"Tk no disponible ({e}); executa-ho amb xvfb-run"}
+    cami = carpeta / "tret.wav"
+    escriure_to(cami, 0.2)
+    try:
+        arrel.withdraw()
+        app = botonera.BotoneraApp(arrel)
+        app.totes_les_configuracions = configs_de_prova(2 * botonera.MIDA_PAGINA, str(cami))
+        app.indexar_configuracions()
+        defecte = app.formats_graella[botonera.FORMAT_PER_DEFECTE]
+        resultats: Dict[str, Any] = {}
+        for nom, format_tuple in app.formats_graella.items():
+            temps = []
+            for _ in range(repeticions):
+                app.regenerar_graella(defecte)
+                t0 = time.perf_counter()
+                app.regenerar_graella(format_tuple)
+                temps.append((time.perf_counter() - t0) * 1000.0)
+            resultats[nom] = estadistiques(temps)
+        resultats["canvi_de_pagina"] = cronometrar(lambda: app.anar_a_pagina(1 - app.pagina_actual), repeticions)
+        app.en_tancar()
+    finally:
+        try:
+            arrel.destroy()
+        except botonera.tk.TclError:
+            pass
+    return resultats
+
+
+def prova_perfil(carpeta: Path, repeticions: int) -> Dict[str, Any]:
+    """Desar i carregar perfils en JSON i en format compacte, amb les mateixes funcions que BotoneraApp."""
+    resultats: Dict[str, Any] = {"json": {}, "compacte": {}}
+    for n in MIDES_PERFIL:
+        configs = configs_de_prova(n)
+        dades = botonera.dades_perfil(botonera.FORMAT_PER_DEFECTE, botonera.MEMORIA_CACHE_MB,
+                                      botonera.ConfiguracioMixer(), 0, n)
+
+        for nom, extensio in (("json", ".json"), ("compacte", botonera.EXTENSIO_COMPACTA)):
+            cami = carpeta / f"perfil_{n}{extensio}"
+
+            def desar():
+                botonera.escriure_perfil(cami, dades, configs)
+
+            def carregar():
+                # Com BotoneraApp.obrir_perfil: del compacte, la capçalera i només la pàgina visible
+                _dades, llegides, lector = botonera.llegir_perfil(cami)
+                return lector.llegir_pagina(0) if lector is not None else llegides
+
+            fila = {"desar": cronometrar(desar, repeticions), "carregar": cronometrar(carregar, repeticions)}
+            fila["mida_bytes"] = cami.stat().st_size
+            resultats[nom][str(n)] = fila
+    return resultats
+
+
+def prova_enregistrament(carpeta: Path, segons: float) -> Dict[str, Any]:
+    """Enregistrament sostingut: a temps real i tan de pressa com el fil escriptor ho aguanti."""
+    resultats: Dict[str, Any] = {}
+    for nom, factor, durada in (("temps_real", 1.0, segons), ("accelerat_x50", 50.0, segons)):
+        FluxFals.factor = factor
+        enregistrador = botonera.EnregistradorStreaming(carpeta / f"enregistrament_{nom}.wav")
+        acabat = threading.Event()
+        t0 = time.perf_counter()
+        enregistrador.iniciar_captura()
+        time.sleep(durada)
+        enregistrador.aturar(acabat.set)
+        acabat.wait(30)
+        temps = time.perf_counter() - t0
+        resultats[nom] = {
+            "segons": round(temps, 3),
+            "frames_escrits": enregistrador.frames_escrits,
+            "frames_perduts": enregistrador.frames_perduts,
+            "frames_per_segon": round(enregistrador.frames_escrits / temps, 1),
+            "vegades_temps_real": round(enregistrador.frames_escrits / temps / botonera.SAMPLERATE, 2),
+            "error": str(enregistrador.error) if enregistrador.error else None,
+        }
+    FluxFals.factor = 1.0
+    return resultats
+
+
+def prova_captura(segons: float, factor: float = 500.0) -> Dict[str, Any]:
+    """Captura contínua accelerada: cost del callback i memòria al cap de moltes hores simulades."""
+    temps = np.zeros(1 << 16)  # preassignat (circular): així la memòria mesurada és només la de la captura
+    crides = [0]
+
+    class CapturaMesurada(botonera.CapturaContinua):
+        def _callback(self, indata, frames, time_info, status):
+            t0 = time.perf_counter()
+            super()._callback(indata, frames, time_info, status)
+            temps[crides[0] % len(temps)] = (time.perf_counter() - t0) * 1000.0
+            crides[0] += 1
+
+    FluxFals.factor = factor
+    captura = CapturaMesurada()
+    tracemalloc.start()
+    captura.iniciar()
+    time.sleep(min(1.0, segons / 4))
+    abans = tracemalloc.get_traced_memory()[0]
+    time.sleep(segons)
+    despres = tracemalloc.get_traced_memory()[0]
+    t0 = time.perf_counter()
+    ultims = captura.ultims(30)
+    temps_ultims = (time.perf_counter() - t0) * 1000.0
+    captura.aturar()
+    tracemalloc.stop()
+    FluxFals.factor = 1.0
+    return {
+        "hores_simulades": round(captura._escrit / botonera.SAMPLERATE / 3600, 2),
+        "callback": estadistiques(temps[:min(crides[0], len(temps))].tolist()),
+        "buffer_mb": round(captura._dades.nbytes / 1e6, 1),
+        "creixement_memoria_kb": round((despres - abans) / 1024, 1),
+        "ultims_30s_ms": round(temps_ultims, 3),
+        "frames_ultims_30s": len(ultims),
+    }
+
+
+def escriure_escaleta(cami: Path, minuts: float, llit: str, efectes: List[str]):
+    """Escaleta sintètica: un llit musical que es torna a disparar amb foses, un efecte cada 7 s i canvis de volum."""
+    linies = [json.dumps({"versio": botonera.VERSIO_ESCALETA, "inici": datetime.now().isoformat(), "volum": 0.8})]
+    linies += [json.dumps(["a", i, arxiu]) for i, arxiu in enumerate([llit] + efectes)]
+    veu = veu_llit = 0
+    for t in range(0, int(minuts * 60_000), 7_000):
+        if t % 140_000 == 0:
+            if veu_llit:
+                linies.append(json.dumps([t, "-", veu_llit, 2000]))
+            veu += 1
+            veu_llit = veu
+            linies.append(json.dumps([t, "+", veu, 0, 0, 0.5, 1, 1500]))
+        veu += 1
+        linies.append(json.dumps([t + 500, "+", veu, 1 + veu % len(efectes), 1, 1.0, 0, 0]))
+        if t % 60_000 == 0:
+            linies.append(json.dumps([t + 800, "v", 0.6 + 0.2 * (t // 60_000 % 2)]))
+    linies.append(json.dumps([int(minuts * 60_000), "x"]))
+    cami.write_text("\n".join(linies) + "\n", encoding="utf-8")
+
+
+def prova_escaleta(carpeta: Path, minuts: float) -> Dict[str, Any]:
+    """Renderitzar un show sencer des de l'escaleta: vegades més ràpid que el temps real."""
+    llit = carpeta / "llit.wav"
+    escriure_to(llit, 240.0)  # prou llarg perquè es llegeixi mapat des del magatzem PCM
+    efectes = []
+    for i in range(8):
+        escriure_to(carpeta / f"efecte_{i}.wav", 1.0 + i * 0.5)
+        efectes.append(str(carpeta / f"efecte_{i}.wav"))
+    escaleta = carpeta / f"show{botonera.EXTENSIO_ESCALETA}"
+    escriure_escaleta(escaleta, minuts, str(llit), efectes)
+    botonera.MAGATZEM_PCM.obtenir(llit, botonera.SAMPLERATE, "float32")  # la conversió no compta: es fa un sol cop
+    t0 = time.perf_counter()
+    resultat = botonera.renderitzar_escaleta(escaleta, carpeta / "show.wav")
+    temps = time.perf_counter() - t0
+    return {
+        "minuts_show": minuts,
+        "render_ms": round(temps * 1000.0, 1),
+        "vegades_temps_real": round(resultat["durada_s"] / temps, 1),
+        "mida_wav_mb": round((carpeta / "show.wav").stat().st_size / 1e6, 1),
+    }
+
+
+# --- Comparació entre versions ---
+def valors_ms(dades: Any, prefix: str = "") -> Dict[str, float]:
+    """Aplana els resultats a {"disparament.pygame.calent.p95_ms": 0.3, ...}."""
+    valors: Dict[str, float] = {}
+    if isinstance(dades, dict):
+        for clau, valor in dades.items():
+            valors.update(valors_ms(valor, f"{prefix}.{clau}" if prefix else clau))
+    elif isinstance(dades, (int, float)) and prefix.endswith("_ms"):
+        valors[prefix] = float(dades)
+    return valors
+
+
+def comparar(actuals: Dict[str, Any], anteriors: Dict[str, Any], llindar: float) -> List[str]:
+    """Retorna les mètriques que han empitjorat més d'un `llindar` (fracció) respecte de la versió anterior."""
+    nous, vells = valors_ms(actuals["resultats"]), valors_ms(anteriors["resultats"])
+    regressions = []
+    for clau in sorted(nous.keys() & vells.keys()):
+        abans, ara = vells[clau], nous[clau]
+        if abans > 0 and (ara - abans) / abans > llindar:
+            regressions.append(f"{clau}: {abans:.3f} -> {ara:.3f} ms (+{(ara - abans) / abans:.0%})")
+    return regressions
+
+
+def versio_git() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], cwd=botonera.SCRIPT_DIR,
+                              capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+# --- Main ---
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks de la botonera sense targeta de so.")
+    parser.add_argument("--sortida", type=Path, help="arxiu JSON on desar els resultats (per defecte, la sortida estàndard)")
+    parser.add_argument("--proves", nargs="+", choices=PROVES, default=list(PROVES))
+    parser.add_argument("--rapid", action="store_true", help="menys repeticions, p. ex. per a integració contínua")
+    parser.add_argument("--comparar", type=Path, help="resultats d'una versió anterior amb què comparar")
+    parser.add_argument("--llindar", type=float, default=0.2, help="empitjorament relatiu que compta com a regressió")
+    args = parser.parse_args(argv)
+
+    logging.getLogger().setLevel(logging.WARNING)
+    posar_dispositius_falsos()
+    repeticions = 20 if args.rapid else 200
+    resultats: Dict[str, Any] = {}
+    with tempfile.TemporaryDirectory(prefix="botonera-benchmark-") as temporal:
+        carpeta = Path(temporal)
+        botonera.MAGATZEM_PCM = botonera.MagatzemPCM(carpeta / "pcm")
+        botonera.ESCALETES_DIR = carpeta / "escaletes"
+        for prova in args.proves:
+            t0 = time.perf_counter()
+            if prova == "disparament":
+                resultats[prova] = prova_disparament(carpeta, repeticions)
+            elif prova == "descodificacio":
+                resultats[prova] = prova_descodificacio(carpeta, max(3, repeticions // 20))
+            elif prova == "graella":
+                resultats[prova] = prova_graella(carpeta, max(3, repeticions // 20))
+            elif prova == "perfil":
+                resultats[prova] = prova_perfil(carpeta, max(3, repeticions // 20))
+            elif prova == "enregistrament":
+                resultats[prova] = prova_enregistrament(carpeta, 2.0 if args.rapid else 10.0)
+            elif prova == "captura":
+                resultats[prova] = prova_captura(2.0 if args.rapid else 15.0)
+            elif prova == "escaleta":
+                resultats[prova] = prova_escaleta(carpeta, 10.0 if args.rapid else 120.0)
+            print(f"{prova}: {time.perf_counter() - t0:.1f} s", file=sys.stderr)
+
+    informe = {
+        "versio_resultats": VERSIO_RESULTATS,
+        "data": datetime.now().isoformat(timespec="seconds"),
+        "git": versio_git(),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "numpy": np.__version__,
+        "pygame": botonera.pygame.version.ver,
+        "resultats": resultats,
+    }
+    text = json.dumps(informe, indent=2, ensure_ascii=False)
+    if args.sortida:
+        args.sortida.write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+
+    if args.comparar:
+        with open(args.comparar, "r", encoding="utf-8") as f:
+            regressions = comparar(informe, json.load(f), args.llindar)
+        for linia in regressions:
+            print("Regressió:", linia, file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
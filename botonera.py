@@ -3,94 +3,2525 @@
 
 from __future__ import annotations
 
+import argparse
+import asyncio
+import hashlib
+import hmac
+import importlib
 import json
 import logging
+import logging.handlers
+import math
 import os
+import queue
+import struct
 import threading
+import time
+
+T_INICI = time.perf_counter()  # referència de l'informe d'arrencada
+
+import unicodedata
+import urllib.parse
+import zipfile
+import zlib
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass, asdict
 from datetime import datetime
 from pathlib import Path
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
+
+import tkinter as tk
+from tkinter import filedialog, messagebox, ttk, Toplevel, Label
+
+# --- Config i logging ---
+logging.basicConfig(level=logging.INFO)
+LOG = logging.getLogger("Botonera")
+
+
+# --- Imports mandrosos i fases d'arrencada ---
+class ModulMandros:
+    """
+    Ocupa el lloc d'un mòdul pesant i només l'importa el primer cop que se'n fa servir un atribut.
+
+    En importar-lo, el nom global (p. ex. `np`) passa a apuntar al mòdul real, de manera que
+    només el primer accés paga el __getattr__.
+    """
+
+    def __init__(self, nom: str, alies: str):
+        self._nom = nom
+        self._alies = alies
+
+    def __getattr__(self, atribut: str):
+        return getattr(self.carregar(), atribut)
+
+    def carregar(self):
+        t0 = time.perf_counter()
+        modul = importlib.import_module(self._nom)
+        if globals().get(self._alies) is self:
+            globals()[self._alies] = modul
+            LOG.info("Mòdul %s importat (%.0f ms)", self._nom, (time.perf_counter() - t0) * 1000.0)
+        return modul
+
+
+def carregar_modul(modul):
+    """Importa ja un mòdul mandrós, p. ex. des d'un fil de fons; si ja és el mòdul real, el retorna."""
+    return modul.carregar() if isinstance(modul, ModulMandros) else modul
+
+
+pygame = ModulMandros("pygame", "pygame")
+keyboard = ModulMandros("keyboard", "keyboard")  # Nota: pip install keyboard (pot requerir privilegis)
+np = ModulMandros("numpy", "np")
+sd = ModulMandros("sounddevice", "sd")
+sf = ModulMandros("soundfile", "sf")
+
+FASES_ARRENCADA = ("moduls", "finestra", "mixer", "tecles")
+TEMPS_ARRENCADA: Dict[str, float] = {}  # fase -> ms des de T_INICI
+
+
+def marcar_fase(fase: str):
+    TEMPS_ARRENCADA[fase] = (time.perf_counter() - T_INICI) * 1000.0
+
+
+def informe_arrencada() -> str:
+    """Una línia amb l'instant en què ha acabat cada fase, p. ex. per al registre."""
+    return ", ".join(f"{fase} {TEMPS_ARRENCADA[fase]:.0f} ms" for fase in FASES_ARRENCADA if fase in TEMPS_ARRENCADA)
+
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+PERFILS_DIR = SCRIPT_DIR / "perfils"  # <-- NOU: Directori per perfils
+
+# --- Pygame mixer: configuració i inicialització amb maneig d'errors ---
+FREQUENCIES_MIXER = [22050, 44100, 48000]
+BUFFERS_MIXER = [128, 256, 512, 1024, 2048, 4096]
+FOSA_PANIC_MS = 1500  # fade-out de "Fos tot"
+CANALS_MAXIMS = 256  # límit quan el mixer creix per falta de canals lliures
+MODES_REPRODUCCIO = {
+    "commutar": "Commutar (una vegada; tornar a prémer atura)",
+    "redisparar": "Redisparar (torna a començar)",
+    "polifonic": "Polifònic (sons superposats)",
+    "bucle": "Bucle (fins que es torna a prémer)",
+}
+MOTORS_AUDIO = {
+    "pygame": "pygame.mixer (canals)",
+    "numpy": "Motor propi (bus master i limitador)",
+}
+
+
+@dataclass
+class ConfiguracioMixer:
+    frequencia: int = 44100
+    buffer: int = 512  # frames per buffer de sortida: com més petit, menys latència
+    canals: int = 32  # sons simultanis
+    motor: str = "pygame"  # clau de MOTORS_AUDIO
+    llindar_flux_mb: int = 32  # els sons que descodificats ocupen més es llegeixen per trossos
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, dades: Dict[str, Any]) -> "ConfiguracioMixer":
+        # Cada camp es converteix al tipus del seu valor per defecte
+        cfg = cls(**{k: type(getattr(cls, k))(v) for k, v in dades.items() if k in cls.__dataclass_fields__})
+        if cfg.motor not in MOTORS_AUDIO:
+            cfg.motor = "pygame"
+        return cfg
+
+
+MIXER_OK = False
+
+
+def iniciar_mixer(cfg: ConfiguracioMixer) -> bool:
+    """(Re)inicia pygame.mixer amb la configuració donada i actualitza MIXER_OK."""
+    global MIXER_OK
+    try:
+        if pygame.mixer.get_init():
+            pygame.mixer.quit()
+        pygame.mixer.init(frequency=cfg.frequencia, size=-16, channels=2, buffer=cfg.buffer)
+        pygame.mixer.set_num_channels(cfg.canals)
+        MIXER_OK = True
+        LOG.info("pygame.mixer inicialitzat correctament (%d Hz, buffer %d, %d canals).",
+                 cfg.frequencia, cfg.buffer, cfg.canals)
+    except Exception as e:
+        LOG.exception("No s'ha pogut iniciar pygame.mixer: %s", e)
+        MIXER_OK = False
+    return MIXER_OK
+
+
+def aturar_mixer():
+    global MIXER_OK
+    MIXER_OK = False
+    try:
+        pygame.mixer.quit()
+    except Exception:
+        LOG.debug("Error tancant mixer", exc_info=True)
+
+
+def trobar_canal_lliure() -> pygame.mixer.Channel:
+    """
+    Retorna un canal lliure sense mostrar mai cap error.
+
+    Si no n'hi ha, primer s'amplia el nombre de canals fins a CANALS_MAXIMS i, com a
+    últim recurs, es reaprofita el canal que fa més estona que sona.
+    """
+    chan = pygame.mixer.find_channel()
+    if chan is not None:
+        return chan
+    actuals = pygame.mixer.get_num_channels()
+    if actuals < CANALS_MAXIMS:
+        pygame.mixer.set_num_channels(min(actuals * 2, CANALS_MAXIMS))
+        LOG.info("Canals de so ampliats de %d a %d.", actuals, pygame.mixer.get_num_channels())
+        chan = pygame.mixer.find_channel()
+        if chan is not None:
+            return chan
+    LOG.warning("No hi ha canals lliures: es reaprofita el canal més antic.")
+    return pygame.mixer.find_channel(True)
+
+
+def provar_latencia_mixer(frequencia: int, buffers: List[int], segons: float = 1.5, veus: int = 8) -> List[Dict[str, Any]]:
+    """
+    Fa funcionar, per a cada mida de buffer, el motor de mescla propi amb `veus` veus en
+    silenci durant `segons`, i compta els underruns que avisa PortAudio i el retard màxim
+    entre callbacks.
+
+    Es considera estable el buffer sense cap underrun i en què cap callback no ha arribat
+    amb més d'un buffer de retard. També es retorna la latència de sortida que informa el
+    dispositiu. Amb el motor de pygame la prova és orientativa: SDL no avisa dels underruns.
+    Qui la cridi ha de tenir la sortida tancada i restaurar-la després.
+    """
+    resultats: List[Dict[str, Any]] = []
+    for buf in buffers:
+        fila: Dict[str, Any] = {"buffer": buf, "latencia_buffer_ms": 1000.0 * buf / frequencia}
+        cfg = ConfiguracioMixer(frequencia=frequencia, buffer=buf, canals=veus, motor="numpy")
+        motor = MotorMescla(cfg)
+        try:
+            if not motor.iniciar(cfg):
+                raise RuntimeError("no s'ha pogut obrir la sortida d'àudio")
+            silenci = np.zeros((frequencia, 2), dtype=np.float32)
+            for _ in range(veus):
+                motor.reproduir(silenci, 1.0, 1.0, bucle=True)
+            time.sleep(segons)
+            fila.update(ok=True, latencia_sortida_ms=1000.0 * motor.latencia_sortida, underruns=motor.underruns,
+                        interval_maxim_ms=1000.0 * motor.interval_maxim,
+                        estable=motor.underruns == 0 and motor.interval_maxim < 2 * buf / frequencia)
+        except Exception as e:
+            LOG.warning("Prova de latència fallida amb buffer %d: %s", buf, e)
+            fila.update(ok=False, estable=False, error=str(e))
+        finally:
+            motor.tancar()
+        resultats.append(fila)
+    return resultats
+
+
+# --- Constants d'enregistrament ---
+SAMPLERATE = 44100
+CHANNELS = 1
+DTYPE = "float32"
+FRAMES_PER_BUFFER = 1024
+SEGONS_BUFFER_ENREGISTRAMENT = 10  # marge del buffer circular si el disc va lent
+
+INTERVAL_VUMETRE_MS = 33  # ~30 fps, el ritme de refresc de la pantalla que té sentit
+INTERVAL_CUA_UI_MS = 50  # només amb Tcl sense fils, on cal sondejar la cua de tasques d'altres fils
+DB_MINIM_VUMETRE = -60.0
+
+# --- Pàgines de botons ---
+MIDA_PAGINA = 48  # botons per pàgina; el format de la graella en mostra els primers
+FORMAT_PER_DEFECTE = "6x4 (24 botons)"
+
+# --- Memòria cau de mostres ---
+MEMORIA_CACHE_MB = 256  # pressupost per defecte dels sons descodificats
+FILS_PRECARREGA = min(4, os.cpu_count() or 1)
+
+# --- Normalització de loudness ---
+ARXIU_INDEX_LOUDNESS = SCRIPT_DIR / "loudness.json"
+OBJECTIU_LUFS = -16.0  # loudness integrada a la qual es porten els sons normalitzats
+SOSTRE_PIC_DBFS = -1.0  # la normalització mai no puja el pic per sobre d'aquest nivell
+
+# --- Colors i paleta ---
+COLOR_BLAU = "#3c8dbc"
+COLOR_VERD = "#00a65a"
+COLOR_VERMELL = "#dd4b39"
+COLOR_TARONJA = "#f39c12"
+COLOR_LILA = "#605ca8"
+COLOR_TURQUESA = "#00c0ef"
+COLOR_GROC = "#f0db2e"
+COLOR_GRIS = "#555"
+COLOR_ROSA = "#d81b60"
+COLOR_BUIT = "#3c3c3c"
+COLOR_REPRODUINT = "#777"
+
+PALETA_COLORS_DICT = {
+    "Blau": COLOR_BLAU,
+    "Verd": COLOR_VERD,
+    "Vermell": COLOR_VERMELL,
+    "Taronja": COLOR_TARONJA,
+    "Lila": COLOR_LILA,
+    "Turquesa": COLOR_TURQUESA,
+    "Groc": COLOR_GROC,
+    "Gris": COLOR_GRIS,
+    "Rosa": COLOR_ROSA,
+    "Botó Buit": COLOR_BUIT,
+}
+REVERSE_PALETA = {v: k for k, v in PALETA_COLORS_DICT.items()}
+
+LLISTA_EMOJIS = [
+    "➕", "🎙️", "👏", "😂", "🎺", "❌", "🚪", "🥁", "👽", "📞", "🐶", "🐱", "💥",
+    "💧", "🚗", "🔔", "👻", "🤖", "⚡️", "🌊", "🎵", "🎶", "🎤", "🎧", "🔈",
+    "🔊", "🔥", "💨", "💬", "🛑", "✅", "⛔", "⚠️", "💯", "💸", "💡", "💣",
+    "💀", "❤️", "⭐", "🎉", "🤯", "🤔", "...", "1️⃣", "2️⃣", "3️⃣", "4️⃣", "5️⃣",
+]
+
+
+# --- Tecles globals: combinacions normalitzades ---
+MODIFICADORS = ("ctrl", "alt", "alt gr", "shift", "windows")
+ALIES_TECLES = {
+    "control": "ctrl", "ctl": "ctrl", "left ctrl": "ctrl", "right ctrl": "ctrl",
+    "left alt": "alt", "right alt": "alt gr", "altgr": "alt gr", "option": "alt",
+    "left shift": "shift", "right shift": "shift", "maj": "shift",
+    "win": "windows", "left windows": "windows", "right windows": "windows",
+    "cmd": "windows", "command": "windows", "super": "windows",
+    "escape": "esc", "return": "enter", "del": "delete", "supr": "delete",
+}
+
+
+def normalitzar_tecla(tecla: str) -> str:
+    """
+    Retorna la forma canònica d'una tecla o combinació ("Control + F5" -> "ctrl+f5").
+
+    Els modificadors van primer i sempre en el mateix ordre, de manera que "shift+ctrl+1"
+    i "ctrl+shift+1" comparteixen entrada a l'índex de tecles.
+    """
+    text = tecla.strip().lower()
+    parts = [p.strip() for p in text.split("+")]
+    if text.endswith("+"):
+        parts = [p for p in parts if p] + ["plus"]  # la pròpia tecla "+", com l'anomena keyboard
+    parts = [ALIES_TECLES.get(p, p) for p in parts if p]
+    modificadors = [m for m in MODIFICADORS if m in parts]
+    resta = list(dict.fromkeys(p for p in parts if p not in MODIFICADORS))
+    return "+".join(modificadors + resta)
+
+
+def es_modificador(tecla: str) -> bool:
+    return ALIES_TECLES.get(tecla.lower(), tecla.lower()) in MODIFICADORS
+
+
+# --- Data model per a la configuració d'un botó ---
+@dataclass
+class ButtonConfig:
+    id: int
+    emoji: str = "➕"
+    nom: str = "Buit"
+    arxiu: Optional[str] = None  # camí relatiu respecto SCRIPT_DIR o None
+    color: str = COLOR_BUIT
+    tecla_assignada: Optional[str] = None
+    guany: float = 1.0  # guany propi del botó, multiplica el volum general
+    mode: str = "commutar"  # clau de MODES_REPRODUCCIO
+    max_veus: int = 4  # veus simultànies del mateix botó en mode polifònic
+    grup: str = ""  # grup exclusiu: en sonar, atura els altres botons del mateix grup
+    fosa_entrada_ms: int = 0  # fade-in en començar; dins d'un grup exclusiu també fa el crossfade
+    fosa_sortida_ms: int = 0  # fade-out en aturar el botó
+    normalitzar: bool = True  # aplica el guany de l'índex de loudness (amb pygame, només per baixar)
+    pagina: int = 0  # pàgina (banc) on es mostra el botó
+    tecla_global: bool = False  # la tecla funciona des de qualsevol pàgina, no només l'activa
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, dades: Dict[str, Any]) -> "ButtonConfig":
+        # Els camps desconeguts (d'una versió més nova) s'ignoren
+        camps = {k: v for k, v in dades.items() if k in cls.__dataclass_fields__}
+        # Un botó desat abans que existís la normalització ha de sonar igual que sonava
+        camps.setdefault("normalitzar", False)
+        return cls(**camps)
+
+
+def resoldre_cami(arxiu: str) -> Path:
+    """Converteix el camí d'un ButtonConfig (relatiu a SCRIPT_DIR o absolut) en absolut."""
+    cami = Path(arxiu)
+    if not cami.is_absolute():
+        cami = SCRIPT_DIR / cami
+    return cami
+
+
+def _mida_mostra(mostra: Any) -> int:
+    """Bytes que ocupa una mostra descodificada (array de NumPy o pygame.mixer.Sound)."""
+    if isinstance(mostra, (MostraFlux, np.memmap)):
+        return 0  # mapat des de disc: el sistema decideix quines pàgines són a RAM
+    if isinstance(mostra, np.ndarray):
+        return mostra.nbytes
+    freq, fmt, canals = pygame.mixer.get_init() or (SAMPLERATE, -16, 2)
+    return int(mostra.get_length() * freq) * canals * (abs(fmt) // 8)
+
+
+# --- Memòria cau LRU de sons descodificats ---
+class CacheMostres:
+    """
+    Guarda els sons ja descodificats per no llegir l'arxiu a cada pulsació. El format depèn
+    de la sortida d'àudio (pygame.mixer.Sound o array de NumPy), que en fixa el descodificador.
+
+    La clau és (camí absolut, mtime): si l'arxiu canvia al disc es torna a descodificar.
+    Quan se supera el pressupost de memòria s'expulsen els sons usats fa més temps.
+    """
+
+    def __init__(self, pressupost_bytes: int, descodificador=None):
+        self.pressupost_bytes = pressupost_bytes
+        self.descodificador = descodificador or (lambda cami: pygame.mixer.Sound(str(cami)))
+        self._mostres: OrderedDict[Tuple[str, int], Tuple[Any, int]] = OrderedDict()
+        self._bytes_totals = 0
+        self._pendents: Dict[str, Future] = {}
+        self._generacio = 0  # s'incrementa a buidar(): descarta descodificacions començades abans
+        self._lock = threading.Lock()
+
+    @property
+    def bytes_totals(self) -> int:
+        return self._bytes_totals
+
+    def obtenir(self, cami: Path) -> Any:
+        """Retorna el so de `cami`, descodificant-lo només si no és a la memòria cau.
+
+        Llença FileNotFoundError si l'arxiu no existeix.
+        """
+        clau = (str(cami), os.stat(cami).st_mtime_ns)
+        with self._lock:
+            entrada = self._mostres.get(clau)
+            if entrada is not None:
+                self._mostres.move_to_end(clau)
+                return entrada[0]
+            generacio = self._generacio
+
+        so = self.descodificador(cami)
+        mida = _mida_mostra(so)
+        with self._lock:
+            if generacio != self._generacio:
+                # El mixer s'ha reiniciat mentre descodificàvem: no el guardem
+                return so
+            # Una versió antiga del mateix arxiu ja no serveix
+            self._treure_cami(clau[0])
+            self._mostres[clau] = (so, mida)
+            self._bytes_totals += mida
+            self._expulsar()
+        return so
+
+    def precarregar(self, cami: Path, executor: ThreadPoolExecutor) -> Future:
+        """Descodifica `cami` en segon pla. Si ja s'està carregant, retorna la mateixa Future."""
+        clau = str(cami)
+        with self._lock:
+            fut = self._pendents.get(clau)
+            if fut is not None:
+                return fut
+            fut = executor.submit(self.obtenir, cami)
+            self._pendents[clau] = fut
+        # Fora del lock: si la Future ja ha acabat, el callback s'executa aquí mateix
+        fut.add_done_callback(lambda _f: self._acabar_pendent(clau, _f))
+        return fut
+
+    def conte(self, cami: Path) -> bool:
+        """Cert si la versió actual de `cami` ja és descodificada a la memòria cau."""
+        try:
+            clau = (str(cami), os.stat(cami).st_mtime_ns)
+        except OSError:
+            return False
+        with self._lock:
+            return clau in self._mostres
+
+    def pendent(self, cami: Path) -> Optional[Future]:
+        """Retorna la Future de la precàrrega en curs de `cami`, si n'hi ha."""
+        with self._lock:
+            return self._pendents.get(str(cami))
+
+    def _acabar_pendent(self, clau: str, fut: Future):
+        with self._lock:
+            if self._pendents.get(clau) is fut:
+                del self._pendents[clau]
+
+    def invalidar(self, cami: Path):
+        with self._lock:
+            self._treure_cami(str(cami))
+
+    def canviar_pressupost(self, pressupost_bytes: int):
+        with self._lock:
+            self.pressupost_bytes = pressupost_bytes
+            self._expulsar()
+
+    def canviar_descodificador(self, descodificador):
+        """Canvia el format de les mostres; les que ja hi havia deixen de servir."""
+        self.descodificador = descodificador
+        self.buidar()
+
+    def buidar(self):
+        with self._lock:
+            self._generacio += 1
+            self._mostres.clear()
+            self._bytes_totals = 0
+
+    def _treure_cami(self, cami: str):
+        for clau in [c for c in self._mostres if c[0] == cami]:
+            _, mida = self._mostres.pop(clau)
+            self._bytes_totals -= mida
+
+    def _expulsar(self):
+        # Mai expulsem l'últim so inserit, encara que tot sol superi el pressupost
+        while self._bytes_totals > self.pressupost_bytes and len(self._mostres) > 1:
+            clau, (_, mida) = self._mostres.popitem(last=False)
+            self._bytes_totals -= mida
+            LOG.debug("So expulsat de la memòria cau: %s", clau[0])
+
+
+# --- Loudness: anàlisi en segon pla i índex persistent ---
+def _resposta_biquad(b: Tuple[float, float, float], a: Tuple[float, float, float], w: np.ndarray) -> np.ndarray:
+    """|H(e^jw)|² d'un filtre biquad, avaluat a les freqüències angulars `w`."""
+    z = np.exp(-1j * w)
+    num = b[0] + b[1] * z + b[2] * z * z
+    den = a[0] + a[1] * z + a[2] * z * z
+    return (np.abs(num) / np.abs(den)) ** 2
+
+
+def ponderacio_k(frequencia: int, n_fft: int) -> np.ndarray:
+    """Resposta en potència del filtre K de la ITU-R BS.1770 per a cada bin d'una rfft de mida `n_fft`."""
+    w = 2 * np.pi * np.fft.rfftfreq(n_fft)
+    # Prefiltre: prestatge d'aguts de +4 dB (coeficients derivats com a libebur128)
+    K = math.tan(math.pi * 1681.974450955533 / frequencia)
+    Q = 0.7071752369554196
+    Vh = 10 ** (3.999843853973347 / 20)
+    Vb = Vh ** 0.4996667741545416
+    a0 = 1 + K / Q + K * K
+    prestatge = _resposta_biquad(((Vh + Vb * K / Q + K * K) / a0, 2 * (K * K - Vh) / a0, (Vh - Vb * K / Q + K * K) / a0),
+                                 (1.0, 2 * (K * K - 1) / a0, (1 - K / Q + K * K) / a0), w)
+    # Filtre RLB: passa-alts a 38 Hz
+    K = math.tan(math.pi * 38.13547087602444 / frequencia)
+    Q = 0.5003270373238773
+    a0 = 1 + K / Q + K * K
+    passa_alts = _resposta_biquad((1.0, -2.0, 1.0), (1.0, 2 * (K * K - 1) / a0, (1 - K / Q + K * K) / a0), w)
+    return prestatge * passa_alts
+
+
+def mesurar_loudness(cami: Path) -> Tuple[float, float]:
+    """
+    Retorna (pic en dBFS, loudness integrada en LUFS) de l'arxiu, segons la BS.1770.
+
+    Es llegeix per trossos i el filtre K s'aplica al domini freqüencial, així que tot el
+    càlcul és vectoritzat. L'energia es resumeix en segments de 100 ms; els blocs de
+    400 ms amb solapament del 75 % són sumes de 4 segments consecutius.
+    """
+    with sf.SoundFile(str(cami)) as f:
+        frequencia = f.samplerate
+        segment = max(1, frequencia // 10)
+        tros = segment * 64  # múltiple del segment perquè cap segment quedi partit
+        filtre = ponderacio_k(frequencia, tros)
+        energies: List[np.ndarray] = []
+        pic = 0.0
+        for bloc in f.blocks(blocksize=tros, dtype="float32", always_2d=True):
+            if not len(bloc):
+                continue
+            pic = max(pic, float(np.abs(bloc).max()))
+            espectre = np.fft.rfft(bloc, n=tros, axis=0) * np.sqrt(filtre)[:, None]
+            filtrat = np.fft.irfft(espectre, n=tros, axis=0)[:len(bloc)]
+            n_seg = -(-len(bloc) // segment)
+            quadrats = np.zeros((n_seg * segment, bloc.shape[1]))
+            quadrats[:len(bloc)] = filtrat * filtrat
+            # Suma de canals (pes 1 per a L, R i mono) per segment
+            energies.append(quadrats.reshape(n_seg, segment, -1).sum(axis=(1, 2)))
+
+    pic_dbfs = 20 * math.log10(pic) if pic > 0 else -math.inf
+    if not energies:
+        return pic_dbfs, -math.inf
+    segments = np.concatenate(energies)
+    if len(segments) >= 4:
+        blocs = np.convolve(segments, np.ones(4), mode="valid") / (4 * segment)
+    else:
+        blocs = np.array([segments.sum() / (len(segments) * segment)])
+    with np.errstate(divide="ignore"):
+        nivells = -0.691 + 10 * np.log10(blocs)
+    blocs = blocs[nivells > -70.0]  # porta absoluta
+    if not len(blocs):
+        return pic_dbfs, -math.inf
+    relativa = -0.691 + 10 * math.log10(blocs.mean()) - 10.0
+    with np.errstate(divide="ignore"):
+        blocs = blocs[-0.691 + 10 * np.log10(blocs) > relativa]  # porta relativa
+    return pic_dbfs, -0.691 + 10 * math.log10(blocs.mean())
+
+
+class IndexLoudness:
+    """
+    Índex persistent de les anàlisis de loudness, indexat per camí, mida i mtime.
+
+    Un arxiu només es torna a analitzar si ha canviat al disc; l'índex es desa en JSON
+    al costat del programa i es carrega sencer a l'arrencada.
+    """
+
+    def __init__(self, cami: Path):
+        self.cami = cami
+        self._entrades: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._lock_desar = threading.Lock()  # el fil de loudness i en_tancar poden desar alhora
+        self._canviat = False
+        try:
+            with open(cami, "r", encoding="utf-8") as f:
+                self._entrades = json.load(f)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            LOG.warning("No s'ha pogut llegir l'índex de loudness %s: %s", cami, e)
+
+    @staticmethod
+    def _signatura(cami: Path) -> Optional[Tuple[int, int]]:
+        try:
+            st = cami.stat()
+        except OSError:
+            return None
+        return st.st_size, st.st_mtime_ns
+
+    def consultar(self, cami: Path) -> Optional[Dict[str, Any]]:
+        """Entrada vigent per a `cami`, o None si no s'ha analitzat o ha canviat."""
+        signatura = self._signatura(cami)
+        with self._lock:
+            entrada = self._entrades.get(str(cami))
+        if entrada is None or signatura is None or (entrada["mida"], entrada["mtime_ns"]) != signatura:
+            return None
+        return entrada
+
+    def analitzar(self, cami: Path) -> Optional[Dict[str, Any]]:
+        """Analitza `cami` si no hi ha cap entrada vigent. Pensat per a un fil de fons."""
+        entrada = self.consultar(cami)
+        if entrada is not None:
+            return entrada
+        signatura = self._signatura(cami)
+        if signatura is None:
+            return None
+        t0 = time.perf_counter()
+        pic_dbfs, lufs = mesurar_loudness(cami)
+        LOG.info("Loudness de %s: %.1f LUFS, pic %.1f dBFS (%.0f ms)", cami.name, lufs, pic_dbfs,
+                 (time.perf_counter() - t0) * 1000.0)
+        # JSON no admet infinits: el silenci es desa com a None
+        entrada = {"mida": signatura[0], "mtime_ns": signatura[1],
+                   "pic_dbfs": pic_dbfs if math.isfinite(pic_dbfs) else None,
+                   "lufs": lufs if math.isfinite(lufs) else None}
+        with self._lock:
+            self._entrades[str(cami)] = entrada
+            self._canviat = True
+        return entrada
+
+    def registrar(self, cami: Path, pic_dbfs: Optional[float], lufs: Optional[float]):
+        """Afegeix una mesura feta en un altre lloc (p. ex. la d'un paquet importat)."""
+        signatura = self._signatura(cami)
+        if signatura is None:
+            return
+        with self._lock:
+            self._entrades[str(cami)] = {"mida": signatura[0], "mtime_ns": signatura[1], "pic_dbfs": pic_dbfs, "lufs": lufs}
+            self._canviat = True
+
+    def guany(self, cami: Path) -> float:
+        """Guany lineal que porta l'arxiu a OBJECTIU_LUFS sense que el pic passi de SOSTRE_PIC_DBFS."""
+        entrada = self.consultar(cami)
+        if entrada is None or entrada["lufs"] is None:
+            return 1.0
+        guany_db = OBJECTIU_LUFS - entrada["lufs"]
+        if entrada["pic_dbfs"] is not None:
+            guany_db = min(guany_db, SOSTRE_PIC_DBFS - entrada["pic_dbfs"])
+        return 10 ** (guany_db / 20)
+
+    def desar(self):
+        """Desa l'índex si hi ha entrades noves (escriptura a un temporal i os.replace)."""
+        with self._lock_desar:
+            with self._lock:
+                if not self._canviat:
+                    return
+                dades = dict(self._entrades)
+                self._canviat = False
+            temporal = self.cami.with_suffix(".tmp")
+            try:
+                with open(temporal, "w", encoding="utf-8") as f:
+                    json.dump(dades, f, indent=1)
+                os.replace(temporal, self.cami)
+            except Exception as e:
+                LOG.warning("No s'ha pogut desar l'índex de loudness: %s", e)
+
+
+# --- Sortides d'àudio: canals de pygame.mixer o motor de mescla propi ---
+def _estereo(dades: np.ndarray) -> np.ndarray:
+    if dades.shape[1] == 1:
+        return np.repeat(dades, 2, axis=1)
+    return dades[:, :2]
+
+
+def llegir_pcm(cami: Path, frequencia: int) -> np.ndarray:
+    """Descodifica `cami` a float32 estèreo, amb forma (frames, 2), a la freqüència donada."""
+    if cami.suffix == ".npy":
+        # Mostra d'un paquet: si ja és float32 a la freqüència bona, es retorna el memmap tal qual
+        dades, sr = llegir_mostra_paquet(cami)
+        if dades.dtype != np.float32:
+            dades = dades.astype(np.float32) / 32768.0
+    else:
+        dades, sr = sf.read(str(cami), dtype="float32", always_2d=True)
+        dades = _estereo(dades)
+    if sr != frequencia and len(dades):
+        # Reinterpolació lineal: prou bona per a efectes curts i molt ràpida
+        n = int(round(len(dades) * frequencia / sr))
+        x = np.arange(n) * (sr / frequencia)
+        origen = np.arange(len(dades))
+        dades = np.stack([np.interp(x, origen, dades[:, c]) for c in range(2)], axis=1).astype(np.float32)
+    return np.ascontiguousarray(dades)
+
+
+# --- Sons llargs: magatzem PCM mapat a memòria ---
+MAGATZEM_PCM_DIR = SCRIPT_DIR / "pcm"
+PRESSUPOST_PCM_MB = 4096  # espai màxim del magatzem; en passar-lo s'esborren les còpies usades fa més temps
+SEGONS_TROS_FLUX = 5.0  # trossos que pygame té a la cua
+FRAMES_BLOC_CONVERSIO = 65536
+
+
+def es_so_llarg(cami: Path, frequencia: int, bytes_mostra: int, llindar_bytes: int) -> bool:
+    """Cert si `cami`, descodificat en estèreo a `frequencia`, ocuparia més de `llindar_bytes`."""
+    if cami.suffix == ".npy":
+        return False  # les mostres de paquet ja es llegeixen mapades
+    try:
+        info = sf.info(str(cami))  # només llegeix la capçalera
+    except Exception:
+        return False
+    return int(info.frames * frequencia / info.samplerate) * 2 * bytes_mostra > llindar_bytes
+
+
+class MagatzemPCM:
+    """
+    Còpies en PCM brut (.npy) dels sons llargs, en el format natiu de la sortida d'àudio.
+
+    Cada arxiu es descodifica una sola vegada i per blocs, així que la memòria no depèn de la
+    durada; després s'obre amb np.load(mmap_mode="r") i el sistema només porta a RAM les
+    pàgines que s'estan reproduint. El nom inclou la mida i la data de l'original: si l'arxiu
+    canvia es torna a convertir i la còpia antiga s'esborra.
+
+    La carpeta no passa de `pressupost_bytes`: cada ús d'una còpia en renova la data de
+    modificació i, si una conversió nova fa passar el límit, s'esborren les còpies usades
+    fa més temps. Al costat de les còpies de cada original hi ha un `<prefix>.font` amb el
+    seu camí; netejar() esborra les còpies dels originals que ja no existeixen.
+    """
+
+    def __init__(self, carpeta: Path, pressupost_bytes: int = PRESSUPOST_PCM_MB * 1024 * 1024):
+        self.carpeta = carpeta
+        self.pressupost_bytes = pressupost_bytes
+        self._lock = threading.Lock()
+
+    def obtenir(self, cami: Path, frequencia: int, dtype: str) -> np.memmap:
+        st = os.stat(cami)
+        prefix = hashlib.sha1(str(cami).encode("utf-8")).hexdigest()[:16]
+        versio = f"{prefix}_{st.st_size}_{st.st_mtime_ns}@"
+        desti = self.carpeta / f"{versio}{frequencia}.{dtype}.npy"
+        with self._lock:
+            if desti.exists():
+                try:
+                    os.utime(desti)  # marca l'últim ús: la data d'accés no és fiable (noatime)
+                except OSError:
+                    pass
+            else:
+                self._convertir(cami, desti, frequencia, np.dtype(dtype))
+                (self.carpeta / f"{prefix}.font").write_text(str(cami), encoding="utf-8")
+                for vell in self.carpeta.glob(prefix + "_*.npy"):
+                    if not vell.name.startswith(versio):
+                        self._esborrar_si_pot(vell)
+                self._retallar(conservar=desti)
+        return np.load(str(desti), mmap_mode="r")
+
+    def netejar(self) -> int:
+        """Esborra les còpies d'originals que ja no existeixen, les conversions a mitges i el que
+        passi del pressupost. Retorna els bytes alliberats."""
+        if not self.carpeta.is_dir():
+            return 0
+        with self._lock:
+            abans = self._mida()
+            for temporal in self.carpeta.glob("*.npy.tmp"):
+                self._esborrar_si_pot(temporal)
+            for font in self.carpeta.glob("*.font"):
+                try:
+                    original = Path(font.read_text(encoding="utf-8"))
+                except OSError:
+                    continue
+                if not original.exists():
+                    for copia in self.carpeta.glob(font.stem + "_*.npy"):
+                        self._esborrar_si_pot(copia)
+                    self._esborrar_si_pot(font)
+            self._retallar()
+            alliberats = abans - self._mida()
+        if alliberats:
+            LOG.info("Magatzem PCM: %.0f MB alliberats", alliberats / 2 ** 20)
+        return alliberats
+
+    def _mida(self) -> int:
+        return sum(f.stat().st_size for f in self.carpeta.glob("*.npy"))
+
+    def _retallar(self, conservar: Optional[Path] = None):
+        """Esborra les còpies usades fa més temps fins que la carpeta cap al pressupost."""
+        copies = sorted(((f.stat(), f) for f in self.carpeta.glob("*.npy")), key=lambda t: t[0].st_mtime)
+        total = sum(st.st_size for st, _f in copies)
+        for st, copia in copies:
+            if total <= self.pressupost_bytes:
+                break
+            # Al Windows no es pot esborrar una còpia mapada per una veu que sona: es queda fins a la propera
+            if copia != conservar and self._esborrar_si_pot(copia):
+                total -= st.st_size
+
+    @staticmethod
+    def _esborrar_si_pot(cami: Path) -> bool:
+        try:
+            cami.unlink()
+            return True
+        except OSError:
+            LOG.debug("No s'ha pogut esborrar %s", cami, exc_info=True)
+            return False
+
+    def _convertir(self, cami: Path, desti: Path, frequencia: int, dtype: np.dtype):
+        t0 = time.perf_counter()
+        self.carpeta.mkdir(parents=True, exist_ok=True)
+        temporal = desti.with_name(desti.name + ".tmp")
+        with sf.SoundFile(str(cami)) as f:
+            sr = f.samplerate
+            total = int(round(f.frames * frequencia / sr))
+            sortida = np.lib.format.open_memmap(str(temporal), mode="w+", dtype=dtype, shape=(total, 2))
+            escrits = 0
+            inici = 0  # índex, a l'original, del primer frame del bloc
+            anterior = None  # últim frame del bloc anterior: la interpolació no s'ha de tallar entre blocs
+            for bloc in f.blocks(blocksize=FRAMES_BLOC_CONVERSIO, dtype="float32", always_2d=True):
+                bloc = _estereo(bloc)
+                if sr == frequencia:
+                    tros = bloc
+                else:
+                    valors = bloc if anterior is None else np.concatenate([anterior, bloc])
+                    origen = np.arange(inici + len(bloc) - len(valors), inici + len(bloc))
+                    fins = min(total, int((inici + len(bloc) - 1) * frequencia / sr) + 1)
+                    x = np.arange(escrits, fins) * (sr / frequencia)
+                    tros = np.stack([np.interp(x, origen, valors[:, c]) for c in range(2)], axis=1)
+                anterior = bloc[-1:]
+                inici += len(bloc)
+                tros = tros[:total - escrits]
+                sortida[escrits:escrits + len(tros)] = pcm_int16(tros) if dtype == np.int16 else tros
+                escrits += len(tros)
+            if 0 < escrits < total:
+                sortida[escrits:] = sortida[escrits - 1]
+            sortida.flush()
+            del sortida
+        os.replace(temporal, desti)
+        LOG.info("So llarg convertit a PCM mapat: %s (%.0f ms)", cami.name, (time.perf_counter() - t0) * 1000)
+
+
+MAGATZEM_PCM = MagatzemPCM(MAGATZEM_PCM_DIR)
+
+
+@dataclass
+class MostraFlux:
+    """So llarg per a pygame: PCM int16 mapat que es reprodueix per trossos encuats al canal."""
+    dades: np.memmap  # (frames, 2) int16
+    frequencia: int
+
+
+@dataclass
+class VeuPygame:
+    canal: pygame.mixer.Channel
+    so: Optional[pygame.mixer.Sound]  # en flux, el tros que sona ara
+    guany: float
+    flux: Optional[MostraFlux] = None
+    cua: Optional[pygame.mixer.Sound] = None  # en flux, el tros encuat al canal
+    posicio: int = 0  # en flux, primer frame del tros següent
+    bucle: bool = False
+    sortint: bool = False
+    fosa_frames: int = 0  # en flux, durada del fade-in, que va dins dels trossos
+    emesos: int = 0  # en flux, frames ja encuats des de l'inici (les voltes del bucle també compten)
+
+
+class SortidaPygame:
+    """
+    Reprodueix amb els canals de pygame.mixer; el volum general s'aplica canal per canal.
+
+    Els sons llargs (MostraFlux) no es carreguen sencers: es tallen en trossos de
+    SEGONS_TROS_FLUX i el canal en té sempre un sonant i el següent a la cua (Channel.queue).
+    El despatxador crida alimentar() periòdicament per encuar el tros següent. SDL reinicia
+    la fosa del canal a cada tros encuat, així que el fade-in d'un so en flux es multiplica
+    directament a les mostres dels trossos que cobreix.
+    """
+
+    def __init__(self, cfg: Optional[ConfiguracioMixer] = None):
+        cfg = cfg or ConfiguracioMixer()
+        self.capacitat = cfg.canals
+        self.llindar_flux = cfg.llindar_flux_mb * 1024 * 1024
+        self._silenci: Optional[pygame.mixer.Sound] = None
+
+    def iniciar(self, cfg: ConfiguracioMixer) -> bool:
+        self.capacitat = cfg.canals
+        self.llindar_flux = cfg.llindar_flux_mb * 1024 * 1024
+        self._silenci = None
+        return iniciar_mixer(cfg)
+
+    def tancar(self):
+        aturar_mixer()
+
+    def descodificar(self, cami: Path) -> pygame.mixer.Sound:
+        if cami.suffix == ".npy":
+            # Mostra d'un paquet, ja en int16 estèreo: només es copia al so de pygame
+            dades, sr = llegir_mostra_paquet(cami)
+            frequencia = (pygame.mixer.get_init() or (sr,))[0]
+            if dades.dtype != np.int16 or sr != frequencia:
+                dades = pcm_int16(llegir_pcm(cami, frequencia))
+            return pygame.mixer.Sound(buffer=dades)
+        frequencia = (pygame.mixer.get_init() or (SAMPLERATE,))[0]
+        if es_so_llarg(cami, frequencia, 2, self.llindar_flux):
+            return MostraFlux(MAGATZEM_PCM.obtenir(cami, frequencia, "int16"), frequencia)
+        return pygame.mixer.Sound(str(cami))
+
+    def durada(self, so) -> float:
+        if isinstance(so, MostraFlux):
+            return len(so.dades) / so.frequencia
+        return so.get_length()
+
+    def reproduir(self, so, guany: float, volum: float, bucle: bool = False, fosa_ms: int = 0) -> VeuPygame:
+        canal = trobar_canal_lliure()
+        canal.set_volume(min(1.0, volum * guany))  # pygame no pot amplificar per sobre d'1.0
+        if isinstance(so, MostraFlux):
+            veu = VeuPygame(canal, None, guany, flux=so, bucle=bucle, fosa_frames=fosa_ms * so.frequencia // 1000)
+            veu.so = self._tros(veu)
+            veu.cua = self._tros(veu)
+            canal.play(veu.so)
+            if veu.cua is not None:
+                canal.queue(veu.cua)
+            return veu
+        so.set_volume(1.0)
+        # Les foses de SDL_mixer s'apliquen dins del seu callback d'àudio, mostra a mostra
+        canal.play(so, loops=-1 if bucle else 0, fade_ms=fosa_ms)
+        return VeuPygame(canal, so, guany)
+
+    def _tros(self, veu: VeuPygame) -> Optional[pygame.mixer.Sound]:
+        """Següent tros del flux com a so de pygame (una còpia de SEGONS_TROS_FLUX), o None si s'ha acabat."""
+        dades = veu.flux.dades
+        if veu.posicio >= len(dades):
+            if not veu.bucle or not len(dades):
+                return None
+            veu.posicio = 0
+        tros = dades[veu.posicio:veu.posicio + int(SEGONS_TROS_FLUX * veu.flux.frequencia)]
+        veu.posicio += len(tros)
+        if veu.emesos < veu.fosa_frames:
+            # Rampa lineal, com la de SDL, que continua on l'havia deixada el tros anterior
+            n = min(len(tros), veu.fosa_frames - veu.emesos)
+            rampa = (np.arange(veu.emesos, veu.emesos + n, dtype=np.float32) / veu.fosa_frames)[:, None]
+            tros = np.concatenate([(tros[:n] * rampa).astype(np.int16), tros[n:]])
+        veu.emesos += len(tros)
+        return pygame.mixer.Sound(buffer=tros)
+
+    def alimentar(self, veus: List[VeuPygame]) -> Optional[float]:
+        """Encua el tros següent de les veus en flux; retorna d'aquí a quants segons cal tornar-hi."""
+        en_flux = False
+        for veu in veus:
+            if veu.flux is None or veu.sortint or not self.sonant(veu):
+                continue
+            if veu.cua is not None and veu.canal.get_sound() is veu.cua:
+                # El tros encuat ja sona: en preparem un altre
+                veu.so, veu.cua = veu.cua, self._tros(veu)
+                if veu.cua is not None:
+                    veu.canal.queue(veu.cua)
+            en_flux = en_flux or veu.cua is not None
+        return SEGONS_TROS_FLUX / 2 if en_flux else None
+
+    def sonant(self, veu: VeuPygame) -> bool:
+        # Si trobar_canal_lliure ha reaprofitat el canal, ja hi sona un altre so
+        if not (MIXER_OK and veu.canal.get_busy()):
+            return False
+        actual = veu.canal.get_sound()
+        return actual is veu.so or (veu.cua is not None and actual is veu.cua)
+
+    def aturar(self, veu: VeuPygame, fosa_ms: int = 0):
+        if not self.sonant(veu):
+            return
+        veu.sortint = True
+        if fosa_ms > 0:
+            veu.canal.fadeout(fosa_ms)
+            if veu.flux is not None:
+                # Quan acaba la fosa, SDL passaria al tros encuat: el substituïm per un silenci
+                if self._silenci is None:
+                    self._silenci = pygame.mixer.Sound(buffer=np.zeros((64, 2), dtype=np.int16))
+                veu.canal.queue(self._silenci)
+        else:
+            veu.canal.stop()  # també buida la cua del canal
+
+    def aturar_tot(self):
+        if MIXER_OK:
+            pygame.mixer.stop()
+
+    def canviar_volum(self, volum: float, veus: List[VeuPygame]):
+        for veu in veus:
+            veu.canal.set_volume(min(1.0, volum * veu.guany))
+
+    def ocupacio(self) -> Tuple[int, int]:
+        """Canals de pygame.mixer ocupats i totals."""
+        if not MIXER_OK:
+            return 0, 0
+        total = pygame.mixer.get_num_channels()
+        return sum(pygame.mixer.Channel(i).get_busy() for i in range(total)), total
+
+
+@dataclass
+class VeuMescla:
+    dades: np.ndarray  # (frames, 2) float32
+    guany: float
+    bucle: bool = False
+    posicio: int = 0
+    aturada: bool = False
+    envolupant: float = 1.0  # guany de la fosa en curs, entre 0 i 1
+    pas: float = 0.0  # canvi de l'envolupant per frame; negatiu en un fade-out
+
+    @property
+    def acabada(self) -> bool:
+        return self.aturada or (not self.bucle and self.posicio >= len(self.dades))
+
+
+class MotorMescla:
+    """
+    Motor de mescla propi: suma les veus actives amb NumPy al callback d'un sd.OutputStream.
+
+    Cada veu porta el guany del seu ButtonConfig; la suma passa per un bus master amb el
+    volum general i per un limitador de pics ràpid, de manera que apilar sons no retalla.
+    El despatxador substitueix la tupla de veus sencera (còpia en escriptura) i el callback
+    només la llegeix, així que no cal cap lock. Canviar el volum general és una assignació.
+    """
+
+    SOSTRE = 0.98  # nivell màxim a la sortida del limitador
+    ALLIBERAMENT = 0.05  # fracció del camí cap a guany 1 que es recupera a cada bloc
+
+    def __init__(self, cfg: Optional[ConfiguracioMixer] = None):
+        cfg = cfg or ConfiguracioMixer(motor="numpy")
+        self.volum_master = 1.0
+        self._veus: Tuple[VeuMescla, ...] = ()
+        self._stream: Optional[sd.OutputStream] = None
+        self._frequencia = cfg.frequencia
+        self.capacitat = cfg.canals
+        self.llindar_flux = cfg.llindar_flux_mb * 1024 * 1024
+        self._guany_limitador = 1.0
+        self.underruns = 0  # blocs en què PortAudio ha avisat que la sortida s'ha quedat sense dades
+        self.interval_maxim = 0.0  # segons, el temps més llarg entre dos callbacks
+        self._ultim_callback: Optional[float] = None
+        self._preparar_buffers(FRAMES_PER_BUFFER)
+
+    def _preparar_buffers(self, frames: int):
+        self._temporal = np.zeros((frames, 2), dtype=np.float32)
+        self._guanys = np.zeros(frames, dtype=np.float32)
+        self._passos = np.arange(1, frames + 1, dtype=np.float32)
+        self._rampa = self._passos / frames
+
+    def iniciar(self, cfg: ConfiguracioMixer) -> bool:
+        self._frequencia = cfg.frequencia
+        self.capacitat = cfg.canals
+        self.llindar_flux = cfg.llindar_flux_mb * 1024 * 1024
+        self._preparar_buffers(cfg.buffer)
+        try:
+            self._stream = sd.OutputStream(samplerate=cfg.frequencia, channels=2, dtype="float32",
+                                           blocksize=cfg.buffer, callback=self._callback)
+            self._stream.start()
+        except Exception as e:
+            LOG.exception("No s'ha pogut iniciar el motor de mescla: %s", e)
+            self._stream = None
+            return False
+        LOG.info("Motor de mescla iniciat (%d Hz, buffer %d, %d veus).", cfg.frequencia, cfg.buffer, cfg.canals)
+        return True
+
+    def tancar(self):
+        self._veus = ()
+        if self._stream is not None:
+            try:
+                self._stream.stop()
+                self._stream.close()
+            except Exception:
+                LOG.debug("Error tancant el motor de mescla", exc_info=True)
+            self._stream = None
+
+    def descodificar(self, cami: Path) -> np.ndarray:
+        if es_so_llarg(cami, self._frequencia, 4, self.llindar_flux):
+            # El callback llegeix directament del memmap; alimentar() s'avança a portar-ne les pàgines
+            return MAGATZEM_PCM.obtenir(cami, self._frequencia, "float32")
+        return llegir_pcm(cami, self._frequencia)
+
+    def durada(self, dades: np.ndarray) -> float:
+        return len(dades) / self._frequencia
+
+    @property
+    def latencia_sortida(self) -> float:
+        """Latència de sortida en segons, segons el dispositiu (0 si no hi ha stream)."""
+        return float(getattr(self._stream, "latency", 0.0) or 0.0)
+
+    def reproduir(self, dades: np.ndarray, guany: float, volum: float, bucle: bool = False,
+                  fosa_ms: int = 0) -> VeuMescla:
+        self.volum_master = volum
+        veu = VeuMescla(dades, guany, bucle=bucle and len(dades) > 0)
+        if fosa_ms > 0:
+            veu.envolupant = 0.0
+            veu.pas = 1.0 / self._frames_fosa(fosa_ms)
+        actives = [v for v in self._veus if not v.acabada]
+        if len(actives) >= self.capacitat:
+            LOG.warning("Màxim de veus simultànies: s'atura la més antiga.")
+            actives[0].aturada = True
+            actives = actives[1:]
+        self._veus = tuple(actives) + (veu,)
+        return veu
+
+    def alimentar(self, veus: List[VeuMescla]) -> Optional[float]:
+        """Llegeix per avançat les pàgines dels sons mapats que sonaran aviat, perquè el callback no esperi el disc."""
+        en_flux = False
+        frames = int(SEGONS_TROS_FLUX * self._frequencia)
+        for veu in veus:
+            if isinstance(veu.dades, np.memmap) and not veu.acabada:
+                # Un frame de cada 512 (4 KiB en float32 estèreo) toca cada pàgina una vegada
+                veu.dades[veu.posicio:veu.posicio + frames:512].sum()
+                en_flux = True
+        return SEGONS_TROS_FLUX / 2 if en_flux else None
+
+    def sonant(self, veu: VeuMescla) -> bool:
+        return self._stream is not None and not veu.acabada
+
+    def aturar(self, veu: VeuMescla, fosa_ms: int = 0):
+        if fosa_ms > 0 and not veu.acabada:
+            # El callback atura la veu quan l'envolupant arriba a 0
+            veu.pas = -veu.envolupant / self._frames_fosa(fosa_ms)
+        else:
+            veu.aturada = True
+
+    def _frames_fosa(self, fosa_ms: int) -> int:
+        return max(1, fosa_ms * self._frequencia // 1000)
+
+    def aturar_tot(self):
+        for veu in self._veus:
+            veu.aturada = True
+        self._veus = ()
+
+    def canviar_volum(self, volum: float, veus: List[VeuMescla]):
+        self.volum_master = volum
+
+    def ocupacio(self) -> Tuple[int, int]:
+        """Veus que el callback encara mescla i màxim de veus."""
+        return sum(not v.acabada for v in self._veus), self.capacitat
+
+    def _callback(self, outdata, frames, time_info, status):
+        # Fil d'àudio de PortAudio: només operacions NumPy sobre buffers ja assignats
+        ara = time.perf_counter()
+        if self._ultim_callback is not None and ara - self._ultim_callback > self.interval_maxim:
+            self.interval_maxim = ara - self._ultim_callback
+        self._ultim_callback = ara
+        if status.output_underflow:
+            self.underruns += 1
+        if frames != len(self._rampa):
+            self._preparar_buffers(frames)
+        outdata.fill(0.0)
+        temporal = self._temporal
+        for veu in self._veus:
+            if veu.acabada:
+                continue
+            escrits = 0
+            while escrits < frames:
+                tros = veu.dades[veu.posicio:veu.posicio + frames - escrits]
+                n = len(tros)
+                np.multiply(tros, veu.guany, out=temporal[escrits:escrits + n])
+                veu.posicio += n
+                escrits += n
+                if not veu.bucle:
+                    break
+                if veu.posicio >= len(veu.dades):
+                    veu.posicio = 0
+            if veu.pas:
+                # Fosa lineal mostra a mostra, contínua entre blocs
+                envolupant = self._guanys[:escrits]
+                np.multiply(self._passos[:escrits], veu.pas, out=envolupant)
+                envolupant += veu.envolupant
+                np.clip(envolupant, 0.0, 1.0, out=envolupant)
+                temporal[:escrits] *= envolupant[:, None]
+                veu.envolupant = float(envolupant[-1]) if escrits else veu.envolupant
+                if veu.envolupant <= 0.0:
+                    veu.aturada = True
+                elif veu.envolupant >= 1.0:
+                    veu.pas = 0.0
+            outdata[:escrits] += temporal[:escrits]
+
+        outdata *= self.volum_master
+
+        # Limitador: atac immediat dins del bloc, alliberament progressiu entre blocs
+        pic = max(float(outdata.max()), -float(outdata.min()))
+        objectiu = min(1.0, self.SOSTRE / pic) if pic > 0.0 else 1.0
+        g0 = self._guany_limitador
+        if objectiu < g0:
+            g1 = objectiu
+            outdata *= g1
+        else:
+            g1 = g0 + (objectiu - g0) * self.ALLIBERAMENT
+            if g0 < 1.0:
+                np.multiply(self._rampa, g1 - g0, out=self._guanys)
+                self._guanys += g0
+                outdata *= self._guanys[:, None]
+        self._guany_limitador = g1
+        np.clip(outdata, -1.0, 1.0, out=outdata)
+
+
+def crear_sortida(cfg: ConfiguracioMixer):
+    """Crea i inicia la sortida d'àudio que indica `cfg.motor` i actualitza MIXER_OK."""
+    global MIXER_OK
+    sortida = MotorMescla(cfg) if cfg.motor == "numpy" else SortidaPygame(cfg)
+    MIXER_OK = sortida.iniciar(cfg)
+    return sortida
+
+
+# --- Instrumentació del camí de disparament ---
+ARXIU_ESTADISTIQUES = SCRIPT_DIR / "estadistiques.log"
+MOSTRES_ESTADISTIQUES = 256  # esdeveniments recents que resumeix el panell
+INTERVAL_LAG_TK_MS = 100
+LLINDAR_LAG_TK_MS = 50.0  # només els retards del bucle de Tk més grans que això van al registre
+
+
+@dataclass
+class Disparament:
+    """Instants (time.perf_counter) d'un disparament, de la tecla o el clic fins a la reproducció."""
+    id_boto: int
+    origen: float  # tecla o clic: DespatxadorAudio.disparar
+    despatx: float  # el despatxador treu l'ordre de la cua
+    mostra: float  # el so ja és descodificat
+    play: float  # la sortida ja el reprodueix
+    motiu: str  # d'on ha sortit la mostra: "memòria cau", "descodificat" o "esperant precàrrega"
+    robada: bool  # la sortida era plena i s'ha robat una veu
+    veus: int
+    ocupats: int  # canals (pygame) o veus (motor propi) que sonen
+    capacitat: int
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id_boto,
+            "cua_ms": round((self.despatx - self.origen) * 1000.0, 3),
+            "mostra_ms": round((self.mostra - self.despatx) * 1000.0, 3),
+            "play_ms": round((self.play - self.mostra) * 1000.0, 3),
+            "total_ms": round((self.play - self.origen) * 1000.0, 3),
+            "motiu": self.motiu,
+            "robada": self.robada,
+            "veus": self.veus,
+            "ocupats": self.ocupats,
+            "capacitat": self.capacitat,
+        }
+
+
+def _percentil(ordenats: List[float], q: float) -> float:
+    return ordenats[min(len(ordenats) - 1, int(q * len(ordenats)))] if ordenats else 0.0
+
+
+class Instrumentacio:
+    """
+    Temps de cada disparament i retard del bucle de Tk, per al panell d'estadístiques.
+
+    Només es mesura mentre `activa` és cert; si no, el camí de disparament només consulta
+    aquest booleà. Els esdeveniments es guarden en cues circulars per al panell i, com a
+    línies JSON, en un registre rotatiu (ARXIU_ESTADISTIQUES) per analitzar-los després.
+    """
+
+    def __init__(self, cami_registre: Path = ARXIU_ESTADISTIQUES):
+        self.activa = False
+        self.disparaments: "deque[Disparament]" = deque(maxlen=MOSTRES_ESTADISTIQUES)
+        self.lag_tk: "deque[float]" = deque(maxlen=MOSTRES_ESTADISTIQUES)
+        self._cami_registre = cami_registre
+        self._registre: Optional[logging.Logger] = None
+
+    def registrar_disparament(self, disparament: Disparament):
+        self.disparaments.append(disparament)
+        self._escriure(dict(esdeveniment="disparament", **disparament.to_dict()))
+
+    def registrar_lag_tk(self, ms: float):
+        self.lag_tk.append(ms)
+        if ms > LLINDAR_LAG_TK_MS:
+            self._escriure({"esdeveniment": "lag_tk", "ms": round(ms, 1)})
+
+    def resum(self) -> Dict[str, Any]:
+        """Percentils dels disparaments recents (total i per tram) i del retard de Tk, en ms."""
+        disparaments = list(self.disparaments)
+        trams = {
+            "total": [d.play - d.origen for d in disparaments],
+            "cua": [d.despatx - d.origen for d in disparaments],
+            "mostra": [d.mostra - d.despatx for d in disparaments],
+            "play": [d.play - d.mostra for d in disparaments],
+        }
+        resum: Dict[str, Any] = {"n": len(disparaments), "ultim": disparaments[-1] if disparaments else None}
+        for nom, valors in trams.items():
+            ordenats = sorted(v * 1000.0 for v in valors)
+            resum[nom] = {"p50": _percentil(ordenats, 0.5), "p95": _percentil(ordenats, 0.95),
+                          "max": ordenats[-1] if ordenats else 0.0}
+        lag = list(self.lag_tk)
+        resum["lag_tk"] = {"ultim": lag[-1] if lag else 0.0, "max": max(lag, default=0.0)}
+        return resum
+
+    def _escriure(self, dades: Dict[str, Any]):
+        if self._registre is None:
+            self._registre = logging.getLogger("Botonera.estadistiques")
+            self._registre.propagate = False
+            try:
+                gestor = logging.handlers.RotatingFileHandler(self._cami_registre, maxBytes=1024 * 1024,
+                                                              backupCount=3, encoding="utf-8", delay=True)
+                self._registre.addHandler(gestor)
+            except OSError as e:
+                LOG.warning("No s'ha pogut obrir el registre d'estadístiques %s: %s", self._cami_registre, e)
+        self._registre.info(json.dumps(dict(t=round(time.time(), 3), **dades), ensure_ascii=False))
+
+
+# --- Escaleta del show: registre dels sons i mescla fora de línia ---
+ESCALETES_DIR = SCRIPT_DIR / "escaletes"
+EXTENSIO_ESCALETA = ".escaleta"
+VERSIO_ESCALETA = 1
+FRAMES_TROS_RENDER = 64 * FRAMES_PER_BUFFER  # la memòria del render depèn d'això, no de la durada del show
+
+
+class RegistreEscaleta:
+    """
+    Escaleta del show: cada veu que comença o s'atura i cada canvi de volum, tal com els
+    executa el despatxador, per poder tornar a mesclar el show amb renderitzar_escaleta.
+
+    Una línia JSON per esdeveniment, amb el temps en ms des de l'obertura de l'arxiu:
+      [t, "+", veu, arxiu, id_boto, guany, bucle, fosa_ms]   comença una veu
+      [t, "-", veu, fosa_ms]                                  s'atura una veu, amb fade-out si fosa_ms > 0
+      [t, "x"]                                                s'atura tot de cop
+      [t, "v", volum]                                         volum general
+    Cada camí es declara un sol cop amb ["a", arxiu, camí] i després només se'n fa servir el número.
+    L'arxiu s'obre amb el primer so: una sessió en què no sona res no deixa cap escaleta.
+    Només s'hi escriu des del fil del despatxador.
+    """
+
+    def __init__(self, volum_actual, carpeta: Optional[Path] = None):
+        self.volum_actual = volum_actual  # funció: el volum general quan s'obre l'arxiu
+        self.carpeta = carpeta or ESCALETES_DIR
+        self.cami: Optional[Path] = None
+        self._arxiu = None
+        self._t0 = 0.0
+        self._camins: Dict[str, int] = {}
+        self._veus = 0
+        self._volum: Optional[float] = None  # l'últim volum que ha aplicat el despatxador
+        self._error = False
+
+    def inici(self, instant: float, arxiu: str, id_boto: int, guany: float, bucle: bool, fosa_ms: int) -> int:
+        """Anota una veu nova i en retorna el número."""
+        if self._arxiu is None and not self._obrir(instant):
+            return 0
+        n = self._camins.get(arxiu)
+        if n is None:
+            n = self._camins[arxiu] = len(self._camins)
+            self._escriure(["a", n, arxiu])
+        self._veus += 1
+        self._escriure([self._ms(instant), "+", self._veus, n, id_boto, round(guany, 4), int(bucle), fosa_ms])
+        return self._veus
+
+    def aturar(self, veu: int, fosa_ms: int = 0):
+        if self._arxiu is not None and veu:
+            self._escriure([self._ms(time.perf_counter()), "-", veu, fosa_ms])
+
+    def aturar_tot(self):
+        if self._arxiu is not None:
+            self._escriure([self._ms(time.perf_counter()), "x"])
+
+    def volum(self, volum: float):
+        self._volum = volum
+        if self._arxiu is not None:
+            self._escriure([self._ms(time.perf_counter()), "v", round(volum, 4)])
+
+    def tancar(self):
+        """Tanca l'escaleta (el que encara sona s'hi talla); el proper so n'obrirà una de nova."""
+        if self._arxiu is None:
+            return
+        self.aturar_tot()
+        self._arxiu.close()
+        self._arxiu = None
+        LOG.info("Escaleta tancada: %s", self.cami)
+
+    def _obrir(self, instant: float) -> bool:
+        if self._error:
+            return False
+        try:
+            self.carpeta.mkdir(parents=True, exist_ok=True)
+            self.cami = self.carpeta / f"{datetime.now():%Y%m%d_%H%M%S}{EXTENSIO_ESCALETA}"
+            # Una línia per esdeveniment: si el programa es tanca de cop, l'escaleta arriba fins a l'últim so
+            self._arxiu = open(self.cami, "a", encoding="utf-8", buffering=1)
+        except OSError as e:
+            LOG.warning("No s'ha pogut crear l'escaleta %s: %s", self.cami, e)
+            self._error = True
+            return False
+        self._t0 = instant
+        self._camins.clear()
+        capcalera = {"versio": VERSIO_ESCALETA, "inici": datetime.now().isoformat(timespec="milliseconds"),
+                     "volum": round(self.volum_actual() if self._volum is None else self._volum, 4)}
+        self._arxiu.write(json.dumps(capcalera) + "\n")
+        LOG.info("Escaleta nova: %s", self.cami)
+        return True
+
+    def _ms(self, instant: float) -> int:
+        return max(0, int(round((instant - self._t0) * 1000)))
+
+    def _escriure(self, esdeveniment: list):
+        try:
+            self._arxiu.write(json.dumps(esdeveniment, ensure_ascii=False, separators=(",", ":")) + "\n")
+        except OSError as e:
+            LOG.warning("No s'ha pogut escriure a l'escaleta: %s", e)
+
+
+@dataclass
+class VeuRender:
+    """Una veu de l'escaleta, en frames de la mescla."""
+    arxiu: str
+    inici: int
+    guany: float
+    bucle: bool
+    fosa_entrada: int
+    parada: Optional[int] = None  # frame en què comença a callar
+    fosa_sortida: int = 0
+    fi: float = math.inf  # primer frame en què ja no sona
+    dades: Optional[np.ndarray] = None
+
+
+def llegir_escaleta(cami: Path, frequencia: int) -> Tuple[Dict[str, Any], List[VeuRender], List[Tuple[int, float]]]:
+    """Llegeix una escaleta: capçalera, veus ordenades per inici i canvis de volum (frame, volum)."""
+    camins: Dict[int, str] = {}
+    veus: Dict[int, VeuRender] = {}
+    final = 0
+    with open(cami, "r", encoding="utf-8") as f:
+        capcalera = json.loads(f.readline())
+        if capcalera.get("versio", 0) > VERSIO_ESCALETA:
+            raise ValueError(f"Escaleta de versió {capcalera['versio']}, més nova que aquesta botonera")
+        volums = [(0, float(capcalera.get("volum", 1.0)))]
+        for linia in f:
+            try:
+                e = json.loads(linia)
+            except ValueError:
+                continue  # l'última línia pot haver quedat a mitges
+            if e[0] == "a":
+                camins[e[1]] = e[2]
+                continue
+            frame = e[0] * frequencia // 1000
+            final = max(final, frame)
+            if e[1] == "+":
+                veus[e[2]] = VeuRender(camins[e[3]], frame, float(e[5]), bool(e[6]), e[7] * frequencia // 1000)
+            elif e[1] == "-" and e[2] in veus:
+                veu = veus[e[2]]
+                fosa = e[3] * frequencia // 1000
+                if veu.parada is None:
+                    veu.parada, veu.fosa_sortida = frame, fosa
+                veu.fi = min(veu.fi, frame + fosa)
+            elif e[1] == "x":
+                for veu in veus.values():
+                    if veu.parada is None:
+                        veu.parada = frame
+                    veu.fi = min(veu.fi, frame)
+            elif e[1] == "v":
+                volums.append((frame, float(e[2])))
+    # Si l'escaleta no es va tancar bé, els bucles que encara sonaven acaben a l'últim esdeveniment
+    for veu in veus.values():
+        if veu.bucle and veu.fi == math.inf:
+            veu.parada, veu.fi = final, final
+    return capcalera, sorted(veus.values(), key=lambda v: v.inici), volums
+
+
+def _mostra_render(cami: Path, cfg: ConfiguracioMixer) -> np.ndarray:
+    """Float32 estèreo a la freqüència de `cfg`; els sons llargs es mapen des del magatzem PCM, com al motor propi."""
+    if es_so_llarg(cami, cfg.frequencia, 4, cfg.llindar_flux_mb * 1024 * 1024):
+        return MAGATZEM_PCM.obtenir(cami, cfg.frequencia, "float32")
+    return llegir_pcm(cami, cfg.frequencia)
+
+
+def _mesclar_veu(veu: VeuRender, mescla: np.ndarray, inici_tros: int, temporal: np.ndarray):
+    """Suma a `mescla` (que comença al frame `inici_tros`) el tros de la veu que hi cau, amb guany i foses."""
+    a = max(veu.inici, inici_tros)
+    b = int(min(veu.fi, inici_tros + len(mescla)))
+    if a >= b:
+        return
+    n = b - a
+    desti = temporal[:n]
+    posicio = a - veu.inici
+    escrits = 0
+    while escrits < n:
+        p = (posicio + escrits) % len(veu.dades) if veu.bucle else posicio + escrits
+        tros = veu.dades[p:p + n - escrits]
+        desti[escrits:escrits + len(tros)] = tros
+        escrits += len(tros)
+    en_fosa = (veu.fosa_entrada and posicio < veu.fosa_entrada) or (veu.parada is not None and b > veu.parada)
+    if en_fosa:
+        # Foses lineals, com les del motor propi: l'envolupant només es calcula als trossos que en tenen
+        frames = np.arange(a, b, dtype=np.float64)
+        envolupant = np.ones(n)
+        if veu.fosa_entrada:
+            envolupant = np.clip((frames - veu.inici + 1) / veu.fosa_entrada, 0.0, 1.0)
+        if veu.parada is not None and b > veu.parada:
+            nivell = min(1.0, (veu.parada - veu.inici) / veu.fosa_entrada) if veu.fosa_entrada else 1.0
+            sortida = nivell * (1.0 - (frames - veu.parada) / veu.fosa_sortida) if veu.fosa_sortida else 0.0
+            envolupant = np.where(frames >= veu.parada, np.clip(sortida, 0.0, 1.0), envolupant)
+        desti *= (envolupant * veu.guany).astype(np.float32)[:, None]
+    else:
+        desti *= veu.guany
+    mescla[a - inici_tros:b - inici_tros] += desti
+
+
+def _limitar(mescla: np.ndarray, guany: float, frames_bloc: int) -> float:
+    """
+    El limitador de MotorMescla aplicat a `mescla` com si arribés en blocs de `frames_bloc`.
+
+    Només el guany de cada bloc depèn de l'anterior: aquest bucle és escalar i la resta són
+    operacions sobre tot el tros. Retorna el guany del limitador al final del tros.
+    """
+    blocs = mescla.reshape(-1, frames_bloc, 2)
+    pics = np.abs(blocs).max(axis=(1, 2))
+    objectius = np.minimum(1.0, MotorMescla.SOSTRE / np.maximum(pics, 1e-12))
+    g0 = np.empty(len(pics))
+    g1 = np.empty(len(pics))
+    for i, objectiu in enumerate(objectius.tolist()):
+        g0[i] = guany
+        guany = objectiu if objectiu < guany else guany + (objectiu - guany) * MotorMescla.ALLIBERAMENT
+        g1[i] = guany
+    if (g0 < 1.0).any() or (g1 < 1.0).any():
+        rampa = np.arange(1, frames_bloc + 1) / frames_bloc
+        # Atac immediat (guany constant al bloc) o alliberament en rampa, com al callback
+        guanys = np.where((g1 < g0)[:, None], g1[:, None], g0[:, None] + rampa * (g1 - g0)[:, None])
+        blocs *= guanys.astype(np.float32)[:, :, None]
+    return guany
+
+
+def renderitzar_escaleta(cami: Path, desti: Path, cfg: Optional[ConfiguracioMixer] = None,
+                         frames_tros: int = FRAMES_TROS_RENDER) -> Dict[str, Any]:
+    """
+    Torna a mesclar una escaleta en un WAV estèreo, tros a tros i tan ràpid com es pugui.
+
+    La mescla segueix el motor propi: guany de cada veu, foses lineals, volum general i el
+    mateix limitador. Cada tros només llegeix les veus que hi sonen i s'escriu de seguida,
+    així que la memòria depèn de `frames_tros` (i de la memòria cau dels sons curts), no de
+    la durada. Els arxius que no es poden llegir es deixen en silenci i es retornen a "omesos".
+    `cfg` és la configuració del mixer (freqüència i llindar dels sons en flux), la mateixa que en directe.
+    """
+    cfg = cfg or ConfiguracioMixer()
+    frequencia = cfg.frequencia
+    t0 = time.perf_counter()
+    _capcalera, veus, volums = llegir_escaleta(cami, frequencia)
+    frames_volum = np.array([f for f, _ in volums])
+    valors_volum = np.array([v for _, v in volums], dtype=np.float32)
+    frames_tros = max(1, frames_tros // FRAMES_PER_BUFFER) * FRAMES_PER_BUFFER
+    mescla = np.zeros((frames_tros, 2), dtype=np.float32)
+    temporal = np.empty_like(mescla)
+    pcm = np.empty(mescla.shape, dtype=np.int16)
+    mostres = CacheMostres(MEMORIA_CACHE_MB * 1024 * 1024, lambda c: _mostra_render(c, cfg))
+    pendents = deque(veus)
+    actives: List[VeuRender] = []
+    omesos: set = set()
+    final = 0
+    inici = 0
+    guany_limitador = 1.0
+    with sf.SoundFile(str(desti), "w", samplerate=frequencia, channels=2, subtype="PCM_16") as sortida:
+        while pendents or actives:
+            fi_tros = inici + frames_tros
+            while pendents and pendents[0].inici < fi_tros:
+                veu = pendents.popleft()
+                try:
+                    veu.dades = mostres.obtenir(resoldre_cami(veu.arxiu))
+                except Exception as e:
+                    if veu.arxiu not in omesos:
+                        LOG.warning("Escaleta: no es pot llegir %s (%s); queda en silenci", veu.arxiu, e)
+                        omesos.add(veu.arxiu)
+                    continue
+                if not veu.bucle:
+                    veu.fi = min(veu.fi, veu.inici + len(veu.dades))
+                if len(veu.dades) and veu.fi > veu.inici:
+                    actives.append(veu)
+                    final = max(final, int(veu.fi))
+            mescla.fill(0.0)
+            for veu in actives:
+                _mesclar_veu(veu, mescla, inici, temporal)
+            actives = [v for v in actives if v.fi > fi_tros]
+
+            # Volum general: un sol valor si no canvia dins del tros
+            i0, i1 = np.searchsorted(frames_volum, [inici, fi_tros - 1], side="right") - 1
+            if i0 == i1:
+                mescla *= valors_volum[i0]
+            else:
+                idx = np.searchsorted(frames_volum, np.arange(inici, fi_tros), side="right") - 1
+                mescla *= valors_volum[idx][:, None]
+            guany_limitador = _limitar(mescla, guany_limitador, FRAMES_PER_BUFFER)
+            np.clip(mescla, -1.0, 1.0, out=mescla)
+            # La conversió a int16 es fa aquí, sobre un buffer fix: libsndfile la fa unes quatre vegades més lenta
+            mescla *= 32767.0
+            np.copyto(pcm, mescla, casting="unsafe")
+            n = frames_tros if (pendents or actives) else max(0, min(frames_tros, final - inici))
+            sortida.write(pcm[:n])
+            inici = fi_tros
+    durada = final / frequencia
+    temps = time.perf_counter() - t0
+    LOG.info("Escaleta renderitzada a %s: %.1f s d'àudio en %.2f s (%.0fx temps real)",
+             desti, durada, temps, durada / temps if temps > 0 else 0.0)
+    return {"desti": str(desti), "durada_s": durada, "temps_s": temps, "veus": len(veus), "omesos": sorted(omesos)}
+
+
+# --- Despatxador d'àudio: l'únic fil que fa crides a la sortida d'àudio ---
+PRIORITAT_VEU = {"polifonic": 0, "redisparar": 1, "commutar": 1, "bucle": 2}  # la més baixa es roba primer
+PRIORITAT_SORTINT = -1  # les veus que ja s'estan esvaint es roben abans que cap altra
+
+
+@dataclass
+class Veu:
+    """Un so que està sonant, tal com l'ha retornat la sortida d'àudio."""
+    handle: Any
+    fi_previst: float  # time.perf_counter() en què hauria d'acabar (math.inf si fa bucle)
+    inici: float
+    prioritat: int
+    num: int = 0  # número de la veu a l'escaleta
+
+
+class DespatxadorAudio:
+    """
+    Fil dedicat que executa totes les ordres de reproducció.
+
+    Els gestors de tecles globals i de clics només encuen (ordre, valor, instant) a una
+    queue.SimpleQueue, que no bloqueja mai qui hi escriu; així el fil del teclat torna de
+    seguida i la sortida d'àudio només es toca des d'aquest fil. Els canvis d'estat i els
+    errors es comuniquen a la interfície a través de BotoneraApp._executar_a_ui.
+
+    No hi ha cap sondeig periòdic: el fil dorm fins a la propera ordre o fins a l'instant
+    en què hauria d'acabar la veu més propera, i només llavors consulta la sortida.
+
+    Cada botó pot tenir diverses veus segons el seu mode (MODES_REPRODUCCIO). Quan les veus
+    arriben a la capacitat de la sortida, es roba la de prioritat més baixa i, dins d'aquesta,
+    la més antiga: primer els trets polifònics, després els sons d'un sol tret i els bucles al final.
+
+    Les foses les fa la mateixa sortida d'àudio al seu callback; el despatxador només
+    programa l'inici i recorda les veus que s'estan esvaint fins que callen del tot.
+
+    Tot el que realment comença, s'atura o canvia de volum s'anota a l'escaleta del show
+    (RegistreEscaleta), sempre després d'haver-ho fet a la sortida.
+    """
+
+    MARGE_FI = 0.01  # segons d'espera extra si la veu encara sona a l'instant previst
+
+    def __init__(self, app: "BotoneraApp", sortida):
+        self.app = app
+        self.sortida = sortida
+        self._cua: queue.SimpleQueue = queue.SimpleQueue()
+        self._veus: Dict[int, List[Veu]] = {}  # id botó -> veus, de la més antiga a la més nova
+        self._sortints: List[Veu] = []  # veus en fade-out, ja desvinculades del botó
+        self._propera_alimentacio: Optional[float] = None  # quan cal tornar a alimentar els sons en flux
+        self._esperant_precarrega: Dict[int, Future] = {}  # id botó -> precàrrega que n'espera el disparament
+        self.instrumentacio = Instrumentacio()
+        self.escaleta = RegistreEscaleta(app.get_volum_actual)
+        self.observadors: List = []  # funcions (id_boto, sonant) cridades des d'aquest fil, p. ex. el control remot
+        self._fil = threading.Thread(target=self._bucle, name="despatxador-audio", daemon=True)
+        self._fil.start()
+
+    # ---------- API: es pot cridar des de qualsevol fil ----------
+    def disparar(self, id_boto: int):
+        self._cua.put(("disparar", id_boto, time.perf_counter()))
+
+    def aturar_tot(self):
+        self._cua.put(("aturar_tot", None, time.perf_counter()))
+
+    def fondre_tot(self, fosa_ms: int = FOSA_PANIC_MS):
+        self._cua.put(("fondre_tot", fosa_ms, time.perf_counter()))
+
+    def ids_sonant(self) -> set:
+        """Instantània dels botons que tenen alguna veu (p. ex. en canviar de pàgina)."""
+        return set(list(self._veus))
+
+    def canviar_volum(self, volum: float):
+        self._cua.put(("volum", volum, time.perf_counter()))
+
+    def nova_escaleta(self):
+        """Tanca l'escaleta actual: el proper so en començarà una altra."""
+        self._cua.put(("executar", (self.escaleta.tancar, None), time.perf_counter()))
+
+    def executar(self, funcio, en_acabar=None):
+        """Executa `funcio()` al fil d'àudio i, si cal, `en_acabar(resultat)` al fil de Tk."""
+        self._cua.put(("executar", (funcio, en_acabar), time.perf_counter()))
+
+    def tancar(self, timeout: float = 1.0):
+        self._cua.put(("sortir", None, time.perf_counter()))
+        self._fil.join(timeout)
+
+    # ---------- Només des del fil d'àudio (p. ex. dins d'executar) ----------
+    def reiniciar_sortida(self, cfg: ConfiguracioMixer) -> bool:
+        """Tanca la sortida actual i en crea una de nova amb `cfg`."""
+        self.tancar_sortida()
+        self.sortida = crear_sortida(cfg)
+        self.app.cache_mostres.canviar_descodificador(self.sortida.descodificar)
+        return MIXER_OK
+
+    def tancar_sortida(self):
+        global MIXER_OK
+        self.oblidar_veus()
+        self.sortida.tancar()
+        MIXER_OK = False
+        self.app.cache_mostres.buidar()
+
+    def oblidar_veus(self):
+        """Descarta totes les veus, p. ex. abans de reiniciar la sortida."""
+        for id_boto in list(self._veus):
+            self._acabar_boto(id_boto)
+        self._sortints.clear()
+
+    # ---------- Fil d'àudio ----------
+    def _bucle(self):
+        # És l'únic fil que fa sonar res: cap excepció no l'ha d'aturar
+        while True:
+            ordre = None
+            try:
+                self._alimentar()
+                try:
+                    ordre, valor, instant = self._cua.get(timeout=self._temps_fins_propera_fi())
+                except queue.Empty:
+                    self._revisar_veus()
+                    continue
+                if ordre == "sortir":
+                    break
+                self._executar_ordre(ordre, valor, instant)
+            except Exception:
+                LOG.exception("Error al despatxador d'àudio (ordre %s)", ordre)
+        for tancar in (self.sortida.tancar, self.escaleta.tancar):
+            try:
+                tancar()
+            except Exception:
+                LOG.exception("Error tancant el despatxador d'àudio")
+
+    def _executar_ordre(self, ordre: str, valor, instant: float):
+        if ordre == "disparar":
+            self._disparar(valor, instant)
+        elif ordre == "disparar_precarregat":
+            id_boto, precarrega = valor
+            # Si mentrestant una pulsació ja ha disparat el botó, aquest disparament és vell
+            if self._esperant_precarrega.get(id_boto) is precarrega:
+                del self._esperant_precarrega[id_boto]
+                self._disparar(id_boto, instant, esperat=True)
+        elif ordre == "aturar_tot":
+            self._aturar_tot()
+        elif ordre == "fondre_tot":
+            for id_boto in list(self._veus):
+                self._acabar_boto(id_boto, valor)
+        elif ordre == "volum":
+            self.sortida.canviar_volum(valor, [v.handle for veus in self._veus.values() for v in veus])
+            self.escaleta.volum(valor)
+        elif ordre == "executar":
+            funcio, en_acabar = valor
+            resultat = funcio()
+            if en_acabar is not None:
+                self.app._executar_a_ui(lambda: en_acabar(resultat))
+
+    def _temps_fins_propera_fi(self) -> Optional[float]:
+        """Segons fins que acabi la veu més propera, o None (esperar indefinidament) si no n'hi ha cap que hagi d'acabar."""
+        fins = [v.fi_previst for veus in self._veus.values() for v in veus if v.fi_previst != math.inf]
+        fins += [v.fi_previst for v in self._sortints]
+        if self._propera_alimentacio is not None:
+            fins.append(self._propera_alimentacio)
+        if not fins:
+            return None
+        return max(0.0, min(fins) - time.perf_counter())
+
+    def _disparar(self, id_boto: int, instant: float, esperat: bool = False):
+        despatx = time.perf_counter()
+        if not MIXER_OK:
+            LOG.warning("Intent de reproduir sense mixer disponible.")
+            return
+
+        cfg = self.app._config_per_id(id_boto)
+        veus = [v for v in self._veus.get(id_boto, []) if self.sortida.sonant(v.handle)]
+        mode = cfg.mode if cfg is not None and cfg.mode in MODES_REPRODUCCIO else "commutar"
+
+        # En commutar i en bucle, tornar a prémer atura
+        if veus and mode in ("commutar", "bucle"):
+            self._acabar_boto(id_boto, cfg.fosa_sortida_ms if cfg is not None else 0)
+            return
+
+        if cfg is None or not cfg.arxiu:
+            LOG.warning("No hi ha arxiu assignat al botó id=%s", id_boto)
+            return
+
+        cami = resoldre_cami(cfg.arxiu)
+
+        # Si el so encara s'està precarregant, tornem a encuar el disparament (amb l'instant original) quan acabi.
+        # Les pulsacions repetides mentre s'espera la mateixa precàrrega s'ignoren, i una pulsació que arriba
+        # entre el final de la precàrrega i el disparament encuat el deixa sense efecte: si no, en commutar o
+        # en bucle el segon disparament aturaria la veu que acaba d'engegar el primer.
+        pendent = self.app.cache_mostres.pendent(cami)
+        if pendent is not None:
+            if self._esperant_precarrega.get(id_boto) is not pendent:
+                self._esperant_precarrega[id_boto] = pendent
+                pendent.add_done_callback(
+                    lambda _f: self._cua.put(("disparar_precarregat", (id_boto, pendent), instant)))
+            return
+        self._esperant_precarrega.pop(id_boto, None)
+
+        instrumentar = self.instrumentacio.activa
+        if instrumentar:
+            motiu = "esperant precàrrega" if esperat else "memòria cau" if self.app.cache_mostres.conte(cami) else "descodificat"
+        try:
+            mostra = self.app.cache_mostres.obtenir(cami)
+        except FileNotFoundError:
+            LOG.error("Arxiu no trobat: %s", cami)
+            self._avisar("Error d'arxiu", f"No s'ha trobat l'arxiu:\n{cfg.arxiu}")
+            return
+        except Exception as e:
+            LOG.exception("Error descodificant %s: %s", cami, e)
+            self._avisar("Error de reproducció", f"Error en reproduir l'arxiu:\n{e}")
+            return
+        t_mostra = time.perf_counter()
+
+        # Veus del mateix botó que han de callar abans de començar la nova
+        if mode == "redisparar":
+            sobrants = veus
+        elif mode == "polifonic":
+            sobrants = veus[:max(0, len(veus) - max(1, cfg.max_veus) + 1)]
+        else:
+            sobrants = []
+        for veu in sobrants:
+            self.sortida.aturar(veu.handle)
+            self.escaleta.aturar(veu.num)
+            veus.remove(veu)
+        if veus:
+            self._veus[id_boto] = veus
+        else:
+            self._veus.pop(id_boto, None)
+
+        # Grup exclusiu: el botó nou fa callar els altres del mateix grup; amb fade-in és un crossfade
+        if cfg.grup:
+            for altre in list(self._veus):
+                altre_cfg = self.app._config_per_id(altre)
+                if altre != id_boto and altre_cfg is not None and altre_cfg.grup == cfg.grup:
+                    self._acabar_boto(altre, cfg.fosa_entrada_ms or altre_cfg.fosa_sortida_ms)
+
+        robada = self._alliberar_veu()
+
+        bucle = mode == "bucle"
+        guany = cfg.guany * self.app.index_loudness.guany(cami) if cfg.normalitzar else cfg.guany
+        try:
+            handle = self.sortida.reproduir(mostra, guany, self.app.get_volum_actual(), bucle, cfg.fosa_entrada_ms)
+        except Exception as e:
+            LOG.exception("Error reproduint %s: %s", cami, e)
+            self._avisar("Error de reproducció", f"Error en reproduir l'arxiu:\n{e}")
+            return
+        ara = time.perf_counter()
+        fi = math.inf if bucle else ara + self.sortida.durada(mostra)
+        # _alliberar_veu pot haver tret veus d'aquest mateix botó
+        num = self.escaleta.inici(ara, cfg.arxiu, id_boto, guany, bucle, cfg.fosa_entrada_ms)
+        self._veus.setdefault(id_boto, []).append(Veu(handle, fi, ara, PRIORITAT_VEU.get(mode, 1), num))
+        self._propera_alimentacio = ara  # si la veu és en flux, a la propera volta se n'encarrega _alimentar
+        self._publicar(id_boto, True)
+        # Si la sortida ha hagut de reaprofitar un canal o una veu, l'anterior ja no sona
+        self._netejar_veus(self._reaprofitada)
+        if instrumentar:
+            ocupats, capacitat = self.sortida.ocupacio()
+            self.instrumentacio.registrar_disparament(Disparament(
+                id_boto, instant, despatx, t_mostra, ara, motiu, robada, self.nombre_veus(), ocupats, capacitat))
+
+    def _reaprofitada(self, veu: Veu) -> bool:
+        if self.sortida.sonant(veu.handle):
+            return False
+        self.escaleta.aturar(veu.num)
+        return True
+
+    def nombre_veus(self) -> int:
+        return sum(len(veus) for veus in self._veus.values()) + len(self._sortints)
+
+    def _alimentar(self):
+        """Deixa que la sortida prepari el tros següent dels sons llargs quan toca."""
+        if self._propera_alimentacio is None or time.perf_counter() < self._propera_alimentacio:
+            return
+        interval = None
+        self._propera_alimentacio = None  # si la sortida falla, no es torna a intentar en bucle
+        if MIXER_OK:
+            veus = [v.handle for veus in self._veus.values() for v in veus] + [v.handle for v in self._sortints]
+            interval = self.sortida.alimentar(veus)
+        self._propera_alimentacio = None if interval is None else time.perf_counter() + interval
+
+    def _alliberar_veu(self) -> bool:
+        """Si la sortida és plena, atura la veu de prioritat més baixa i més antiga. Retorna si n'ha robat cap."""
+        totes = [(v.prioritat, v.inici, id_boto, v) for id_boto, veus in self._veus.items() for v in veus]
+        totes += [(v.prioritat, v.inici, None, v) for v in self._sortints]
+        if len(totes) < self.sortida.capacitat:
+            return False
+        _prioritat, _inici, id_boto, veu = min(totes, key=lambda t: (t[0], t[1]))
+        LOG.debug("Capacitat plena: es roba una veu del botó id=%s", id_boto)
+        self.sortida.aturar(veu.handle)
+        self.escaleta.aturar(veu.num)
+        if id_boto is None:
+            self._sortints.remove(veu)
+        else:
+            self._netejar_veus(lambda v: v is veu)
+        return True
+
+    def _netejar_veus(self, acabada):
+        """Treu les veus per a les quals `acabada(veu)` és cert i publica els botons que callen."""
+        for id_boto, veus in list(self._veus.items()):
+            vives = [v for v in veus if not acabada(v)]
+            if len(vives) != len(veus):
+                self._veus[id_boto] = vives
+            if not vives:
+                self._acabar_boto(id_boto)
+
+    def _aturar_tot(self):
+        if MIXER_OK:
+            self.sortida.aturar_tot()
+        self.escaleta.aturar_tot()
+        for id_boto in list(self._veus):
+            self._acabar_boto(id_boto)
+        self._sortints.clear()
+
+    def _revisar_veus(self):
+        """Comprova només les veus que ja haurien d'haver acabat."""
+        ara = time.perf_counter()
+
+        def acabada(veu: Veu) -> bool:
+            if veu.fi_previst > ara:
+                return False
+            if MIXER_OK and self.sortida.sonant(veu.handle):
+                veu.fi_previst = ara + self.MARGE_FI  # la latència de sortida endarrereix el final
+                return False
+            return True
+
+        self._netejar_veus(acabada)
+        self._sortints = [v for v in self._sortints if not acabada(v)]
+
+    def _acabar_boto(self, id_boto: int, fosa_ms: int = 0):
+        """Atura totes les veus del botó, amb fade-out si `fosa_ms` > 0, i el marca com a aturat."""
+        veus = self._veus.pop(id_boto, None)
+        if veus is None:
+            return
+        for veu in veus:
+            if not MIXER_OK:
+                continue
+            if fosa_ms > 0 and self.sortida.sonant(veu.handle):
+                self.sortida.aturar(veu.handle, fosa_ms)
+                self.escaleta.aturar(veu.num, fosa_ms)
+                veu.fi_previst = min(veu.fi_previst, time.perf_counter() + fosa_ms / 1000)
+                veu.prioritat = PRIORITAT_SORTINT
+                self._sortints.append(veu)
+            else:
+                self.sortida.aturar(veu.handle)
+                self.escaleta.aturar(veu.num)
+        self._publicar(id_boto, False)
+
+    def _publicar(self, id_boto: int, sonant: bool):
+        for observador in list(self.observadors):
+            observador(id_boto, sonant)
+        self.app._executar_a_ui(lambda: self.app._marcar_reproduccio_per_id(id_boto, sonant))
+
+    def _avisar(self, titol: str, missatge: str):
+        self.app._executar_a_ui(lambda: messagebox.showerror(titol, missatge, parent=self.app.finestra))
+
+
+# --- Emmagatzematge de perfils: escriptura atòmica, diari i format compacte ---
+VERSIO_PERFIL = 2  # 1: perfils sense "versio" (24 botons); 2: pàgines i camps nous de ButtonConfig
+EXTENSIO_COMPACTA = ".botonera"
+MAGIC_COMPACTE = b"BOTONERA"
+TIPUS_ARXIU_PERFIL = [("Perfils JSON", "*.json"), ("Perfils compactes", "*" + EXTENSIO_COMPACTA), ("Tots els arxius", "*.*")]
+
+
+def escriure_atomic(cami: Path, dades: bytes):
+    """Escriu a un temporal del mateix directori i el posa al lloc amb os.replace: o tot o res."""
+    temporal = cami.with_name(cami.name + ".tmp")
+    with open(temporal, "wb") as f:
+        f.write(dades)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporal, cami)
+
+
+def migrar_perfil(dades: Dict[str, Any]) -> Dict[str, Any]:
+    """Porta un perfil de qualsevol versió coneguda a VERSIO_PERFIL."""
+    versio = int(dades.get("versio", 1))
+    if versio > VERSIO_PERFIL:
+        raise ValueError(f"El perfil és de la versió {versio} i aquesta botonera només entén fins a la {VERSIO_PERFIL}.")
+    if versio < 2:
+        # Els camps nous de ButtonConfig prenen el valor per defecte; tot anava a la pàgina 0
+        dades.setdefault("pagina_actual", 0)
+    dades["versio"] = VERSIO_PERFIL
+    return dades
+
+
+class PerfilCompacte:
+    """
+    Lector mandrós del format compacte (EXTENSIO_COMPACTA).
+
+    Estructura: MAGIC_COMPACTE, mida de la capçalera (uint32 little-endian), capçalera en
+    JSON i, a continuació, un bloc zlib per pàgina amb la llista de configuracions. La
+    capçalera porta les dades del perfil i l'índex pàgina -> (offset, mida), així que
+    obrir un perfil només llegeix la capçalera i la pàgina visible.
+    """
+
+    def __init__(self, cami: Path):
+        self.cami = cami
+        with open(cami, "rb") as f:
+            if f.read(len(MAGIC_COMPACTE)) != MAGIC_COMPACTE:
+                raise ValueError("No és un perfil compacte de la botonera.")
+            mida = int.from_bytes(f.read(4), "little")
+            self.capcalera: Dict[str, Any] = migrar_perfil(json.loads(f.read(mida).decode("utf-8")))
+        self._inici_dades = len(MAGIC_COMPACTE) + 4 + mida
+        self.pagines: Dict[int, Tuple[int, int]] = {int(p): tuple(v) for p, v in self.capcalera.pop("pagines").items()}
+
+    def bloc(self, pagina: int) -> bytes:
+        offset, mida = self.pagines[pagina]
+        with open(self.cami, "rb") as f:
+            f.seek(self._inici_dades + offset)
+            return f.read(mida)
+
+    def llegir_pagina(self, pagina: int) -> List[ButtonConfig]:
+        return [ButtonConfig.from_dict(d) for d in json.loads(zlib.decompress(self.bloc(pagina)).decode("utf-8"))]
+
+    @staticmethod
+    def serialitzar(capcalera: Dict[str, Any], blocs: Dict[int, bytes]) -> bytes:
+        """Munta l'arxiu a partir de la capçalera i dels blocs ja comprimits de cada pàgina."""
+        index, offset = {}, 0
+        for pagina, bloc in sorted(blocs.items()):
+            index[str(pagina)] = [offset, len(bloc)]
+            offset += len(bloc)
+        cap = json.dumps(dict(capcalera, pagines=index), ensure_ascii=False).encode("utf-8")
+        return b"".join([MAGIC_COMPACTE, len(cap).to_bytes(4, "little"), cap] + [blocs[p] for p in sorted(blocs)])
+
+    @staticmethod
+    def comprimir_pagina(configs: List[ButtonConfig]) -> bytes:
+        return zlib.compress(json.dumps([c.to_dict() for c in configs], ensure_ascii=False).encode("utf-8"))
+
+
+def dades_perfil(format_graella: str, memoria_cache_mb: int, cfg_mixer: ConfiguracioMixer,
+                 pagina_actual: int, seguent_id: int) -> Dict[str, Any]:
+    """Les dades del perfil que no són configuracions de botons."""
+    return {
+        "versio": VERSIO_PERFIL,
+        "format_graella": format_graella,
+        "memoria_cache_mb": memoria_cache_mb,
+        "mixer": cfg_mixer.to_dict(),
+        "pagina_actual": pagina_actual,
+        "seguent_id": seguent_id,
+    }
+
+
+def escriure_perfil(cami: Path, dades: Dict[str, Any], configs: List[ButtonConfig],
+                    blocs_intactes: Optional[Dict[int, bytes]] = None):
+    """
+    Desa el perfil en JSON o, si l'extensió és EXTENSIO_COMPACTA, en format compacte.
+
+    En el compacte, `blocs_intactes` són pàgines que no s'han arribat a obrir: es copien
+    tal qual, sense descomprimir-les.
+    """
+    if cami.suffix.lower() == EXTENSIO_COMPACTA:
+        per_pagina: Dict[int, List[ButtonConfig]] = {}
+        for cfg in configs:
+            per_pagina.setdefault(cfg.pagina, []).append(cfg)
+        blocs = {p: PerfilCompacte.comprimir_pagina(c) for p, c in per_pagina.items()}
+        blocs.update(blocs_intactes or {})
+        escriure_atomic(cami, PerfilCompacte.serialitzar(dades, blocs))
+    else:
+        dades = dict(dades, configuracions=[c.to_dict() for c in configs])
+        escriure_atomic(cami, json.dumps(dades, indent=4, ensure_ascii=False).encode("utf-8"))
+
+
+def llegir_perfil(cami: Path) -> Tuple[Dict[str, Any], List[ButtonConfig], Optional[PerfilCompacte]]:
+    """
+    Obre un perfil JSON o compacte i el migra a VERSIO_PERFIL.
+
+    Del compacte només es llegeix la capçalera: la llista de configuracions és buida i les
+    pàgines es llegeixen amb el PerfilCompacte retornat a mesura que calen.
+    """
+    if cami.suffix.lower() == EXTENSIO_COMPACTA:
+        lector = PerfilCompacte(cami)
+        return lector.capcalera, [], lector
+    with open(cami, "r", encoding="utf-8") as f:
+        dades = migrar_perfil(json.load(f))
+    return dades, [ButtonConfig.from_dict(d) for d in dades.get("configuracions", [])], None
+
 
-import pygame
-import keyboard  # Nota: pip install keyboard (pot requerir privilegis)
-import numpy as np
-import sounddevice as sd
-import soundfile as sf
-import tkinter as tk
-from tkinter import filedialog, messagebox, ttk, Toplevel, Label
+class DiariPerfil:
+    """
+    Diari d'autodesat: cada canvi d'un botó s'afegeix com una línia JSON a `<perfil>.diari`.
 
-# --- Config i logging ---
-logging.basicConfig(level=logging.INFO)
-LOG = logging.getLogger("Botonera")
+    Desar el perfil sencer l'esborra; si en carregar un perfil n'hi ha un, vol dir que
+    l'última sessió no va desar i els canvis es tornen a aplicar.
+    """
 
-SCRIPT_DIR = Path(__file__).resolve().parent
-PERFILS_DIR = SCRIPT_DIR / "perfils"  # <-- NOU: Directori per perfils
+    def __init__(self, cami_perfil: Path):
+        self.cami = cami_perfil.with_name(cami_perfil.name + ".diari")
 
-# --- Pygame mixer: inicialitzem amb maneig d'errors ---
-MIXER_OK = False
-try:
-    pygame.mixer.init()
-    pygame.mixer.set_num_channels(32)
-    MIXER_OK = True
-    LOG.info("pygame.mixer inicialitzat correctament.")
-except Exception as e:
-    LOG.exception("No s'ha pogut iniciar pygame.mixer: %s", e)
-    MIXER_OK = False
+    def afegir(self, cfg: ButtonConfig):
+        try:
+            with open(self.cami, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"config": cfg.to_dict()}, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+        except OSError as e:
+            LOG.warning("No s'ha pogut escriure al diari %s: %s", self.cami, e)
 
-# --- Constants d'enregistrament ---
-SAMPLERATE = 44100
-CHANNELS = 1
-DTYPE = "float32"
-FRAMES_PER_BUFFER = 1024
+    def llegir(self) -> List[ButtonConfig]:
+        """Configuracions del diari en ordre; una línia tallada per una caiguda s'ignora."""
+        canvis: List[ButtonConfig] = []
+        try:
+            with open(self.cami, "r", encoding="utf-8") as f:
+                for linia in f:
+                    try:
+                        canvis.append(ButtonConfig.from_dict(json.loads(linia)["config"]))
+                    except (ValueError, KeyError, TypeError):
+                        LOG.warning("Línia del diari %s ignorada", self.cami)
+        except FileNotFoundError:
+            pass
+        return canvis
 
-# --- Colors i paleta ---
-COLOR_BLAU = "#3c8dbc"
-COLOR_VERD = "#00a65a"
-COLOR_VERMELL = "#dd4b39"
-COLOR_TARONJA = "#f39c12"
-COLOR_LILA = "#605ca8"
-COLOR_TURQUESA = "#00c0ef"
-COLOR_GROC = "#f0db2e"
-COLOR_GRIS = "#555"
-COLOR_ROSA = "#d81b60"
-COLOR_BUIT = "#3c3c3c"
-COLOR_REPRODUINT = "#777"
+    def esborrar(self):
+        try:
+            self.cami.unlink()
+        except FileNotFoundError:
+            pass
 
-PALETA_COLORS_DICT = {
-    "Blau": COLOR_BLAU,
-    "Verd": COLOR_VERD,
-    "Vermell": COLOR_VERMELL,
-    "Taronja": COLOR_TARONJA,
-    "Lila": COLOR_LILA,
-    "Turquesa": COLOR_TURQUESA,
-    "Groc": COLOR_GROC,
-    "Gris": COLOR_GRIS,
-    "Rosa": COLOR_ROSA,
-    "Botó Buit": COLOR_BUIT,
-}
-REVERSE_PALETA = {v: k for k, v in PALETA_COLORS_DICT.items()}
 
-LLISTA_EMOJIS = [
-    "➕", "🎙️", "👏", "😂", "🎺", "❌", "🚪", "🥁", "👽", "📞", "🐶", "🐱", "💥",
-    "💧", "🚗", "🔔", "👻", "🤖", "⚡️", "🌊", "🎵", "🎶", "🎤", "🎧", "🔈",
-    "🔊", "🔥", "💨", "💬", "🛑", "✅", "⛔", "⚠️", "💯", "💸", "💡", "💣",
-    "💀", "❤️", "⭐", "🎉", "🤯", "🤔", "...", "1️⃣", "2️⃣", "3️⃣", "4️⃣", "5️⃣",
-]
+# --- Paquets de perfil: perfil i àudio ja convertit en un sol arxiu ---
+EXTENSIO_PAQUET = ".paquet"
+PAQUETS_DIR = SCRIPT_DIR / "paquets"
+
+
+def pcm_int16(dades: np.ndarray) -> np.ndarray:
+    """float32 [-1, 1] -> int16, el format natiu de pygame.mixer (size=-16)."""
+    return np.clip(dades * 32767.0, -32768, 32767).astype(np.int16)
+
+
+def llegir_mostra_paquet(cami: Path) -> Tuple[np.ndarray, int]:
+    """
+    Obre una mostra d'un paquet com a np.memmap, sense descodificar ni copiar res.
+
+    La freqüència va al nom de l'arxiu ("0003@44100.npy") i el format (int16 o float32,
+    estèreo intercalat) és el de la sortida d'àudio amb què es va exportar.
+    """
+    return np.load(str(cami), mmap_mode="r"), int(cami.stem.rsplit("@", 1)[1])
+
+
+def exportar_paquet(dades_perfil: Dict[str, Any], configs: List[ButtonConfig], cami_paquet: Path,
+                    cfg_mixer: ConfiguracioMixer, index_loudness: IndexLoudness) -> int:
+    """
+    Escriu el paquet: un ZIP sense compressió amb perfil.json i una mostra .npy per arxiu.
+
+    Les mostres es converteixen al format natiu de la sortida actual (int16 per a pygame,
+    float32 per al motor propi) i a la seva freqüència. Sense compressió, cada mostra
+    ocupa un tros contigu de l'arxiu i després es pot mapar a memòria directament.
+    Retorna el nombre de sons empaquetats.
+    """
+    noms: Dict[str, str] = {}
+    loudness: Dict[str, Dict[str, Any]] = {}
+    temporal = cami_paquet.with_name(cami_paquet.name + ".tmp")
+    with zipfile.ZipFile(temporal, "w", compression=zipfile.ZIP_STORED, allowZip64=True) as zf:
+        for cfg in configs:
+            if not cfg.arxiu or cfg.arxiu in noms:
+                continue
+            origen = resoldre_cami(cfg.arxiu)
+            try:
+                dades = llegir_pcm(origen, cfg_mixer.frequencia)
+            except Exception:
+                # Formats que libsndfile no llegeix (p. ex. alguns MP3): es descodifiquen amb pygame
+                LOG.debug("soundfile no llegeix %s, es fa servir pygame", origen, exc_info=True)
+                dades = pygame.sndarray.array(pygame.mixer.Sound(str(origen))).astype(np.float32) / 32768.0
+            if cfg_mixer.motor == "pygame":
+                dades = pcm_int16(dades)
+            nom = f"so/{len(noms):04d}@{cfg_mixer.frequencia}.npy"
+            with zf.open(nom, "w", force_zip64=True) as f:
+                np.save(f, np.ascontiguousarray(dades))
+            noms[cfg.arxiu] = nom
+            entrada = index_loudness.consultar(origen)
+            if entrada is not None:
+                loudness[nom] = {"pic_dbfs": entrada["pic_dbfs"], "lufs": entrada["lufs"]}
+        perfil = dict(dades_perfil, configuracions=[dict(c.to_dict(), arxiu=noms.get(c.arxiu)) for c in configs],
+                      loudness=loudness)
+        zf.writestr("perfil.json", json.dumps(perfil, indent=1, ensure_ascii=False))
+    os.replace(temporal, cami_paquet)
+    return len(noms)
+
+
+def importar_paquet(cami_paquet: Path, index_loudness: IndexLoudness) -> Path:
+    """
+    Desempaqueta a PAQUETS_DIR/<nom> i retorna el perfil.json resultant.
+
+    Com que el ZIP no està comprimit, desempaquetar és només copiar bytes. Els camins
+    de les mostres passen a ser relatius a SCRIPT_DIR i el loudness del paquet entra a
+    l'índex, de manera que no cal analitzar res.
+    """
+    desti = PAQUETS_DIR / cami_paquet.stem
+    with zipfile.ZipFile(cami_paquet) as zf:
+        perfil = migrar_perfil(json.loads(zf.read("perfil.json").decode("utf-8")))
+        for info in zf.infolist():
+            if info.filename.startswith("so/") and info.filename.endswith(".npy") and "/" not in info.filename[3:]:
+                zf.extract(info, desti)
+    relatiu = desti.relative_to(SCRIPT_DIR)
+    for d in perfil.get("configuracions", []):
+        if d.get("arxiu"):
+            d["arxiu"] = str(relatiu / d["arxiu"])
+    for nom, entrada in perfil.pop("loudness", {}).items():
+        index_loudness.registrar(desti / nom, entrada["pic_dbfs"], entrada["lufs"])
+    index_loudness.desar()
+    cami_perfil = desti / "perfil.json"
+    escriure_atomic(cami_perfil, json.dumps(perfil, indent=4, ensure_ascii=False).encode("utf-8"))
+    return cami_perfil
+
+
+# --- Cerca ràpida: índex en memòria per al llançador ---
+EXTENSIONS_SO = {".wav", ".mp3", ".ogg", ".flac"}
+TECLA_LLANCADOR = "ctrl+space"
+
+
+def normalitzar_cerca(text: str) -> str:
+    """Minúscules i sense accents, perquè "cancó" trobi "Cançó"."""
+    descompost = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in descompost if not unicodedata.combining(c))
 
 
-# --- Data model per a la configuració d'un botó ---
 @dataclass
-class ButtonConfig:
-    id: int
-    emoji: str = "➕"
-    nom: str = "Buit"
-    arxiu: Optional[str] = None  # camí relatiu respecto SCRIPT_DIR o None
-    color: str = COLOR_BUIT
-    tecla_assignada: Optional[str] = None
+class EntradaCerca:
+    text: str  # normalitzat, on es busca
+    etiqueta: str  # el que es mostra
+    id_boto: int  # config a disparar (negatiu per als arxius sense botó)
 
-    def to_dict(self) -> Dict[str, Any]:
-        return asdict(self)
+
+class IndexCerca:
+    """
+    Cerca difusa incremental: les lletres de la consulta han d'aparèixer en ordre.
+
+    Tots els textos es concatenen en un sol array de codis i, per a cada lletra, es
+    precalcula l'array ordenat de les posicions on apareix. Afegir una lletra a la
+    consulta és un np.searchsorted sobre els candidats de la consulta anterior (la
+    propera aparició després de l'última posició trobada), de manera que tota la cerca
+    és vectoritzada. Els estats de cada prefix es guarden: esborrar una lletra no costa
+    res. La puntuació premia lletres consecutives i inicis de paraula.
+    """
+
+    MAX_RESULTATS = 12
+    SEPARADOR = "\n"
+
+    def __init__(self):
+        self.reconstruir([])
+
+    def reconstruir(self, entrades: List[EntradaCerca]):
+        self.entrades = entrades
+        textos = [e.text for e in entrades]
+        self._longituds = np.array([len(t) for t in textos], dtype=np.int64)
+        self._inicis = np.zeros(len(textos) + 1, dtype=np.int64)
+        np.cumsum(self._longituds + 1, out=self._inicis[1:])
+        self._codis = np.frombuffer((self.SEPARADOR.join(textos) + self.SEPARADOR).encode("utf-32-le"), dtype=np.uint32)
+        # Inici de paraula: la posició anterior és un espai o el separador
+        self._inici_paraula = np.ones(len(self._codis), dtype=bool)
+        self._inici_paraula[1:] = np.isin(self._codis[:-1], (ord(" "), ord(self.SEPARADOR)))
+        # Posicions de cada lletra, en una sola ordenació
+        ordre = np.argsort(self._codis, kind="stable")
+        lletres, primers = np.unique(self._codis[ordre], return_index=True)
+        self._aparicions = {chr(c): trossos for c, trossos in zip(lletres, np.split(ordre, primers[1:]))}
+        inicial = (np.arange(len(entrades)), self._inicis[:-1] - 1, np.zeros(len(entrades), dtype=np.int64))
+        self._estats: List[Tuple[str, Tuple[np.ndarray, np.ndarray, np.ndarray]]] = [("", inicial)]
+
+    def cercar(self, consulta: str) -> List[EntradaCerca]:
+        q = normalitzar_cerca(consulta).replace(" ", "").replace(self.SEPARADOR, "")
+        while len(self._estats) > 1 and not q.startswith(self._estats[-1][0]):
+            self._estats.pop()
+        if not q:
+            return []
+        prefix, (idx, pos, punts) = self._estats[-1]
+        for n in range(len(prefix), len(q)):
+            aparicions = self._aparicions.get(q[n])
+            if aparicions is None or not len(idx):
+                idx = pos = punts = np.zeros(0, dtype=np.int64)
+            else:
+                k = np.searchsorted(aparicions, pos + 1)
+                valids = k < len(aparicions)
+                seguent = aparicions[np.minimum(k, len(aparicions) - 1)]
+                valids &= seguent < self._inicis[idx + 1] - 1
+                idx, anterior, seguent, punts = idx[valids], pos[valids], seguent[valids], punts[valids]
+                punts = punts + self._inici_paraula[seguent]
+                if n:
+                    punts += 2 * (seguent == anterior + 1)
+                pos = seguent
+            self._estats.append((q[:n + 1], (idx, pos, punts)))
+        if not len(idx):
+            return []
+        # Més punts primer; a igualtat, el text més curt
+        clau = punts * 4096 - np.minimum(self._longituds[idx], 4095)
+        k = min(self.MAX_RESULTATS, len(idx))
+        millors = np.argpartition(-clau, k - 1)[:k]
+        millors = millors[np.argsort(-clau[millors], kind="stable")]
+        return [self.entrades[i] for i in idx[millors]]
+
+
+# --- Control remot: servidor asyncio (HTTP amb Server-Sent Events i UDP) ---
+HOST_CONTROL = "127.0.0.1"  # "0.0.0.0" per acceptar ordres de la xarxa local
+PORT_HTTP_CONTROL = 8765
+PORT_UDP_CONTROL = 9000
+MIDA_CUA_SUBSCRIPTOR = 1024  # esdeveniments pendents d'un client SSE lent abans de descartar-ne
+ORDRES_LECTURA = ("estat", "esdeveniments")  # les úniques que accepten GET; la resta, només POST
+AJUDA_CONTROL = "Ordres: POST /disparar/<id o nom>, /volum/<0-100>, /aturar, /fondre; GET /estat, /esdeveniments"
+
+
+def _llegir_osc(dades: bytes) -> Tuple[str, List[Any]]:
+    """Descodifica un missatge OSC amb arguments i (int32), f (float32) i s (cadena)."""
+    def cadena(pos: int) -> Tuple[str, int]:
+        fi = dades.index(b"\0", pos)
+        return dades[pos:fi].decode("utf-8"), (fi + 4) & ~3
+
+    adreca, pos = cadena(0)
+    if pos >= len(dades) or dades[pos:pos + 1] != b",":
+        return adreca, []
+    tipus, pos = cadena(pos)
+    arguments: List[Any] = []
+    for t in tipus[1:]:
+        if t in "if" and pos + 4 > len(dades):
+            raise ValueError("Missatge OSC truncat")
+        if t == "i":
+            arguments.append(int.from_bytes(dades[pos:pos + 4], "big", signed=True))
+            pos += 4
+        elif t == "f":
+            arguments.append(struct.unpack(">f", dades[pos:pos + 4])[0])
+            pos += 4
+        elif t == "s":
+            valor, pos = cadena(pos)
+            arguments.append(valor)
+        else:
+            raise ValueError(f"Tipus OSC no suportat: {t}")
+    return adreca, arguments
+
+
+class _ProtocolUDP(asyncio.DatagramProtocol):
+    """Protocol de datagrames d'asyncio: una ordre per línia ("/disparar 12") o un missatge OSC."""
+
+    def __init__(self, servidor: "ServidorControl"):
+        self.servidor = servidor
+
+    def error_received(self, exc):
+        LOG.debug("Error UDP del control remot: %s", exc)
+
+    def datagram_received(self, dades: bytes, adreca):
+        try:
+            if dades[:1] == b"/" and b"\0" in dades:
+                ordre, arguments = _llegir_osc(dades)
+                self._ordre(ordre, " ".join(str(a) for a in arguments), adreca)
+                return
+            for linia in dades.decode("utf-8").splitlines():
+                ordre, _, argument = linia.strip().partition(" ")
+                if ordre:
+                    self._ordre(ordre, argument.strip(), adreca)
+        except (ValueError, UnicodeDecodeError, struct.error) as e:
+            LOG.debug("Datagrama de control incorrecte de %s: %s", adreca, e)
+
+    def _ordre(self, adreca_ordre: str, argument: str, remitent):
+        # Amb testimoni, el primer tram de l'adreça és el testimoni: "/<testimoni>/disparar 12"
+        parts = adreca_ordre.strip("/").split("/")
+        if self.servidor.token is not None:
+            if len(parts) < 2 or not self.servidor.testimoni_valid(parts[0]):
+                LOG.debug("Datagrama de control sense testimoni vàlid de %s", remitent)
+                return
+            parts = parts[1:]
+        self.servidor.ordre("/".join(parts), argument)
+
+
+class ServidorControl:
+    """
+    Control remot opcional per a tauletes i scripts (p. ex. un stream deck).
+
+    Corre en un fil propi amb el seu bucle d'asyncio, de manera que mai no toca el fil de
+    Tk: els disparaments van a BotoneraApp._play_by_config, que només encua al despatxador,
+    i els canvis d'estat arriben com a observador del despatxador. Ordres (HTTP o UDP):
+    disparar <id o nom>, volum <0-100>, aturar i fondre. GET /esdeveniments és un flux
+    Server-Sent Events amb cada botó que comença o deixa de sonar.
+
+    Per HTTP, les ordres que fan sonar o callar res només s'accepten per POST i no s'envia cap
+    capçalera CORS. Una petició de navegador amb un Origin que no és el mateix servidor es
+    rebutja, de manera que una pàgina web oberta a la màquina no pot fer sonar la botonera.
+    Amb `token`, cada petició l'ha de portar ("Authorization: Bearer <token>" o ?token=) i
+    cada datagrama UDP, com a primer tram de l'adreça ("/<token>/disparar 12").
+    Amb el port 0 se'n tria un de lliure; iniciar() hi deixa el que s'ha obert.
+    """
+
+    def __init__(self, app: "BotoneraApp", host: str = HOST_CONTROL, port_http: int = PORT_HTTP_CONTROL,
+                 port_udp: int = PORT_UDP_CONTROL, token: Optional[str] = None):
+        self.app = app
+        self.host = host
+        self.port_http = port_http
+        self.port_udp = port_udp
+        self.token = token or None
+        self._loop = None
+        self._aturar = None
+        self._subscriptors: set = set()
+        self._connexions: Dict[Any, Any] = {}  # tasca -> escriptor de cada client HTTP obert
+        self._per_nom: Dict[str, ButtonConfig] = {}
+        self._index_construit = -math.inf
+        self._llest = threading.Event()
+        self._error: Optional[BaseException] = None
+        self._fil = threading.Thread(target=self._executar, name="control-remot", daemon=True)
+
+    def iniciar(self):
+        """Obre els ports. Llença l'error si no s'han pogut obrir (p. ex. ja estan en ús)."""
+        self._fil.start()
+        self._llest.wait(5)
+        if self._error is not None:
+            raise self._error
+        self.app.despatxador.observadors.append(self._en_canvi_estat)
+        LOG.info("Control remot: http://%s:%d i UDP %d", self.host, self.port_http, self.port_udp)
+        if self.token is None and self.host not in ("127.0.0.1", "localhost", "::1"):
+            LOG.warning("El control remot escolta a %s sense testimoni: qualsevol de la xarxa el pot fer servir.", self.host)
+
+    def testimoni_valid(self, testimoni: Optional[str]) -> bool:
+        return self.token is None or (testimoni is not None and hmac.compare_digest(testimoni, self.token))
+
+    def aturar(self):
+        if self._en_canvi_estat in self.app.despatxador.observadors:
+            self.app.despatxador.observadors.remove(self._en_canvi_estat)
+        if self._loop is not None and self._aturar is not None:
+            self._loop.call_soon_threadsafe(self._aturar.set)
+        self._fil.join(2)
+
+    # ---------- Ordres: es poden cridar des de qualsevol fil ----------
+    def ordre(self, ordre: str, argument: str = "") -> Tuple[int, Dict[str, Any]]:
+        """Executa una ordre i retorna (codi HTTP, resposta)."""
+        if ordre == "disparar":
+            cfg = self._config(argument)
+            if cfg is None or not cfg.arxiu:
+                return 404, {"ok": False, "error": f"Botó desconegut: {argument}"}
+            self.app._play_by_config(cfg)
+            return 200, {"ok": True, "id": cfg.id}
+        if ordre == "volum":
+            try:
+                valor = max(0.0, min(100.0, float(argument)))
+            except ValueError:
+                return 400, {"ok": False, "error": "El volum ha de ser un nombre entre 0 i 100."}
+            self.app._executar_a_ui(lambda: self.app.slider_volum.set(valor))
+            return 200, {"ok": True, "volum": valor}
+        if ordre == "aturar":
+            self.app.parar_tots_els_sons()
+            return 200, {"ok": True}
+        if ordre == "fondre":
+            self.app.fondre_tots_els_sons()
+            return 200, {"ok": True}
+        if ordre == "estat":
+            return 200, {"ok": True, "sonant": sorted(self.app.despatxador.ids_sonant()),
+                         "volum": round(self.app.get_volum_actual() * 100)}
+        return 404, {"ok": False, "error": f"Ordre desconeguda: {ordre}"}
+
+    def _config(self, referencia: str) -> Optional[ButtonConfig]:
+        try:
+            return self.app._config_per_id(int(referencia))
+        except ValueError:
+            pass
+        clau = normalitzar_cerca(referencia)
+        ara = time.monotonic()
+        # L'índex de noms es refà com a molt un cop per segon, encara que arribin ràfegues de noms desconeguts
+        if clau not in self._per_nom and ara - self._index_construit > 1.0:
+            per_nom: Dict[str, ButtonConfig] = {}
+            for cfg in sorted(dict(self.app.configs_per_id).values(), key=lambda c: (c.pagina, c.id)):
+                if cfg.arxiu and cfg.nom:
+                    per_nom.setdefault(normalitzar_cerca(cfg.nom), cfg)
+            self._per_nom = per_nom
+            self._index_construit = ara
+        return self._per_nom.get(clau)
+
+    # ---------- Bucle d'asyncio ----------
+    def _executar(self):
+        try:
+            asyncio.run(self._principal())
+        except BaseException as e:
+            self._error = e
+            self._llest.set()
+
+    async def _principal(self):
+        self._loop = asyncio.get_running_loop()
+        self._aturar = asyncio.Event()
+        servidor = await asyncio.start_server(self._client_http, self.host, self.port_http)
+        transport, _ = await self._loop.create_datagram_endpoint(lambda: _ProtocolUDP(self),
+                                                                 local_addr=(self.host, self.port_udp))
+        self.port_http = servidor.sockets[0].getsockname()[1]
+        self.port_udp = transport.get_extra_info("sockname")[1]
+        self._llest.set()
+        try:
+            await self._aturar.wait()
+        finally:
+            transport.close()
+            servidor.close()
+            for cua in list(self._subscriptors):
+                cua.put_nowait(None)
+            # Tancar els clients en keep-alive fa que els seus bucles acabin sols, sense cancel·lar-los
+            for escriptor in list(self._connexions.values()):
+                escriptor.close()
+            if self._connexions:
+                await asyncio.wait(list(self._connexions), timeout=1.0)
+            await servidor.wait_closed()
+
+    def _en_canvi_estat(self, id_boto: int, sonant: bool):
+        # Fil del despatxador: només es passa l'esdeveniment al bucle d'asyncio
+        if self._loop is not None and self._subscriptors:
+            try:
+                self._loop.call_soon_threadsafe(self._difondre, {"id": id_boto, "sonant": sonant})
+            except RuntimeError:
+                pass  # el bucle ja s'ha tancat
+
+    def _difondre(self, esdeveniment: Dict[str, Any]):
+        for cua in self._subscriptors:
+            if cua.qsize() < MIDA_CUA_SUBSCRIPTOR:
+                cua.put_nowait(esdeveniment)
+
+    async def _client_http(self, lector, escriptor):
+        """Una connexió HTTP/1.1, amb keep-alive: un script pot enviar centenars de peticions seguides."""
+        tasca = asyncio.current_task()
+        self._connexions[tasca] = escriptor
+        try:
+            while True:
+                linia = await lector.readline()
+                if not linia:
+                    break
+                metode, cami, _versio = linia.decode("latin-1").split(" ", 2)
+                capcaleres = {}
+                while (capcalera := await lector.readline()) not in (b"\r\n", b"\n", b""):
+                    nom, _, valor = capcalera.decode("latin-1").partition(":")
+                    capcaleres[nom.strip().lower()] = valor.strip()
+                if int(capcaleres.get("content-length", 0)):
+                    await lector.readexactly(int(capcaleres["content-length"]))
+                url = urllib.parse.urlsplit(cami)
+                parts = [urllib.parse.unquote(p) for p in url.path.split("/") if p]
+                codi, resposta = self._refusar(metode, parts, capcaleres, urllib.parse.parse_qs(url.query))
+                if codi == 200 and parts == ["esdeveniments"]:
+                    await self._flux_esdeveniments(escriptor)
+                    break
+                if codi == 200:
+                    codi, resposta = self.ordre(parts[0], "/".join(parts[1:]))
+                cos = json.dumps(resposta, ensure_ascii=False).encode("utf-8")
+                tancar = capcaleres.get("connection", "").lower() == "close"
+                linies = [f"HTTP/1.1 {codi} {'OK' if codi == 200 else 'Error'}", "Content-Type: application/json; charset=utf-8",
+                          f"Content-Length: {len(cos)}"]
+                if codi == 405:
+                    linies.append("Allow: GET" if parts[0] in ORDRES_LECTURA else "Allow: POST")
+                if tancar:
+                    linies.append("Connection: close")
+                escriptor.write(("\r\n".join(linies) + "\r\n\r\n").encode("latin-1") + cos)
+                await escriptor.drain()
+                if tancar:
+                    break
+        except (ConnectionError, ValueError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._connexions.pop(tasca, None)
+            escriptor.close()
+
+    def _refusar(self, metode: str, parts: List[str], capcaleres: Dict[str, str],
+                 consulta: Dict[str, List[str]]) -> Tuple[int, Dict[str, Any]]:
+        """(200, {}) si la petició es pot atendre; si no, el codi i la resposta d'error."""
+        origen = capcaleres.get("origin")
+        if origen and urllib.parse.urlsplit(origen).netloc != capcaleres.get("host"):
+            return 403, {"ok": False, "error": "Origen no permès."}
+        autoritzacio = capcaleres.get("authorization", "")
+        testimoni = autoritzacio[7:] if autoritzacio.lower().startswith("bearer ") else consulta.get("token", [None])[0]
+        if not self.testimoni_valid(testimoni):
+            return 401, {"ok": False, "error": "Cal un testimoni vàlid."}
+        if not parts:
+            return 404, {"ok": False, "error": AJUDA_CONTROL}
+        if metode != ("GET" if parts[0] in ORDRES_LECTURA else "POST"):
+            return 405, {"ok": False, "error": AJUDA_CONTROL}
+        return 200, {}
+
+    async def _flux_esdeveniments(self, escriptor):
+        cua = asyncio.Queue()
+        self._subscriptors.add(cua)
+        try:
+            escriptor.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nCache-Control: no-cache\r\n\r\n")
+            _codi, estat = self.ordre("estat")
+            escriptor.write(f"event: estat\ndata: {json.dumps(estat)}\n\n".encode("utf-8"))
+            await escriptor.drain()
+            while True:
+                try:
+                    esdeveniment = await asyncio.wait_for(cua.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    escriptor.write(b": viu\n\n")  # manté oberta la connexió a través de proxies
+                else:
+                    if esdeveniment is None:
+                        break
+                    escriptor.write(f"event: boto\ndata: {json.dumps(esdeveniment)}\n\n".encode("utf-8"))
+                await escriptor.drain()
+        finally:
+            self._subscriptors.discard(cua)
 
 
 # --- Classe SoundButton simplificada i sense globals ---
@@ -103,8 +2534,9 @@ class SoundButton:
         self.parent_frame = parent_frame
         self.config = config
 
-        self.channel: Optional[pygame.mixer.Channel] = None
         self.is_playing = False
+        self.posicio: Optional[Tuple[int, int]] = None
+        self._signatura = self.signatura()
 
         self.color_text = "black" if self.config.color == COLOR_GROC else "white"
 
@@ -129,6 +2561,11 @@ class SoundButton:
                                     bg="#222", fg="white", padx=4, pady=2)
         self.label_tecla.place(relx=1.0, rely=0.0, anchor="ne", x=-5, y=5)
 
+        # Indicador de precàrrega (⏳ carregant, ● preparat, ! error)
+        self.label_carrega = tk.Label(self.frame, text="", font=("Arial", 9, "bold"),
+                                      bg=self.config.color, fg=self.color_text)
+        self.label_carrega.place(relx=0.0, rely=0.0, anchor="nw", x=5, y=5)
+
         # Menu clic dret
         self.menu = tk.Menu(self.frame, tearoff=0)
         self.menu.add_command(label="Configuració del botó...", command=self.obrir_configuracio)
@@ -140,8 +2577,55 @@ class SoundButton:
             widget.bind("<Button-1>", self.on_click_esquerre)
             widget.bind("<Button-3>", self.mostrar_menu_clic_dret)
 
+    def marcar_carrega(self, estat: Optional[str]):
+        """Mostra l'estat de la precàrrega: "carregant", "preparat", "error" o None."""
+        text, fg = {
+            "carregant": ("⏳", self.color_text),
+            "preparat": ("●", COLOR_VERD if self.config.color != COLOR_VERD else "white"),
+            "error": ("!", COLOR_VERMELL if self.config.color != COLOR_VERMELL else "white"),
+        }.get(estat, ("", self.color_text))
+        self.label_carrega.config(text=text, fg=fg)
+
     def grid(self, row: int, column: int):
-        self.frame.grid(row=row, column=column, padx=5, pady=5)
+        if self.posicio != (row, column) or not self.frame.winfo_manager():
+            self.frame.grid(row=row, column=column, padx=5, pady=5)
+            self.posicio = (row, column)
+
+    def amagar(self):
+        """Treu el botó de la graella sense destruir-lo (conserva menú, estat i so)."""
+        self.frame.grid_remove()
+
+    def signatura(self) -> Tuple[Any, ...]:
+        """Dades de la configuració que es veuen al botó; si no canvien no cal redibuixar-lo."""
+        return (self.config.emoji, self.config.nom, self.config.color, self.config.tecla_assignada, self.config.arxiu)
+
+    def actualitzar(self, config: ButtonConfig) -> bool:
+        """Associa el botó a `config` i redibuixa només si alguna dada visible ha canviat.
+
+        Retorna True si l'arxiu de so és diferent de l'anterior.
+        """
+        abans = self._signatura
+        self.config = config
+        if self.signatura() == abans:
+            return False
+        self.redibuixar()
+        arxiu_canviat = abans[4] != self.config.arxiu
+        if arxiu_canviat:
+            self.marcar_carrega(None)
+        return arxiu_canviat
+
+    def redibuixar(self):
+        """Posa el botó d'acord amb self.config. Els canvis in situ de la configuració l'han de cridar
+        perquè _signatura no quedi desfasada (si no, actualitzar es podria saltar el redibuixat)."""
+        self._signatura = self.signatura()
+        self.color_text = "black" if self.config.color == COLOR_GROC else "white"
+        self.label_emoji.config(text=self.config.emoji, fg=self.color_text)
+        self.label_nom.config(text=self.config.nom, fg=self.color_text)
+        self.label_tecla.config(text=self.config.tecla_assignada.upper() if self.config.tecla_assignada else "--")
+        if self.is_playing:
+            self._set_playing_visuals()
+        else:
+            self._set_default_visuals()
 
     # ---------- Reproducció ----------
     def on_click_esquerre(self, event=None):
@@ -151,63 +2635,21 @@ class SoundButton:
             self.reproduir()
 
     def reproduir(self):
-        if not MIXER_OK:
-            LOG.warning("Intent de reproduir sense mixer disponible.")
-            return
-
-        volumen = self.app.get_volum_actual()
-
-        # Si ja està sonant, fem stop
-        if self.channel and self.channel.get_busy():
-            self.channel.stop()
-            self.is_playing = False
-            self.channel = None
-            self._set_default_visuals()
-            return
-
-        if not self.config.arxiu:
-            LOG.warning("No hi ha arxiu assignat al botó id=%s", self.config.id)
-            return
-
-        cami = Path(self.config.arxiu)
-        if not cami.is_absolute():
-            cami = SCRIPT_DIR / cami
-
-        if not cami.exists():
-            LOG.error("Arxiu no trobat: %s", cami)
-            messagebox.showerror("Error d'arxiu", f"No s'ha trobat l'arxiu:\n{self.config.arxiu}", parent=self.app.finestra)
-            return
-
-        try:
-            so = pygame.mixer.Sound(str(cami))
-            so.set_volume(1.0)
-            chan = pygame.mixer.find_channel()
-            if chan is None:
-                messagebox.showwarning("Error d'àudio", "No hi ha canals de so lliures!", parent=self.app.finestra)
-                return
-            chan.set_volume(volumen)
-            chan.play(so)
-            self.channel = chan
-        except Exception as e:
-            LOG.exception("Error reproduint %s: %s", cami, e)
-            messagebox.showerror("Error de reproducció", f"Error en reproduir l'arxiu:\n{e}", parent=self.app.finestra)
+        """Encua el disparament: el despatxador d'àudio fa la reproducció o l'atura."""
+        self.app.despatxador.disparar(self.config.id)
 
-    def update_visuals(self):
-        """Sincronitza l'estat visual amb l'estat de reproducció."""
-        if not MIXER_OK:
-            return
-        is_busy = self.channel and self.channel.get_busy()
-        if is_busy and not self.is_playing:
+    def marcar_reproduccio(self, sonant: bool):
+        """Sincronitza l'estat visual amb l'estat de reproducció que publica el despatxador."""
+        if sonant and not self.is_playing:
             self._set_playing_visuals()
-            self.is_playing = True
-        elif not is_busy and self.is_playing:
+        elif not sonant and self.is_playing:
             self._set_default_visuals()
-            self.is_playing = False
-            self.channel = None
+        self.is_playing = sonant
 
     def _set_playing_visuals(self):
         self.frame.config(bg=COLOR_REPRODUINT)
         self.label_emoji.config(bg=COLOR_REPRODUINT)
+        self.label_carrega.config(bg=COLOR_REPRODUINT)
         self.label_nom.config(bg=COLOR_REPRODUINT)
         self.label_tecla.config(bg=COLOR_REPRODUINT)
 
@@ -215,6 +2657,7 @@ class SoundButton:
         self.frame.config(bg=self.config.color)
         self.label_emoji.config(bg=self.config.color, fg="black" if self.config.color == COLOR_GROC else "white")
         self.label_nom.config(bg=self.config.color)
+        self.label_carrega.config(bg=self.config.color)
         self.label_tecla.config(bg="#222")
 
     # ---------- Configuració (popup) ----------
@@ -235,13 +2678,21 @@ class SoundButton:
             cami_rel = str(rel)
         except Exception:
             cami_rel = str(cami)
+        antic = self.config.arxiu
         self.config.arxiu = cami_rel
+        # L'arxiu anterior ja no cal a la memòria cau si cap altre botó l'usa
+        if antic and antic != cami_rel and not any(c.arxiu == antic for c in self.app.totes_les_configuracions):
+            self.app.cache_mostres.invalidar(resoldre_cami(antic))
+        self.app.precarregar_boto(self)
+        self.app.analitzar_loudness([self.config])
         if self.config.nom == "Buit":
             self.config.nom = cami.stem
             if hasattr(self, "entry_nom"):
                 self.entry_nom.delete(0, tk.END)
                 self.entry_nom.insert(0, self.config.nom)
-        self.label_nom.config(text=self.config.nom)
+        self.redibuixar()
+        self.app.invalidar_cerca()
+        self.app.registrar_canvi(self.config)
 
     def iniciar_assignacio_tecla(self):
         self._toggle_config_widgets("disabled")
@@ -255,15 +2706,21 @@ class SoundButton:
             self._toggle_config_widgets("normal")
 
     def _capturar_tecla(self, event):
-        nova = getattr(event, "name", None) or str(event)
-        # Desenganxem l'escolta
+        # S'executa al fil del teclat: només desenganxem l'escolta i passem la tecla al fil de Tk
+        nom = getattr(event, "name", None) or str(event)
+        if es_modificador(nom):
+            return  # esperem la tecla principal de la combinació (p. ex. ctrl+1)
+        modificadors = [m for m in MODIFICADORS if keyboard.is_pressed(m)]
+        nova = normalitzar_tecla("+".join(modificadors + [nom]))
         try:
             if hasattr(self, "_tecla_handle"):
                 keyboard.unhook(self._tecla_handle)
                 del self._tecla_handle
         except Exception:
             pass
+        self.app._executar_a_ui(lambda: self._aplicar_tecla(nova))
 
+    def _aplicar_tecla(self, nova: str):
         # Si tecla en ús per un altre config -> error
         conflict = self.app.hotkey_registry.get(nova)
         if conflict and conflict["config"].id != self.config.id:
@@ -274,21 +2731,12 @@ class SoundButton:
 
         # Eliminar hotkey antiga si existeix
         antiga = self.config.tecla_assignada
-        if antiga and antiga in self.app.hotkey_registry:
-            handle_ant = self.app.hotkey_registry[antiga]["handle"]
-            try:
-                keyboard.remove_hotkey(handle_ant)
-            except Exception:
-                LOG.warning("No s'ha pogut eliminar hotkey antiga: %s", antiga)
-            self.app.hotkey_registry.pop(antiga, None)
+        if antiga:
+            self.app.eliminar_hotkey(normalitzar_tecla(antiga))
 
         self.config.tecla_assignada = nova
         # Registrar nova hotkey i guardar el handle
-        try:
-            handle = keyboard.add_hotkey(nova, lambda: self.reproduir())
-            self.app.hotkey_registry[nova] = {"config": self.config, "handle": handle}
-        except Exception as e:
-            LOG.exception("No s'ha pogut assignar hotkey %s: %s", nova, e)
+        if not self.app.registrar_hotkey(self.config):
             messagebox.showerror("Error de permisos", "No s'ha pogut assignar la tecla. Executa com a administrador si cal.", parent=self.top_config)
             self._toggle_config_widgets("normal")
             return
@@ -298,9 +2746,9 @@ class SoundButton:
             tecla_text = self.config.tecla_assignada.upper() if self.config.tecla_assignada else "--"
             self.label_tecla_config.config(text=f"Tecla assignada: {tecla_text}")
 
+        self.app.registrar_canvi(self.config)
         self._toggle_config_widgets("normal")
-        # Actualitzar la petita etiqueta del botó principal
-        self.label_tecla.config(text=self.config.tecla_assignada.upper() if self.config.tecla_assignada else "--")
+        self.redibuixar()
 
     def _toggle_config_widgets(self, estat: str):
         state_combo = "readonly" if estat == "normal" else "disabled"
@@ -353,52 +2801,435 @@ class SoundButton:
         nom_color_actual = REVERSE_PALETA.get(self.config.color, "Gris")
         self.combo_color.set(nom_color_actual)
 
-        # Accions
-        f_accions = tk.Frame(self.top_config, bg="#333")
-        f_accions.pack(padx=15, pady=10, fill="x")
+        # Guany
+        f_guany = tk.Frame(self.top_config, bg="#333")
+        f_guany.pack(padx=15, pady=(0, 10), fill="x")
+        Label(f_guany, text="Guany del botó (%):", font=("Arial", 10), fg="white", bg="#333").pack(anchor="w")
+        self.scale_guany = tk.Scale(f_guany, from_=0, to=200, orient="horizontal", bg="#333", fg="white",
+                                    highlightthickness=0, length=250)
+        self.scale_guany.set(round(self.config.guany * 100))
+        self.scale_guany.pack(fill="x", expand=True)
+        self.var_normalitzar = tk.BooleanVar(value=self.config.normalitzar)
+        tk.Checkbutton(f_guany, text=self._text_loudness(), variable=self.var_normalitzar, font=("Arial", 10),
+                       fg="white", bg="#333", selectcolor="#555", activebackground="#333",
+                       activeforeground="white").pack(anchor="w")
+        if self.app.config_mixer.motor == "pygame":
+            Label(f_guany, text="Amb el motor pygame només pot baixar el volum: els sons fluixos no pugen fins a l'objectiu.",
+                  font=("Arial", 9), fg="#aaa", bg="#333", wraplength=380, justify="left").pack(anchor="w")
+
+        # Mode de reproducció
+        f_mode = tk.Frame(self.top_config, bg="#333")
+        f_mode.pack(padx=15, pady=(0, 10), fill="x")
+        Label(f_mode, text="Mode de reproducció:", font=("Arial", 10), fg="white", bg="#333").grid(row=0, column=0, sticky="w")
+        self.combo_mode = ttk.Combobox(f_mode, values=list(MODES_REPRODUCCIO.values()), state="readonly", font=("Arial", 11), width=38)
+        self.combo_mode.set(MODES_REPRODUCCIO.get(self.config.mode, MODES_REPRODUCCIO["commutar"]))
+        self.combo_mode.grid(row=1, column=0, columnspan=2, sticky="we", pady=(0, 5))
+        Label(f_mode, text="Veus màximes (polifònic):", font=("Arial", 10), fg="white", bg="#333").grid(row=2, column=0, sticky="w")
+        self.spin_max_veus = tk.Spinbox(f_mode, from_=1, to=32, font=("Arial", 11), width=5)
+        self.spin_max_veus.delete(0, tk.END)
+        self.spin_max_veus.insert(0, str(self.config.max_veus))
+        self.spin_max_veus.grid(row=2, column=1, sticky="e")
+        Label(f_mode, text="Grup exclusiu (opcional):", font=("Arial", 10), fg="white", bg="#333").grid(row=3, column=0, sticky="w")
+        self.entry_grup = tk.Entry(f_mode, font=("Arial", 11), width=12)
+        self.entry_grup.insert(0, self.config.grup)
+        self.entry_grup.grid(row=3, column=1, sticky="e", pady=(5, 0))
+        Label(f_mode, text="Fade-in / crossfade (ms):", font=("Arial", 10), fg="white", bg="#333").grid(row=4, column=0, sticky="w")
+        self.spin_fosa_entrada = tk.Spinbox(f_mode, from_=0, to=10000, increment=100, font=("Arial", 11), width=6)
+        self.spin_fosa_entrada.delete(0, tk.END)
+        self.spin_fosa_entrada.insert(0, str(self.config.fosa_entrada_ms))
+        self.spin_fosa_entrada.grid(row=4, column=1, sticky="e", pady=(5, 0))
+        Label(f_mode, text="Fade-out (ms):", font=("Arial", 10), fg="white", bg="#333").grid(row=5, column=0, sticky="w")
+        self.spin_fosa_sortida = tk.Spinbox(f_mode, from_=0, to=10000, increment=100, font=("Arial", 11), width=6)
+        self.spin_fosa_sortida.delete(0, tk.END)
+        self.spin_fosa_sortida.insert(0, str(self.config.fosa_sortida_ms))
+        self.spin_fosa_sortida.grid(row=5, column=1, sticky="e", pady=(5, 0))
+
+        # Accions
+        f_accions = tk.Frame(self.top_config, bg="#333")
+        f_accions.pack(padx=15, pady=10, fill="x")
+
+        self.btn_canviar_arxiu = tk.Button(f_accions, text="🔊 Canviar arxiu de so...", command=self.assignar_arxiu)
+        self.btn_canviar_arxiu.pack(fill="x", pady=5)
+
+        tecla_text_config = self.config.tecla_assignada.upper() if self.config.tecla_assignada else "--"
+        self.label_tecla_config = Label(f_accions, text=f"Tecla assignada: {tecla_text_config}", font=("Arial", 10), fg="white", bg="#333")
+        self.label_tecla_config.pack(anchor="w", pady=5)
+
+        self.btn_canviar_tecla = tk.Button(f_accions, text="🎹 Canviar tecla...", command=self.iniciar_assignacio_tecla)
+        self.btn_canviar_tecla.pack(fill="x", pady=5)
+
+        self.var_tecla_global = tk.BooleanVar(value=self.config.tecla_global)
+        tk.Checkbutton(f_accions, text="Tecla global (funciona des de qualsevol pàgina)", variable=self.var_tecla_global,
+                       font=("Arial", 10), fg="white", bg="#333", selectcolor="#555", activebackground="#333",
+                       activeforeground="white").pack(anchor="w")
+
+        # Desar
+        self.btn_desar = tk.Button(self.top_config, text="Desar canvis", font=("Arial", 12, "bold"), command=self.desar_configuracio)
+        self.btn_desar.pack(pady=15, padx=15, fill="x")
+
+    def _text_loudness(self) -> str:
+        text = f"Normalitzar a {OBJECTIU_LUFS:.0f} LUFS"
+        entrada = self.app.index_loudness.consultar(resoldre_cami(self.config.arxiu)) if self.config.arxiu else None
+        if entrada is not None and entrada["lufs"] is not None:
+            text += f" (arxiu: {entrada['lufs']:.1f} LUFS, pic {entrada['pic_dbfs']:.1f} dBFS)"
+        return text
+
+    def desar_configuracio(self):
+        nou_emoji = self.combo_emoji.get()
+        nou_nom = self.entry_nom.get().strip()
+        nou_color_nom = self.combo_color.get()
+        self.config.guany = self.scale_guany.get() / 100.0
+        self.config.normalitzar = self.var_normalitzar.get()
+        if self.var_tecla_global.get() != self.config.tecla_global:
+            self.config.tecla_global = self.var_tecla_global.get()
+            self.app.refrescar_hotkeys()
+        self.config.mode = next((k for k, v in MODES_REPRODUCCIO.items() if v == self.combo_mode.get()), self.config.mode)
+        try:
+            self.config.max_veus = max(1, int(self.spin_max_veus.get()))
+            self.config.fosa_entrada_ms = max(0, int(self.spin_fosa_entrada.get()))
+            self.config.fosa_sortida_ms = max(0, int(self.spin_fosa_sortida.get()))
+        except ValueError:
+            pass
+        self.config.grup = self.entry_grup.get().strip()
+
+        if nou_emoji:
+            self.config.emoji = nou_emoji
+        if nou_nom:
+            self.config.nom = nou_nom
+        if nou_color_nom and PALETA_COLORS_DICT.get(nou_color_nom):
+            self.config.color = PALETA_COLORS_DICT[nou_color_nom]
+        self.redibuixar()
+
+        # El diari serialitza la configuració en aquest moment: ha d'anar després de l'última assignació
+        self.app.invalidar_cerca()
+        self.app.registrar_canvi(self.config)
+
+        try:
+            self.top_config.destroy()
+        except Exception:
+            pass
+
+
+# --- Enregistrament en streaming: buffer circular i escriptura incremental ---
+class BufferCircular:
+    """
+    Buffer circular preassignat per a un sol productor i un sol consumidor.
+
+    El productor només avança `_escrit` i el consumidor només avança `_llegit`; com que
+    cadascun escriu un únic enter, no cal cap lock. Si el buffer s'omple, els frames
+    que no hi caben es descarten i es compten en lloc de fer créixer la memòria.
+    """
+
+    def __init__(self, capacitat_frames: int, canals: int, dtype: str):
+        self.capacitat = capacitat_frames
+        self._dades = np.zeros((capacitat_frames, canals), dtype=dtype)
+        self._escrit = 0  # total de frames escrits des del principi
+        self._llegit = 0  # total de frames consumits des del principi
+
+    def escriure(self, bloc: np.ndarray) -> int:
+        """Copia `bloc` al buffer. Retorna el nombre de frames que no hi han cabut."""
+        n = len(bloc)
+        m = min(n, self.capacitat - (self._escrit - self._llegit))
+        inici = self._escrit % self.capacitat
+        primer = min(m, self.capacitat - inici)
+        self._dades[inici:inici + primer] = bloc[:primer]
+        if m > primer:
+            self._dades[:m - primer] = bloc[primer:m]
+        self._escrit += m
+        return n - m
+
+    def consumir(self, funcio) -> int:
+        """Passa a `funcio` les dades pendents (una o dues vistes, sense còpia) i les allibera."""
+        disponibles = self._escrit - self._llegit
+        if not disponibles:
+            return 0
+        inici = self._llegit % self.capacitat
+        primer = min(disponibles, self.capacitat - inici)
+        funcio(self._dades[inici:inici + primer])
+        if disponibles > primer:
+            funcio(self._dades[:disponibles - primer])
+        self._llegit += disponibles
+        return disponibles
+
+
+class MesuradorEntrada:
+    """
+    Nivells i resum de forma d'ona de l'entrada, calculats bloc a bloc amb NumPy.
+
+    afegir() s'executa al callback de captura: només fa reduccions vectoritzades sobre el
+    bloc (sense copiar-lo) i no assigna memòria. El resum és un nombre fix de columnes
+    (mínim, màxim) preassignades; quan s'omplen, cada parella de columnes es fusiona en una
+    i cada columna passa a cobrir el doble de blocs, de manera que la memòria no depèn de la
+    durada. La interfície llegeix el pic i el RMS al seu ritme amb llegir_nivells(); el pic
+    es manté fins que es llegeix, perquè cap retall passi desapercebut entre refrescos.
+    """
+
+    LLINDAR_RETALL = 0.999
+    COLUMNES = 4096  # més que l'amplada en píxels de qualsevol finestra de forma d'ona
+
+    def __init__(self, columnes: int = COLUMNES):
+        columnes += columnes % 2  # es fusionen per parelles
+        self._mins = np.zeros(columnes, dtype=np.float32)
+        self._maxs = np.zeros(columnes, dtype=np.float32)
+        self._meitat = np.zeros(columnes // 2, dtype=np.float32)  # espai per fusionar sense assignar
+        self._columnes = 0  # columnes completes
+        self._blocs_columna = 1  # blocs que resumeix cada columna
+        self._a_la_columna = 0  # blocs que ja té la columna en curs
+        self._pic = 0.0
+        self._rms = 0.0
+        self.retalls = 0  # blocs amb alguna mostra al límit
+
+    def afegir(self, bloc: np.ndarray):
+        pla = bloc.reshape(-1)  # vista, no còpia
+        minim = float(pla.min())
+        maxim = float(pla.max())
+        pic = max(maxim, -minim)
+        self._rms = math.sqrt(float(np.dot(pla, pla)) / len(pla)) if len(pla) else 0.0
+        self._pic = max(self._pic, pic)
+        if pic >= self.LLINDAR_RETALL:
+            self.retalls += 1
+        i = self._columnes
+        if self._a_la_columna == 0:
+            if i == len(self._mins):
+                self._fusionar()
+                i = self._columnes
+            self._mins[i] = minim
+            self._maxs[i] = maxim
+        else:
+            self._mins[i] = min(self._mins[i], minim)
+            self._maxs[i] = max(self._maxs[i], maxim)
+        self._a_la_columna += 1
+        if self._a_la_columna == self._blocs_columna:
+            self._columnes += 1
+            self._a_la_columna = 0
+
+    def _fusionar(self):
+        """Dues columnes veïnes en fan una: la meitat de columnes, cadascuna amb el doble de blocs."""
+        meitat = len(self._meitat)
+        np.minimum(self._mins[0::2], self._mins[1::2], out=self._meitat)
+        self._mins[:meitat] = self._meitat
+        np.maximum(self._maxs[0::2], self._maxs[1::2], out=self._meitat)
+        self._maxs[:meitat] = self._meitat
+        self._columnes = meitat
+        self._blocs_columna *= 2
+
+    def llegir_nivells(self) -> Tuple[float, float]:
+        """Retorna (pic, rms) i reinicia el pic mantingut."""
+        pic, self._pic = self._pic, 0.0
+        return pic, self._rms
+
+    def forma_ona(self, columnes: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Redueix el resum a `columnes` parelles (mínim, màxim)."""
+        n = self._columnes + (1 if self._a_la_columna else 0)
+        if n == 0:
+            return np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.float32)
+        columnes = max(1, min(columnes, n))
+        limits = (np.arange(columnes) * n) // columnes
+        return np.minimum.reduceat(self._mins[:n], limits), np.maximum.reduceat(self._maxs[:n], limits)
+
+
+def a_dbfs(valor: float) -> float:
+    return 20.0 * math.log10(valor) if valor > 1e-6 else -120.0
+
+
+class EnregistradorStreaming:
+    """
+    Escriu un enregistrament a disc a mesura que arriben els blocs.
+
+    La captura es fa amb el callback de sd.InputStream, que copia cada bloc directament al
+    BufferCircular preassignat (sense crear cap array nou). Un fil escriptor buida el
+    buffer cap a un soundfile.SoundFile obert i el sincronitza periòdicament, de manera
+    que la memòria és constant i, si l'aplicació cau, el que s'ha enregistrat ja és al disc.
+    """
+
+    INTERVAL_SINCRONITZACIO = 1.0  # segons entre flush de l'arxiu
+
+    def __init__(self, cami: Path, samplerate: int = SAMPLERATE, canals: int = CHANNELS,
+                 segons_buffer: float = SEGONS_BUFFER_ENREGISTRAMENT):
+        self.cami = cami
+        self._arxiu = sf.SoundFile(str(cami), mode="w", samplerate=samplerate, channels=canals)
+        self._buffer = BufferCircular(int(samplerate * segons_buffer), canals, DTYPE)
+        self._dades_noves = threading.Event()
+        self._aturar = threading.Event()
+        self._en_acabar = None
+        self.frames_escrits = 0
+        self.frames_perduts = 0  # no han cabut al buffer circular
+        self.overflows = 0  # blocs en què PortAudio ha avisat de desbordament d'entrada
+        self.error: Optional[Exception] = None
+        self.mesurador = MesuradorEntrada()
+        self._stream: Optional[sd.InputStream] = None
+        self._captura: Optional[CapturaContinua] = None
+        self._fil = threading.Thread(target=self._escriptor, name="escriptor-enregistrament", daemon=True)
+        self._fil.start()
+
+    def iniciar_captura(self, blocksize: int = FRAMES_PER_BUFFER, captura: Optional[CapturaContinua] = None):
+        """
+        Obre el micròfon i comença a capturar. Si falla, tanca l'arxiu i torna a llençar l'error.
+
+        Si `captura` és una captura contínua oberta amb el mateix format, en rep els blocs
+        en lloc d'obrir el micròfon una altra vegada.
+        """
+        if captura is not None and captura.activa and captura.samplerate == self._arxiu.samplerate \
+                and captura.canals == self._arxiu.channels:
+            self._captura = captura
+            captura.receptor = self._callback
+            return
+        try:
+            self._stream = sd.InputStream(samplerate=self._arxiu.samplerate, channels=self._arxiu.channels,
+                                          dtype=DTYPE, blocksize=blocksize, callback=self._callback)
+            self._stream.start()
+        except Exception:
+            self._stream = None
+            self.aturar()
+            self._fil.join()
+            raise
+
+    def _callback(self, indata, frames, time_info, status):
+        # Fil d'àudio de PortAudio: res de bloquejar ni de crear objectes grans
+        if status.input_overflow:
+            self.overflows += 1
+        self.mesurador.afegir(indata)
+        self.afegir(indata)
+
+    def afegir(self, bloc: np.ndarray):
+        self.frames_perduts += self._buffer.escriure(bloc)
+        self._dades_noves.set()
+
+    def aturar(self, en_acabar=None):
+        """
+        Atura la captura sense bloquejar: el fil escriptor tanca el micròfon, buida el que
+        queda, tanca l'arxiu i després crida `en_acabar()`.
+        """
+        self._en_acabar = en_acabar
+        self._aturar.set()
+        self._dades_noves.set()
+
+    def _tancar_stream(self):
+        if self._captura is not None:
+            self._captura.receptor = None
+            self._captura = None
+        if self._stream is None:
+            return
+        try:
+            self._stream.stop()  # espera que acabi l'últim callback
+            self._stream.close()
+        except Exception:
+            LOG.debug("Error tancant el stream d'entrada", exc_info=True)
+        self._stream = None
+
+    def _escriure(self, tros: np.ndarray):
+        self._arxiu.write(tros)
+        self.frames_escrits += len(tros)
+
+    def _escriptor(self):
+        ultima_sincronitzacio = time.monotonic()
+        try:
+            while True:
+                self._dades_noves.wait(self.INTERVAL_SINCRONITZACIO)
+                self._dades_noves.clear()
+                aturant = self._aturar.is_set()
+                if aturant:
+                    self._tancar_stream()  # abans de consumir: així no es perd l'últim bloc
+                self._buffer.consumir(self._escriure)
+                if aturant:
+                    break
+                if time.monotonic() - ultima_sincronitzacio >= self.INTERVAL_SINCRONITZACIO:
+                    self._arxiu.flush()
+                    ultima_sincronitzacio = time.monotonic()
+        except Exception as e:
+            LOG.exception("Error escrivint l'enregistrament %s: %s", self.cami, e)
+            self.error = e
+        finally:
+            self._tancar_stream()
+            try:
+                self._arxiu.close()
+            except Exception:
+                LOG.debug("Error tancant l'arxiu d'enregistrament", exc_info=True)
+        if self.frames_perduts or self.overflows:
+            LOG.warning("Enregistrament amb pèrdues: %d frames descartats, %d overflows d'entrada.",
+                        self.frames_perduts, self.overflows)
+        if self._en_acabar is not None:
+            self._en_acabar()
+
 
-        self.btn_canviar_arxiu = tk.Button(f_accions, text="🔊 Canviar arxiu de so...", command=self.assignar_arxiu)
-        self.btn_canviar_arxiu.pack(fill="x", pady=5)
+# --- Captura contínua: els últims segons del micròfon, sempre a punt per desar ---
+SEGONS_CAPTURA_CONTINUA = 60  # memòria fixa: 60 s mono float32 són uns 10 MB
+SEGONS_DESAR_CAPTURA = (10, 30, 60)
 
-        tecla_text_config = self.config.tecla_assignada.upper() if self.config.tecla_assignada else "--"
-        self.label_tecla_config = Label(f_accions, text=f"Tecla assignada: {tecla_text_config}", font=("Arial", 10), fg="white", bg="#333")
-        self.label_tecla_config.pack(anchor="w", pady=5)
 
-        self.btn_canviar_tecla = tk.Button(f_accions, text="🎹 Canviar tecla...", command=self.iniciar_assignacio_tecla)
-        self.btn_canviar_tecla.pack(fill="x", pady=5)
+class CapturaContinua:
+    """
+    Manté els últims `segons` del micròfon en un buffer circular preassignat.
 
-        # Desar
-        self.btn_desar = tk.Button(self.top_config, text="Desar canvis", font=("Arial", 12, "bold"), command=self.desar_configuracio)
-        self.btn_desar.pack(pady=15, padx=15, fill="x")
+    El callback només copia el bloc al buffer (una o dues assignacions de llesques) i avança
+    un comptador: la memòria és fixa i la CPU inapreciable encara que estigui oberta hores.
+    A diferència de BufferCircular, aquí el que és vell se sobreescriu, perquè ningú no
+    consumeix les dades fins que se'n demana una còpia amb ultims(). Mentre hi ha un
+    enregistrament en curs, li passa els mateixos blocs (`receptor`) en lloc d'obrir el
+    micròfon dues vegades.
+    """
 
-    def desar_configuracio(self):
-        nou_emoji = self.combo_emoji.get()
-        nou_nom = self.entry_nom.get().strip()
-        nou_color_nom = self.combo_color.get()
+    MARGE_SEGONS = 1.0  # el callback pot continuar escrivint mentre ultims() copia
 
-        if nou_emoji:
-            self.config.emoji = nou_emoji
-            self.label_emoji.config(text=self.config.emoji)
-        if nou_nom:
-            self.config.nom = nou_nom
-            self.label_nom.config(text=self.config.nom)
-        if nou_color_nom:
-            nou_color_hex = PALETA_COLORS_DICT.get(nou_color_nom)
-            if nou_color_hex:
-                self.config.color = nou_color_hex
-                self.color_text = "black" if nou_color_hex == COLOR_GROC else "white"
-                self.frame.config(bg=nou_color_hex)
-                self.label_emoji.config(bg=nou_color_hex, fg=self.color_text)
-                self.label_nom.config(bg=nou_color_hex, fg=self.color_text)
-
-        # actualitzar la petita etiqueta de la tecla
-        tecla_text = self.config.tecla_assignada.upper() if self.config.tecla_assignada else "--"
-        self.label_tecla.config(text=tecla_text)
+    def __init__(self, segons: float = SEGONS_CAPTURA_CONTINUA, samplerate: int = SAMPLERATE, canals: int = CHANNELS):
+        self.segons = segons
+        self.samplerate = samplerate
+        self.canals = canals
+        self._capacitat = int((segons + self.MARGE_SEGONS) * samplerate)
+        self._dades = np.zeros((self._capacitat, canals), dtype=DTYPE)
+        self._escrit = 0  # total de frames escrits des del principi
+        self.overflows = 0
+        self.receptor = None  # callback d'un EnregistradorStreaming que comparteix el micròfon
+        self._stream: Optional[sd.InputStream] = None
 
+    @property
+    def activa(self) -> bool:
+        return self._stream is not None
+
+    def iniciar(self, blocksize: int = FRAMES_PER_BUFFER):
+        """Obre el micròfon. Si falla, torna a llençar l'error."""
         try:
-            self.top_config.destroy()
+            self._stream = sd.InputStream(samplerate=self.samplerate, channels=self.canals, dtype=DTYPE,
+                                          blocksize=blocksize, callback=self._callback)
+            self._stream.start()
         except Exception:
-            pass
+            self._stream = None
+            raise
+
+    def aturar(self):
+        if self._stream is None:
+            return
+        try:
+            self._stream.stop()
+            self._stream.close()
+        except Exception:
+            LOG.debug("Error tancant el stream de la captura contínua", exc_info=True)
+        self._stream = None
+
+    def _callback(self, indata, frames, time_info, status):
+        # Fil d'àudio de PortAudio: només còpies sobre el buffer ja assignat
+        if status.input_overflow:
+            self.overflows += 1
+        n = min(len(indata), self._capacitat)
+        bloc = indata[len(indata) - n:]
+        inici = self._escrit % self._capacitat
+        primer = min(n, self._capacitat - inici)
+        self._dades[inici:inici + primer] = bloc[:primer]
+        if n > primer:
+            self._dades[:n - primer] = bloc[primer:]
+        self._escrit += n
+        receptor = self.receptor
+        if receptor is not None:
+            receptor(indata, frames, time_info, status)
+
+    def ultims(self, segons: float) -> np.ndarray:
+        """Còpia, en ordre, dels últims `segons` capturats (menys si encara no n'hi ha tants)."""
+        escrit = self._escrit
+        n = min(int(segons * self.samplerate), int(self.segons * self.samplerate), escrit)
+        fi = escrit % self._capacitat
+        if n <= fi:
+            return self._dades[fi - n:fi].copy()
+        return np.concatenate([self._dades[fi - n:], self._dades[:fi]])
 
 
 # --- Classe principal de l'aplicació ---
@@ -410,8 +3241,32 @@ class BotoneraApp:
         self.finestra.resizable(False, False)
 
         self.volum_actual = 0.8
-        self.botons_widgets: List[SoundButton] = []
-        self.hotkey_registry: Dict[str, Dict[str, Any]] = {}  # tecla -> {"config": ButtonConfig, "handle": handle}
+        self.config_mixer = ConfiguracioMixer()
+        self.mixer_pendent = False  # True mentre el despatxador reinicia el mixer
+        self.cache_mostres = CacheMostres(MEMORIA_CACHE_MB * 1024 * 1024)
+        self.executor_precarrega = ThreadPoolExecutor(max_workers=FILS_PRECARREGA, thread_name_prefix="precarrega")
+        self.index_loudness = IndexLoudness(ARXIU_INDEX_LOUDNESS)
+        self.executor_loudness = ThreadPoolExecutor(max_workers=1, thread_name_prefix="loudness")
+        self.cua_ui: "queue.SimpleQueue" = queue.SimpleQueue()  # callables a executar al fil de Tk
+        self._avis_ui = threading.Event()  # hi ha tasques a la cua que Tk encara no ha vist
+        self._tancant = False
+        self.despatxador = DespatxadorAudio(self, SortidaPygame(self.config_mixer))
+        self.botons_widgets: List[SoundButton] = []  # botons visibles, en ordre de la graella
+        self.botons_reserva: List[SoundButton] = []  # un widget per posició, reutilitzat entre pàgines
+        self.pagina_actual = 0
+        self.hotkey_registry: Dict[str, Dict[str, Any]] = {}  # combinació normalitzada -> {"config": ButtonConfig, "handle": handle}
+        self.botons_per_id: Dict[int, SoundButton] = {}
+        self.configs_per_id: Dict[int, ButtonConfig] = {}
+        self.configs_per_pagina: Dict[int, List[ButtonConfig]] = {}
+        self.configs_globals: List[ButtonConfig] = []  # configs amb tecla_global
+        self._seguent_id = 0
+        self._ids_reservats = 0  # ids usats per pàgines encara no carregades d'un perfil compacte
+        self.perfil_mandros: Optional[PerfilCompacte] = None
+        self.pagines_pendents: set = set()  # pàgines del perfil compacte que encara no s'han llegit
+        self.diari: Optional[DiariPerfil] = None
+        self.index_cerca: Optional[IndexCerca] = None  # es crea en obrir el llançador per primer cop
+        self.configs_efimeres: Dict[int, ButtonConfig] = {}  # arxius del llançador sense botó (ids negatius)
+        self._signatura_cerca: Optional[Tuple[Any, ...]] = None  # None: cal reconstruir l'índex
 
         self.totes_les_configuracions: List[ButtonConfig] = []
         self.preparar_configuracions()
@@ -426,14 +3281,24 @@ class BotoneraApp:
 
         # Grab dels estats d'enregistrament
         self.is_recording = False
-        self.recording_frames: List[np.ndarray] = []
-        self.recording_thread: Optional[threading.Thread] = None
+        self.enregistrador: Optional[EnregistradorStreaming] = None
         self.last_recording_path_relatiu: Optional[str] = None
+        self.captura_continua: Optional[CapturaContinua] = None
+        self.var_captura_continua = tk.BooleanVar(value=False)
 
         self.btn_record: Optional[tk.Button] = None
         self.blink_after_id: Optional[str] = None
         self.blink_on = False
 
+        self.tecles_actives = False  # el mòdul keyboard es carrega en segon pla després de mostrar la finestra
+        self.panell_estadistiques: Optional[Toplevel] = None
+        # after() no es cancel·la en destruir el panell: sense cancel·lar-los, reobrir-lo duplicaria els bucles
+        self.estadistiques_after_id: Optional[str] = None
+        self.lag_tk_after_id: Optional[str] = None
+        self.servidor_control: Optional[ServidorControl] = None
+        self.var_registre_permanent = tk.BooleanVar(value=False)  # instrumentació activa amb el panell tancat
+        self._handle_llancador = None
+
         self.configurar_estil_ttk()
         self.configurar_finestra()
         self.crear_controls_superiors()
@@ -442,14 +3307,111 @@ class BotoneraApp:
         self.on_format_graella_canvia()
 
         self.finestra.protocol("WM_DELETE_WINDOW", self.en_tancar)
-        if MIXER_OK:
-            self._update_playback_loop()
+        # El mixer i les tecles globals no fan esperar la finestra: s'inicien quan ja és a la pantalla
+        self.finestra.after_idle(self._arrencada_diferida)
+        self.finestra.after_idle(self._iniciar_cua_ui)
+
+    # ---------- Arrencada per fases ----------
+    def _arrencada_diferida(self):
+        """Segona fase de l'arrencada, amb la finestra ja dibuixada: mixer i tecles globals en segon pla."""
+        self.finestra.update_idletasks()
+        marcar_fase("finestra")
+        self.mixer_pendent = True
+
+        def en_mixer(ok: bool):
+            self.mixer_pendent = False
+            marcar_fase("mixer")
+            self._informar_arrencada()
+            if ok:
+                self.precarregar_graella()
+
+        cfg = self.config_mixer
+        self.despatxador.executar(lambda: self.despatxador.reiniciar_sortida(cfg), en_mixer)
+        fut = self.executor_precarrega.submit(carregar_modul, keyboard)
+        fut.add_done_callback(lambda _f: self._executar_a_ui(self.activar_tecles))
+        # Còpies de sons llargs d'arxius esborrats i el que passi del pressupost; no corre pressa
+        self.executor_loudness.submit(MAGATZEM_PCM.netejar)
+
+    def activar_tecles(self):
+        """Registra les tecles globals i la del llançador un cop importat el mòdul keyboard."""
+        self.tecles_actives = True
+        self.refrescar_hotkeys()
+        try:
+            self._handle_llancador = keyboard.add_hotkey(TECLA_LLANCADOR, lambda: self._executar_a_ui(self.obrir_llancador))
+        except Exception as e:
+            LOG.warning("No s'ha pogut registrar la tecla del llançador %s: %s", TECLA_LLANCADOR, e)
+        marcar_fase("tecles")
+        self._informar_arrencada()
+
+    def _informar_arrencada(self):
+        if "mixer" in TEMPS_ARRENCADA and "tecles" in TEMPS_ARRENCADA:
+            LOG.info("Arrencada (ms des de l'inici): %s", informe_arrencada())
 
     def preparar_configuracions(self):
         self.totes_les_configuracions.clear()
-        for i in range(24):
-            cfg = ButtonConfig(id=i)
+        self.pagina_actual = 0
+        self._ids_reservats = 0
+        self.indexar_configuracions()
+        self.configs_de_pagina(0)
+
+    def indexar_configuracions(self):
+        """Reconstrueix els índexs (per id, per pàgina i tecles globals) en una sola passada."""
+        self.invalidar_cerca()
+        self.configs_per_id = {}
+        self.configs_per_pagina = {}
+        self.configs_globals = []
+        for cfg in self.totes_les_configuracions:
+            self.configs_per_id[cfg.id] = cfg
+            self.configs_per_pagina.setdefault(cfg.pagina, []).append(cfg)
+            if cfg.tecla_global and cfg.tecla_assignada:
+                self.configs_globals.append(cfg)
+        self._seguent_id = max(max(self.configs_per_id, default=-1) + 1, self._ids_reservats)
+
+    def configs_de_pagina(self, pagina: int) -> List[ButtonConfig]:
+        """Configuracions de la pàgina, completada amb botons buits fins a MIDA_PAGINA."""
+        if pagina in self.pagines_pendents:
+            self._carregar_pagina(pagina)
+        configs = self.configs_per_pagina.setdefault(pagina, [])
+        while len(configs) < MIDA_PAGINA:
+            cfg = ButtonConfig(id=self._seguent_id, pagina=pagina)
+            self._seguent_id += 1
+            configs.append(cfg)
             self.totes_les_configuracions.append(cfg)
+            self.configs_per_id[cfg.id] = cfg
+        return configs
+
+    def _carregar_pagina(self, pagina: int):
+        """Llegeix una pàgina del perfil compacte i l'afegeix als índexs."""
+        configs = self.perfil_mandros.llegir_pagina(pagina)
+        self.pagines_pendents.discard(pagina)
+        self.totes_les_configuracions.extend(configs)
+        self.configs_per_pagina.setdefault(pagina, []).extend(configs)
+        for cfg in configs:
+            self.configs_per_id[cfg.id] = cfg
+            if cfg.tecla_global and cfg.tecla_assignada:
+                self.configs_globals.append(cfg)
+        self._seguent_id = max(self._seguent_id, max((c.id for c in configs), default=-1) + 1)
+        self.analitzar_loudness(configs)
+        self.invalidar_cerca()
+
+    def carregar_totes_les_pagines(self):
+        for pagina in sorted(self.pagines_pendents):
+            self._carregar_pagina(pagina)
+
+    @property
+    def nombre_pagines(self) -> int:
+        return max(max(self.configs_per_pagina, default=0), max(self.pagines_pendents, default=0)) + 1
+
+    def anar_a_pagina(self, pagina: int):
+        """Canvia de pàgina: només es reassignen els botons visibles, els sons continuen sonant."""
+        pagina = max(0, pagina)
+        if pagina == self.pagina_actual:
+            return
+        self.pagina_actual = pagina
+        self.regenerar_graella(self.formats_graella.get(self.combo_format_graella.get(), (6, 4)))
+
+    def _actualitzar_etiqueta_pagina(self):
+        self.etiqueta_pagina.config(text=f"Pàgina {self.pagina_actual + 1}/{self.nombre_pagines}")
 
     def configurar_finestra(self):
         # icona (opcional)
@@ -491,11 +3453,40 @@ class BotoneraApp:
                                     bg=COLOR_VERMELL, fg="white", relief="flat")
         self.btn_record.pack(side="left", padx=5, ipady=2)
 
+        # Vúmetre d'entrada: barra = RMS, línia = pic (vermell si retalla)
+        self.canvas_nivell = tk.Canvas(frame, width=90, height=14, bg="#222", highlightthickness=0)
+        self.canvas_nivell.pack(side="left", padx=(0, 5))
+
+        boto_captura = tk.Menubutton(frame, text="Captura ▾", bg=COLOR_GRIS, fg="white", relief="flat")
+        menu_captura = tk.Menu(boto_captura, tearoff=0)
+        menu_captura.add_checkbutton(label=f"Captura contínua (últims {SEGONS_CAPTURA_CONTINUA} s)",
+                                     variable=self.var_captura_continua, command=self.commutar_captura_continua)
+        menu_captura.add_separator()
+        for segons in SEGONS_DESAR_CAPTURA:
+            menu_captura.add_command(label=f"Desa els últims {segons} s", command=lambda s=segons: self.desar_captura_continua(s))
+        boto_captura.config(menu=menu_captura)
+        boto_captura.pack(side="left", padx=5, ipady=2)
+
         tk.Button(frame, text="Nou Perfil", command=self.nou_perfil, bg=COLOR_TARONJA, fg="white", relief="flat").pack(side="left", padx=5, ipady=2)
         tk.Button(frame, text="Carregar Perfil", command=self.carregar_perfil, bg=COLOR_BLAU, fg="white", relief="flat").pack(side="left", padx=5, ipady=2)
         tk.Button(frame, text="Desar Perfil", command=self.desar_perfil_actual, bg=COLOR_VERD, fg="white", relief="flat").pack(side="left", padx=5, ipady=2)
         tk.Button(frame, text="Desar Com...", command=self.desar_perfil_com, bg=COLOR_GRIS, fg="white", relief="flat").pack(side="left", padx=5, ipady=2)
+        boto_paquet = tk.Menubutton(frame, text="Paquet ▾", bg=COLOR_GRIS, fg="white", relief="flat")
+        menu_paquet = tk.Menu(boto_paquet, tearoff=0)
+        menu_paquet.add_command(label="Exportar paquet...", command=self.exportar_paquet)
+        menu_paquet.add_command(label="Importar paquet...", command=self.importar_paquet)
+        boto_paquet.config(menu=menu_paquet)
+        boto_paquet.pack(side="left", padx=5, ipady=2)
+        boto_escaleta = tk.Menubutton(frame, text="Escaleta ▾", bg=COLOR_GRIS, fg="white", relief="flat")
+        menu_escaleta = tk.Menu(boto_escaleta, tearoff=0)
+        menu_escaleta.add_command(label="Començar una escaleta nova", command=self.despatxador.nova_escaleta)
+        menu_escaleta.add_command(label="Renderitzar escaleta a WAV...", command=self.renderitzar_escaleta)
+        boto_escaleta.config(menu=menu_escaleta)
+        boto_escaleta.pack(side="left", padx=5, ipady=2)
 
+        tk.Button(frame, text="Fos tot", command=self.fondre_tots_els_sons, bg=COLOR_GRIS, fg="white", relief="flat").pack(side="left", padx=5, ipady=2)
+        tk.Button(frame, text="Mixer...", command=self.obrir_config_mixer, bg=COLOR_TURQUESA, fg="white", relief="flat").pack(side="left", padx=5, ipady=2)
+        tk.Button(frame, text="📊", command=self.commutar_panell_estadistiques, bg=COLOR_GRIS, fg="white", relief="flat").pack(side="left", padx=5, ipady=2)
         tk.Button(frame, text="Quant a...", command=self.mostrar_about, bg=COLOR_LILA, fg="white", relief="flat").pack(side="left", padx=(5, 10), ipady=2)
 
         # volum
@@ -504,6 +3495,7 @@ class BotoneraApp:
                           fg="white", troughcolor="#555", showvalue=0, length=150, relief="flat", borderwidth=0, highlightthickness=0)
         slider.set(int(self.volum_actual * 100))
         slider.pack(side="left", pady=3)
+        self.slider_volum = slider
         self.etiqueta_valor_volum = tk.Label(frame, text=f"{int(self.volum_actual * 100)}%", font=("Arial", 11, "bold"),
                                              fg="white", bg="#1e1e1e", width=4)
         self.etiqueta_valor_volum.pack(side="left", padx=5)
@@ -515,13 +3507,25 @@ class BotoneraApp:
             "6x2 (12 botons)": (6, 2),
             "6x3 (18 botons)": (6, 3),
             "6x4 (24 botons)": (6, 4),
+            "8x4 (32 botons)": (8, 4),
+            "8x6 (48 botons)": (8, 6),
         }
         self.combo_format_graella = ttk.Combobox(frame, values=list(self.formats_graella.keys()), state="readonly",
                                                  font=("Arial", 10), width=15)
-        self.combo_format_graella.set("6x4 (24 botons)")
+        self.combo_format_graella.set(FORMAT_PER_DEFECTE)
         self.combo_format_graella.pack(side="left", padx=5, pady=8)
         self.combo_format_graella.bind("<<ComboboxSelected>>", self.on_format_graella_canvia)
 
+        # pàgines (també amb Re Pàg / Av Pàg)
+        tk.Button(frame, text="◀", command=lambda: self.anar_a_pagina(self.pagina_actual - 1), bg=COLOR_GRIS,
+                  fg="white", relief="flat").pack(side="left", padx=(15, 2), ipady=2)
+        self.etiqueta_pagina = tk.Label(frame, text="Pàgina 1/1", font=("Arial", 11), fg="white", bg="#1e1e1e", width=11)
+        self.etiqueta_pagina.pack(side="left")
+        tk.Button(frame, text="▶", command=lambda: self.anar_a_pagina(self.pagina_actual + 1), bg=COLOR_GRIS,
+                  fg="white", relief="flat").pack(side="left", padx=2, ipady=2)
+        self.finestra.bind("<Prior>", lambda event: self.anar_a_pagina(self.pagina_actual - 1))
+        self.finestra.bind("<Next>", lambda event: self.anar_a_pagina(self.pagina_actual + 1))
+
     def crear_frame_graella(self):
         self.frame_graella = tk.Frame(self.finestra, bg="#1e1e1e")
         self.frame_graella.pack(fill="both", expand=True, padx=20, pady=10)
@@ -532,87 +3536,293 @@ class BotoneraApp:
         self.regenerar_graella(tup)
 
     def regenerar_graella(self, format_tuple):
-        # Netegem widgets previs
-        for w in self.frame_graella.winfo_children():
-            w.destroy()
+        """
+        Mostra la pàgina actual amb el format donat sense destruir la graella.
+
+        Cada posició de la graella té un SoundButton que es reutilitza en totes les pàgines:
+        canviar de pàgina només li assigna una altra configuració i el redibuixa si alguna
+        dada visible canvia. Els botons que queden fora del format s'amaguen.
+        """
+        cols, rows = format_tuple
+        visibles = self.configs_de_pagina(self.pagina_actual)[:cols * rows]
+        mida_abans = (self.finestra.winfo_reqwidth(), self.finestra.winfo_reqheight())
+
+        for btn in self.botons_reserva[len(visibles):]:
+            btn.amagar()
+
+        sonant = self.despatxador.ids_sonant()
         self.botons_widgets.clear()
+        self.botons_per_id.clear()
+        a_precarregar: List[SoundButton] = []
+        for i, cfg in enumerate(visibles):
+            if i < len(self.botons_reserva):
+                btn = self.botons_reserva[i]
+                if btn.actualitzar(cfg) or not btn.frame.winfo_manager():
+                    a_precarregar.append(btn)
+            else:
+                btn = SoundButton(self, self.frame_graella, cfg)
+                self.botons_reserva.append(btn)
+                a_precarregar.append(btn)
+            btn.marcar_reproduccio(cfg.id in sonant)
+            btn.grid(row=i // cols, column=i % cols)
+            self.botons_widgets.append(btn)
+            self.botons_per_id[cfg.id] = btn
 
-        # Esborrem hotkeys registrades prèviament de forma segura
-        for tecla, info in list(self.hotkey_registry.items()):
+        self.refrescar_hotkeys()
+        self._actualitzar_etiqueta_pagina()
+
+        self.finestra.update_idletasks()
+        if (self.finestra.winfo_reqwidth(), self.finestra.winfo_reqheight()) != mida_abans:
+            self.centrar_finestra()
+        for btn in sorted(a_precarregar, key=lambda b: b.config.tecla_assignada is None):
+            self.precarregar_boto(btn)
+
+    # ---------- Tecles globals ----------
+    def registrar_hotkey(self, cfg: ButtonConfig) -> bool:
+        combinacio = normalitzar_tecla(cfg.tecla_assignada)
+        try:
+            handle = keyboard.add_hotkey(combinacio, lambda id_boto=cfg.id: self.despatxador.disparar(id_boto))
+        except Exception as e:
+            LOG.warning("No s'ha pogut registrar hotkey %s: %s", combinacio, e)
+            return False
+        self.hotkey_registry[combinacio] = {"config": cfg, "handle": handle}
+        return True
+
+    def eliminar_hotkey(self, combinacio: str):
+        info = self.hotkey_registry.pop(combinacio, None)
+        if info and info.get("handle"):
             try:
-                handle = info.get("handle")
-                if handle:
-                    keyboard.remove_hotkey(handle)
+                keyboard.remove_hotkey(info["handle"])
             except Exception:
-                LOG.debug("No s'ha pogut eliminar hotkey %s", tecla)
-        self.hotkey_registry.clear()
+                LOG.debug("No s'ha pogut eliminar hotkey %s", combinacio)
 
-        cols, rows = format_tuple
-        total = cols * rows
+    def refrescar_hotkeys(self):
+        """Registra les tecles de la pàgina visible i les globals; una global guanya en cas de conflicte."""
+        self.configs_globals = [c for c in self.totes_les_configuracions if c.tecla_global and c.tecla_assignada]
+        self.actualitzar_hotkeys([b.config for b in self.botons_widgets] + self.configs_globals)
 
-        for i in range(total):
-            if i >= len(self.totes_les_configuracions):
-                break
-            cfg = self.totes_les_configuracions[i]
-            fila = i // cols
-            col = i % cols
-            btn = SoundButton(self, self.frame_graella, cfg)
-            btn.grid(row=fila, column=col)
-            self.botons_widgets.append(btn)
-            # registrar hotkey si existeix
-            if cfg.tecla_assignada:
-                try:
-                    handle = keyboard.add_hotkey(cfg.tecla_assignada, lambda cfg=cfg: self._play_by_config(cfg))
-                    self.hotkey_registry[cfg.tecla_assignada] = {"config": cfg, "handle": handle}
-                except Exception:
-                    LOG.warning("No s'ha pogut registrar hotkey inicial %s", cfg.tecla_assignada)
+    def actualitzar_hotkeys(self, configs: List[ButtonConfig]):
+        """
+        Deixa registrades exactament les tecles de `configs`, tocant només les que canvien.
 
-        self.finestra.update_idletasks()
-        self.centrar_finestra()
+        Una combinació que continua apuntant al mateix id de botó conserva el seu handle.
+        """
+        if not self.tecles_actives:
+            return  # activar_tecles() les registrarà totes quan el mòdul keyboard sigui a punt
+        desitjades = {normalitzar_tecla(c.tecla_assignada): c for c in configs if c.tecla_assignada}
+        for combinacio, info in list(self.hotkey_registry.items()):
+            cfg = desitjades.get(combinacio)
+            if cfg is not None and cfg.id == info["config"].id:
+                info["config"] = cfg
+            else:
+                self.eliminar_hotkey(combinacio)
+        for combinacio, cfg in desitjades.items():
+            if combinacio not in self.hotkey_registry:
+                self.registrar_hotkey(cfg)
 
-    def _play_by_config(self, cfg: ButtonConfig):
-        # trobem el widget associat i cridem reproduir
-        for b in self.botons_widgets:
-            if b.config.id == cfg.id:
-                b.reproduir()
+    def precarregar_graella(self):
+        """Descodifica en segon pla els sons dels botons visibles, primer els que tenen tecla."""
+        if not MIXER_OK:
+            return
+        ordenats = sorted((b for b in self.botons_widgets if b.config.arxiu),
+                          key=lambda b: b.config.tecla_assignada is None)
+        for b in ordenats:
+            self.precarregar_boto(b)
+
+    def precarregar_boto(self, boto: SoundButton):
+        if not MIXER_OK or self.mixer_pendent or not boto.config.arxiu:
+            return  # si el mixer s'està reiniciant, aplicar_config_mixer precarregarà quan acabi
+        id_boto = boto.config.id
+        boto.marcar_carrega("carregant")
+        fut = self.cache_mostres.precarregar(resoldre_cami(boto.config.arxiu), self.executor_precarrega)
+
+        def en_acabar(f: Future):
+            estat = "error" if f.cancelled() or f.exception() is not None else "preparat"
+            self._executar_a_ui(lambda: self._marcar_carrega_per_id(id_boto, estat))
+
+        fut.add_done_callback(en_acabar)
+
+    def analitzar_loudness(self, configs: List[ButtonConfig]):
+        """Encua l'anàlisi dels arxius que encara no són a l'índex de loudness (o han canviat)."""
+        camins = list({resoldre_cami(c.arxiu) for c in configs if c.arxiu})
+        if camins:
+            # La consulta de l'índex (un stat per arxiu) també es fa al fil de loudness
+            self.executor_loudness.submit(self._analitzar_lot, camins)
+
+    def _analitzar_lot(self, camins: List[Path]):
+        """Fil de loudness: analitza els arxius un a un i desa l'índex en acabar."""
+        for cami in camins:
+            try:
+                self.index_loudness.analitzar(cami)
+            except Exception as e:
+                LOG.warning("No s'ha pogut analitzar el loudness de %s: %s", cami, e)
+        self.index_loudness.desar()
+
+    def _boto_per_id(self, id_boto: int) -> Optional[SoundButton]:
+        return self.botons_per_id.get(id_boto)
+
+    def _config_per_id(self, id_boto: int) -> Optional[ButtonConfig]:
+        if id_boto < 0:
+            return self.configs_efimeres.get(id_boto)
+        return self.configs_per_id.get(id_boto)
+
+    def _marcar_carrega_per_id(self, id_boto: int, estat: str):
+        b = self._boto_per_id(id_boto)
+        if b is not None:
+            try:
+                b.marcar_carrega(estat)
+            except tk.TclError:
+                pass
+
+    def _marcar_reproduccio_per_id(self, id_boto: int, sonant: bool):
+        b = self._boto_per_id(id_boto)
+        if b is not None:
+            try:
+                b.marcar_reproduccio(sonant)
+            except tk.TclError:
+                pass
+
+    def _executar_a_ui(self, funcio):
+        """
+        Encua `funcio` perquè s'executi al fil de Tk (es pot cridar des de qualsevol fil).
+
+        Només fa un put() a la cua i aixeca _avis_ui, que no bloquegen mai: qualsevol crida a Tk
+        des d'un altre fil esperaria que el bucle de Tk quedés lliure, i el despatxador d'àudio
+        no pot esperar. Qui desperta Tk és _despertar_ui, un cop per ràfega de tasques.
+        """
+        self.cua_ui.put(funcio)
+        self._avis_ui.set()
+
+    def _iniciar_cua_ui(self):
+        """Ja dins del bucle de Tk: buida el que s'hagi encuat durant l'arrencada i comença a escoltar."""
+        self._buidar_cua_ui()
+        if self._tcl_te_fils():
+            threading.Thread(target=self._despertar_ui, name="despertador-ui", daemon=True).start()
+        else:
+            self._sondejar_cua_ui()
+
+    def _despertar_ui(self):
+        """
+        Fil propi que espera _avis_ui i aleshores programa un sol buidatge de la cua al fil de Tk.
+
+        La crida a after() espera que Tk la rebi; l'espera la paga aquest fil i no el que ha
+        encuat la tasca. Sense tasques, Tk no es desperta mai per la cua.
+        """
+        while True:
+            self._avis_ui.wait()
+            if self._tancant:
+                return
+            self._avis_ui.clear()  # abans de buidar: el que arribi durant el buidatge torna a avisar
+            try:
+                self.finestra.after(0, self._buidar_cua_ui)
+            except (RuntimeError, tk.TclError):
+                return  # la finestra ja s'ha tancat
+
+    def _tcl_te_fils(self) -> bool:
+        try:
+            return bool(int(self.finestra.tk.call("set", "tcl_platform(threaded)")))
+        except (tk.TclError, ValueError):
+            return False
+
+    def _sondejar_cua_ui(self):
+        # Només per a Tcl sense fils, on no es pot cridar after() des d'un altre fil
+        self._buidar_cua_ui()
+        try:
+            self.finestra.after(INTERVAL_CUA_UI_MS, self._sondejar_cua_ui)
+        except tk.TclError:
+            pass  # la finestra ja s'ha tancat
+
+    def _buidar_cua_ui(self):
+        while True:
+            try:
+                funcio = self.cua_ui.get_nowait()
+            except queue.Empty:
                 return
+            try:
+                funcio()
+            except Exception:
+                LOG.exception("Error executant una tasca a la interfície")
+
+    def _play_by_config(self, cfg: ButtonConfig):
+        # Només encuem: el despatxador d'àudio fa la resta
+        self.despatxador.disparar(cfg.id)
 
     def nou_perfil(self):
         confirmar = messagebox.askyesno("Crear nou perfil", "Segur que vols esborrar la configuració actual? Aquesta acció no es pot desfer.", parent=self.finestra)
         if not confirmar:
             return
         self.arxiu_perfil_actual = None
+        self.perfil_mandros = None
+        self.pagines_pendents = set()
+        self.diari = None
         self.finestra.title("Botonera virtual de sons - Perfil Nou")
         self.preparar_configuracions()
-        self.combo_format_graella.set("6x4 (24 botons)")
-        self.regenerar_graella((6, 4))
+        self.combo_format_graella.set(FORMAT_PER_DEFECTE)
+        self.regenerar_graella(self.formats_graella[FORMAT_PER_DEFECTE])
 
     def carregar_perfil(self):
         arxiu = filedialog.askopenfilename(title="Carregar perfil de botonera",
-                                         filetypes=[("Perfils JSON", "*.json"), ("Tots els arxius", "*.*")],
+                                         filetypes=TIPUS_ARXIU_PERFIL,
                                          defaultextension=".json",
                                          initialdir=str(PERFILS_DIR))  # <-- MODIFICAT
-        if not arxiu:
-            return
+        if arxiu:
+            self.obrir_perfil(arxiu)
+
+    def obrir_perfil(self, arxiu: str):
         try:
-            with open(arxiu, "r", encoding="utf-8") as f:
-                dades = json.load(f)
-            loaded = [ButtonConfig(**d) for d in dades.get("configuracions", [])]
-            # Ens assegurem que tinguem 24 configs
-            while len(loaded) < 24:
-                loaded.append(ButtonConfig(id=len(loaded)))
-            self.totes_les_configuracions = loaded[:24]
-            fmt = dades.get("format_graella", "6x4 (24 botons)")
+            cami = Path(arxiu)
+            # D'un perfil compacte només es llegeix la capçalera; les pàgines es carreguen quan es mostren
+            dades, self.totes_les_configuracions, self.perfil_mandros = llegir_perfil(cami)
+            self.pagines_pendents = set(self.perfil_mandros.pagines) if self.perfil_mandros is not None else set()
+            self._ids_reservats = int(dades.get("seguent_id", 0))
+            self.indexar_configuracions()
+            for pagina in dades.get("pagines_globals", []):
+                self.configs_de_pagina(int(pagina))  # les tecles globals han d'estar registrades des del principi
+            self.diari = DiariPerfil(cami)
+            recuperats = self._aplicar_diari()
+            self.pagina_actual = min(int(dades.get("pagina_actual", 0)), self.nombre_pagines - 1)
+            self.analitzar_loudness(self.totes_les_configuracions)
+            memoria_mb = dades.get("memoria_cache_mb", MEMORIA_CACHE_MB)
+            self.cache_mostres.canviar_pressupost(int(memoria_mb) * 1024 * 1024)
+            config_mixer = ConfiguracioMixer.from_dict(dades.get("mixer", {}))
+            if config_mixer != self.config_mixer or not MIXER_OK:
+                self.aplicar_config_mixer(config_mixer)
+            fmt = dades.get("format_graella", FORMAT_PER_DEFECTE)
             if fmt not in self.formats_graella:
-                fmt = "6x4 (24 botons)"
+                fmt = FORMAT_PER_DEFECTE
             self.combo_format_graella.set(fmt)
             self.regenerar_graella(self.formats_graella[fmt])
             self.arxiu_perfil_actual = arxiu
-            self.finestra.title(f"Botonera virtual de sons - {Path(arxiu).name}")
+            self.finestra.title(f"Botonera virtual de sons - {cami.name}")
+            if recuperats:
+                messagebox.showinfo("Canvis recuperats", f"S'han recuperat {recuperats} canvis que no s'havien desat.\n"
+                                    "Desa el perfil per conservar-los.", parent=self.finestra)
         except Exception as e:
             LOG.exception("Error carregant perfil %s", arxiu)
             messagebox.showerror("Error de càrrega", f"Error en carregar el perfil:\n{e}", parent=self.finestra)
 
+    def _aplicar_diari(self) -> int:
+        """Torna a aplicar els canvis del diari del perfil (si l'última sessió no va desar)."""
+        canvis = self.diari.llegir()
+        if not canvis:
+            return 0
+        self.carregar_totes_les_pagines()
+        posicions = {cfg.id: i for i, cfg in enumerate(self.totes_les_configuracions)}
+        for cfg in canvis:
+            if cfg.id in posicions:
+                self.totes_les_configuracions[posicions[cfg.id]] = cfg
+            else:
+                posicions[cfg.id] = len(self.totes_les_configuracions)
+                self.totes_les_configuracions.append(cfg)
+        self.indexar_configuracions()
+        LOG.info("Recuperats %d canvis del diari %s", len(canvis), self.diari.cami)
+        return len(canvis)
+
+    def registrar_canvi(self, cfg: ButtonConfig):
+        """Autodesat: afegeix el canvi d'un botó al diari del perfil obert."""
+        if self.diari is not None:
+            self.diari.afegir(cfg)
+
     def desar_perfil_actual(self):
         if not self.arxiu_perfil_actual:
             self.desar_perfil_com()
@@ -621,7 +3831,7 @@ class BotoneraApp:
 
     def desar_perfil_com(self):
         arxiu = filedialog.asksaveasfilename(title="Desar perfil com...",
-                                           filetypes=[("Perfils JSON", "*.json"), ("Tots els arxius", "*.*")],
+                                           filetypes=TIPUS_ARXIU_PERFIL,
                                            defaultextension=".json",
                                            initialdir=str(PERFILS_DIR))  # <-- MODIFICAT
         if arxiu:
@@ -629,19 +3839,107 @@ class BotoneraApp:
 
     def desar_perfil(self, path: str):
         try:
-            fmt = self.combo_format_graella.get()
-            dades = {
-                "format_graella": fmt,
-                "configuracions": [c.to_dict() for c in self.totes_les_configuracions[:24]]
-            }
-            with open(path, "w", encoding="utf-8") as f:
-                json.dump(dades, f, indent=4, ensure_ascii=False)
+            cami = Path(path)
+            dades = self._dades_perfil()
+            compacte = cami.suffix.lower() == EXTENSIO_COMPACTA
+            blocs_intactes = {}
+            if compacte:
+                # Les pàgines que no s'han obert es copien tal qual, sense descomprimir-les
+                blocs_intactes = {p: self.perfil_mandros.bloc(p) for p in self.pagines_pendents}
+                globals_pendents = set(self.perfil_mandros.capcalera.get("pagines_globals", [])) & self.pagines_pendents \
+                    if self.perfil_mandros is not None else set()
+                dades["pagines_globals"] = sorted({c.pagina for c in self.configs_globals} | globals_pendents)
+            else:
+                self.carregar_totes_les_pagines()
+            pagines = self._pagines_a_desar()
+            escriure_perfil(cami, dades, [c for c in self.totes_les_configuracions if c.pagina in pagines], blocs_intactes)
+            self.perfil_mandros = PerfilCompacte(cami) if compacte else None
+            # Tot el que hi havia al diari ja és al perfil
+            if self.diari is not None:
+                self.diari.esborrar()
+            self.diari = DiariPerfil(cami)
+            self.diari.esborrar()
             self.arxiu_perfil_actual = path
-            self.finestra.title(f"Botonera virtual de sons - {Path(path).name}")
+            self.finestra.title(f"Botonera virtual de sons - {cami.name}")
         except Exception as e:
             LOG.exception("Error desant perfil")
             messagebox.showerror("Error en desar", f"No s'ha pogut desar el perfil:\n{e}", parent=self.finestra)
 
+    def _dades_perfil(self) -> Dict[str, Any]:
+        """Les dades del perfil que no són configuracions de botons."""
+        return dades_perfil(self.combo_format_graella.get(), self.cache_mostres.pressupost_bytes // (1024 * 1024),
+                            self.config_mixer, self.pagina_actual, self._seguent_id)
+
+    # ---------- Paquets ----------
+    def exportar_paquet(self):
+        arxiu = filedialog.asksaveasfilename(title="Exportar paquet...",
+                                             filetypes=[("Paquets de botonera", "*" + EXTENSIO_PAQUET)],
+                                             defaultextension=EXTENSIO_PAQUET, initialdir=str(PERFILS_DIR))
+        if not arxiu:
+            return
+        self.carregar_totes_les_pagines()
+        pagines = self._pagines_a_desar()
+        # Còpia de les configuracions: el fil d'exportació no ha de veure canvis a mitges
+        configs = [ButtonConfig.from_dict(c.to_dict()) for c in self.totes_les_configuracions if c.pagina in pagines]
+        dades, cfg_mixer = self._dades_perfil(), self.config_mixer
+
+        def en_acabar(f: Future):
+            if f.exception() is not None:
+                LOG.error("Error exportant el paquet %s: %s", arxiu, f.exception())
+                messagebox.showerror("Error en exportar", f"No s'ha pogut exportar el paquet:\n{f.exception()}", parent=self.finestra)
+            else:
+                messagebox.showinfo("Paquet exportat", f"S'han empaquetat {f.result()} sons a:\n{arxiu}", parent=self.finestra)
+
+        fut = self.executor_precarrega.submit(exportar_paquet, dades, configs, Path(arxiu), cfg_mixer, self.index_loudness)
+        fut.add_done_callback(lambda f: self._executar_a_ui(lambda: en_acabar(f)))
+
+    def renderitzar_escaleta(self):
+        arxiu = filedialog.askopenfilename(title="Renderitzar escaleta...",
+                                           filetypes=[("Escaletes", "*" + EXTENSIO_ESCALETA), ("Tots els arxius", "*.*")],
+                                           initialdir=str(ESCALETES_DIR))
+        if not arxiu:
+            return
+        desti = filedialog.asksaveasfilename(title="Desar la mescla com...", filetypes=[("WAV", "*.wav")],
+                                             defaultextension=".wav", initialdir=str(ESCALETES_DIR),
+                                             initialfile=Path(arxiu).stem + ".wav")
+        if not desti:
+            return
+
+        def en_acabar(f: Future):
+            if f.exception() is not None:
+                LOG.error("Error renderitzant l'escaleta %s: %s", arxiu, f.exception())
+                messagebox.showerror("Error en renderitzar", f"No s'ha pogut renderitzar l'escaleta:\n{f.exception()}", parent=self.finestra)
+                return
+            r = f.result()
+            missatge = f"{r['durada_s'] / 60:.1f} minuts de show mesclats en {r['temps_s']:.1f} s a:\n{desti}"
+            if r["omesos"]:
+                missatge += "\n\nArxius que no s'han pogut llegir (en silenci):\n" + "\n".join(r["omesos"])
+            messagebox.showinfo("Escaleta renderitzada", missatge, parent=self.finestra)
+
+        fut = self.executor_precarrega.submit(renderitzar_escaleta, Path(arxiu), Path(desti), self.config_mixer)
+        fut.add_done_callback(lambda f: self._executar_a_ui(lambda: en_acabar(f)))
+
+    def importar_paquet(self):
+        arxiu = filedialog.askopenfilename(title="Importar paquet...",
+                                           filetypes=[("Paquets de botonera", "*" + EXTENSIO_PAQUET), ("Tots els arxius", "*.*")],
+                                           initialdir=str(PERFILS_DIR))
+        if not arxiu:
+            return
+
+        def en_acabar(f: Future):
+            if f.exception() is not None:
+                LOG.error("Error important el paquet %s: %s", arxiu, f.exception())
+                messagebox.showerror("Error en importar", f"No s'ha pogut importar el paquet:\n{f.exception()}", parent=self.finestra)
+            else:
+                self.obrir_perfil(str(f.result()))
+
+        fut = self.executor_precarrega.submit(importar_paquet, Path(arxiu), self.index_loudness)
+        fut.add_done_callback(lambda f: self._executar_a_ui(lambda: en_acabar(f)))
+
+    def _pagines_a_desar(self) -> set:
+        """Pàgines carregades que cal desar: la primera i les que tenen algun botó assignat."""
+        return {p for p, configs in self.configs_per_pagina.items() if p == 0 or any(c.arxiu for c in configs)}
+
     def centrar_finestra(self):
         self.finestra.update_idletasks()
         w = self.finestra.winfo_reqwidth()
@@ -653,9 +3951,11 @@ class BotoneraApp:
         self.finestra.geometry(f"{w}x{h}+{x}+{y}")
 
     def parar_tots_els_sons(self):
-        if not MIXER_OK:
-            return
-        pygame.mixer.stop()
+        self.despatxador.aturar_tot()
+
+    def fondre_tots_els_sons(self):
+        """Pànic suau: esvaeix tots els sons en FOSA_PANIC_MS."""
+        self.despatxador.fondre_tot(FOSA_PANIC_MS)
 
     def canviar_volum(self, valor):
         if not MIXER_OK:
@@ -664,26 +3964,140 @@ class BotoneraApp:
             v = float(valor) / 100.0
             self.volum_actual = v
             self.etiqueta_valor_volum.config(text=f"{int(float(valor))}%")
-            # Ajustem volums dels canals ocupats
-            for b in self.botons_widgets:
-                if b.channel and b.channel.get_busy():
-                    try:
-                        b.channel.set_volume(self.volum_actual)
-                    except Exception:
-                        pass
+            # El despatxador ajusta els canals que sonen, en ordre amb els disparaments
+            self.despatxador.canviar_volum(self.volum_actual)
         except Exception:
             LOG.debug("Valor de volum incorrecte: %s", valor)
 
     def get_volum_actual(self) -> float:
         return self.volum_actual
 
-    def _update_playback_loop(self):
-        for b in self.botons_widgets:
-            b.update_visuals()
-        try:
-            self.finestra.after(100, self._update_playback_loop)
-        except tk.TclError:
-            pass
+    # ---------- Configuració del mixer ----------
+    def aplicar_config_mixer(self, cfg: ConfiguracioMixer):
+        """Reinicia el mixer amb `cfg` al fil d'àudio. Els sons de la memòria cau depenen del format i es descarten."""
+        self.config_mixer = cfg
+        self.mixer_pendent = True
+
+        def reiniciar() -> bool:
+            return self.despatxador.reiniciar_sortida(cfg)
+
+        def en_acabar(ok: bool):
+            self.mixer_pendent = False
+            if not ok:
+                messagebox.showerror("Error d'àudio", "No s'ha pogut iniciar el mixer amb aquesta configuració.", parent=self.finestra)
+                return
+            self.precarregar_graella()
+
+        self.despatxador.executar(reiniciar, en_acabar)
+
+    def obrir_config_mixer(self):
+        top = Toplevel(self.finestra)
+        top.title("Configuració del mixer")
+        top.config(bg="#333")
+        top.attributes("-topmost", True)
+        top.grab_set()
+
+        f_camps = tk.Frame(top, bg="#333")
+        f_camps.pack(padx=15, pady=10, fill="x")
+
+        def camp(fila: int, text: str, widget: tk.Widget):
+            Label(f_camps, text=text, font=("Arial", 10), fg="white", bg="#333").grid(row=fila, column=0, sticky="w", pady=3)
+            widget.grid(row=fila, column=1, sticky="we", padx=(10, 0), pady=3)
+
+        combo_freq = ttk.Combobox(f_camps, values=FREQUENCIES_MIXER, state="readonly", font=("Arial", 12), width=10)
+        combo_freq.set(self.config_mixer.frequencia)
+        camp(0, "Freqüència (Hz):", combo_freq)
+
+        combo_buffer = ttk.Combobox(f_camps, values=BUFFERS_MIXER, state="readonly", font=("Arial", 12), width=10)
+        combo_buffer.set(self.config_mixer.buffer)
+        camp(1, "Buffer (frames):", combo_buffer)
+
+        spin_canals = tk.Spinbox(f_camps, from_=8, to=CANALS_MAXIMS, increment=8, font=("Arial", 12), width=10)
+        spin_canals.delete(0, tk.END)
+        spin_canals.insert(0, str(self.config_mixer.canals))
+        camp(2, "Canals simultanis:", spin_canals)
+
+        spin_memoria = tk.Spinbox(f_camps, from_=16, to=4096, increment=16, font=("Arial", 12), width=10)
+        spin_memoria.delete(0, tk.END)
+        spin_memoria.insert(0, str(self.cache_mostres.pressupost_bytes // (1024 * 1024)))
+        camp(3, "Memòria cau (MB):", spin_memoria)
+
+        combo_motor = ttk.Combobox(f_camps, values=list(MOTORS_AUDIO.values()), state="readonly", font=("Arial", 12), width=34)
+        combo_motor.set(MOTORS_AUDIO[self.config_mixer.motor])
+        camp(4, "Motor d'àudio:", combo_motor)
+
+        spin_flux = tk.Spinbox(f_camps, from_=1, to=1024, increment=8, font=("Arial", 12), width=10)
+        spin_flux.delete(0, tk.END)
+        spin_flux.insert(0, str(self.config_mixer.llindar_flux_mb))
+        camp(5, "Sons en flux a partir de (MB):", spin_flux)
+
+        text_prova = tk.Text(top, height=9, width=58, font=("Consolas", 9), bg="#222", fg="white", relief="flat")
+        text_prova.pack(padx=15, pady=(0, 10))
+        text_prova.insert(tk.END, "Fes la prova de latència per triar el buffer més petit sense underruns.")
+        text_prova.config(state="disabled")
+
+        def mostrar_resultats(resultats: List[Dict[str, Any]]):
+            linies = ["Buffer  Buffer (ms)  Sortida (ms)  Underruns  Interval màx.  Estat"]
+            recomanat = None
+            for r in resultats:
+                if not r["ok"]:
+                    linies.append(f"{r['buffer']:>6}  {r['latencia_buffer_ms']:>11.1f}  {'error':>12}")
+                    continue
+                estat = "estable" if r["estable"] else "inestable"
+                linies.append(f"{r['buffer']:>6}  {r['latencia_buffer_ms']:>11.1f}  {r['latencia_sortida_ms']:>12.1f}"
+                              f"  {r['underruns']:>9}  {r['interval_maxim_ms']:>10.1f} ms  {estat}")
+                if r["estable"] and recomanat is None:
+                    recomanat = r["buffer"]
+            if recomanat is not None:
+                linies.append(f"\nRecomanat: buffer {recomanat}")
+                combo_buffer.set(recomanat)
+            try:
+                text_prova.config(state="normal")
+                text_prova.delete("1.0", tk.END)
+                text_prova.insert(tk.END, "\n".join(linies))
+                text_prova.config(state="disabled")
+                btn_prova.config(state="normal")
+            except tk.TclError:
+                pass
+
+        def fer_prova():
+            btn_prova.config(state="disabled")
+            frequencia = int(combo_freq.get())
+            self.mixer_pendent = True
+
+            def prova() -> List[Dict[str, Any]]:
+                self.despatxador.tancar_sortida()
+                resultats = provar_latencia_mixer(frequencia, BUFFERS_MIXER)
+                self.despatxador.reiniciar_sortida(self.config_mixer)
+                return resultats
+
+            def en_acabar(resultats: List[Dict[str, Any]]):
+                self.mixer_pendent = False
+                mostrar_resultats(resultats)
+                self.precarregar_graella()
+
+            self.despatxador.executar(prova, en_acabar)
+
+        def aplicar():
+            try:
+                motor = next(k for k, v in MOTORS_AUDIO.items() if v == combo_motor.get())
+                nova = ConfiguracioMixer(frequencia=int(combo_freq.get()), buffer=int(combo_buffer.get()),
+                                         canals=max(1, min(int(spin_canals.get()), CANALS_MAXIMS)), motor=motor,
+                                         llindar_flux_mb=max(1, int(spin_flux.get())))
+                memoria_mb = max(1, int(spin_memoria.get()))
+            except ValueError:
+                messagebox.showerror("Valor incorrecte", "Els valors han de ser nombres enters.", parent=top)
+                return
+            self.cache_mostres.canviar_pressupost(memoria_mb * 1024 * 1024)
+            if nova != self.config_mixer or not MIXER_OK:
+                self.aplicar_config_mixer(nova)
+            top.destroy()
+
+        f_accions = tk.Frame(top, bg="#333")
+        f_accions.pack(padx=15, pady=(0, 15), fill="x")
+        btn_prova = tk.Button(f_accions, text="⏱ Prova de latència", command=fer_prova)
+        btn_prova.pack(side="left", fill="x", expand=True, padx=(0, 5))
+        tk.Button(f_accions, text="Aplicar", font=("Arial", 12, "bold"), command=aplicar).pack(side="left", fill="x", expand=True)
 
     # ---------------- Enregistrament ----------------
     def toggle_enregistrament(self):
@@ -696,74 +4110,136 @@ class BotoneraApp:
         if not MIXER_OK:
             messagebox.showerror("Error d'àudio", "No s'ha pogut iniciar el dispositiu d'àudio (mixer).", parent=self.finestra)
             return
-        self.is_recording = True
-        self.recording_frames.clear()
-        self.parar_tots_els_sons()
-        self.recording_thread = threading.Thread(target=self._tasca_enregistrament, daemon=True)
-        self.recording_thread.start()
-        self._iniciar_blink()
+        if self.enregistrador is not None:
+            return  # l'anterior encara s'està tancant
 
-    def _tasca_enregistrament(self):
+        rel_path = self._nou_cami_enregistrament("enregistrament")
+        try:
+            self.enregistrador = EnregistradorStreaming(SCRIPT_DIR / rel_path)
+        except Exception as e:
+            LOG.exception("Error creant l'arxiu d'enregistrament: %s", e)
+            messagebox.showerror("Error en desar", f"No s'ha pogut crear l'arxiu .wav:\n{e}", parent=self.finestra)
+            return
         try:
-            with sd.InputStream(samplerate=SAMPLERATE, channels=CHANNELS, dtype=DTYPE, blocksize=FRAMES_PER_BUFFER) as stream:
-                LOG.info("Enregistrament iniciat...")
-                while self.is_recording:
-                    frames, overflowed = stream.read(FRAMES_PER_BUFFER)
-                    if overflowed:
-                        LOG.warning("Overflow en enregistrament.")
-                    self.recording_frames.append(frames)
+            self.enregistrador.iniciar_captura(captura=self.captura_continua)
         except Exception as e:
             LOG.exception("Error durant l'enregistrament: %s", e)
-            self.is_recording = False
-            self.finestra.after(0, lambda: messagebox.showerror("Error d'enregistrament", f"No s'ha pogut accedir al micròfon:\n{e}", parent=self.finestra))
-        LOG.info("Enregistrament aturat.")
+            self.enregistrador = None
+            try:
+                (SCRIPT_DIR / rel_path).unlink()
+            except OSError:
+                pass
+            messagebox.showerror("Error d'enregistrament", f"No s'ha pogut accedir al micròfon:\n{e}", parent=self.finestra)
+            return
+        LOG.info("Enregistrament iniciat...")
+        self.last_recording_path_relatiu = str(rel_path)
+        self.is_recording = True
+        self.parar_tots_els_sons()
+        self._iniciar_blink()
+        self._actualitzar_vumetre()
+
+    def _nou_cami_enregistrament(self, prefix: str) -> Path:
+        """Camí relatiu d'un WAV nou a la carpeta d'enregistraments."""
+        enregistraments_dir = SCRIPT_DIR / "enregistraments"
+        enregistraments_dir.mkdir(parents=True, exist_ok=True)
+        return Path("enregistraments") / f"{prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.wav"
 
     def aturar_enregistrament(self):
-        if not self.recording_thread:
+        if not self.enregistrador or not self.is_recording:
             return
         self.is_recording = False
         self._aturar_blink()
         if self.btn_record:
             self.btn_record.config(text="PROCESSANT...", state="disabled")
-        self.finestra.after(100, self._finalitzar_enregistrament)
+        LOG.info("Enregistrament aturat.")
+        # L'escriptor tanca el micròfon i l'arxiu i avisa la interfície quan ha acabat
+        self.enregistrador.aturar(en_acabar=lambda: self._executar_a_ui(self._finalitzar_enregistrament))
 
     def _finalitzar_enregistrament(self):
-        if self.recording_thread:
-            self.recording_thread.join()
-            self.recording_thread = None
+        enregistrador = self.enregistrador
+        self.enregistrador = None
         if self.btn_record:
             self.btn_record.config(text="Enregistra", state="normal", bg=COLOR_VERMELL, activebackground=COLOR_VERMELL)
+        if enregistrador is None:
+            return
 
-        if not self.recording_frames:
-            LOG.info("No s'ha enregistrat res.")
+        if enregistrador.error is not None:
+            messagebox.showerror("Error en desar", f"No s'ha pogut desar l'arxiu .wav:\n{enregistrador.error}", parent=self.finestra)
             return
 
-        try:
-            recording = np.concatenate(self.recording_frames, axis=0)
-        except Exception:
-            LOG.exception("Error concatenant enregistraments")
+        if not enregistrador.frames_escrits:
+            LOG.info("No s'ha enregistrat res.")
+            try:
+                enregistrador.cami.unlink()
+            except OSError:
+                LOG.debug("No s'ha pogut esborrar l'arxiu buit.")
             return
 
-        enregistraments_dir = SCRIPT_DIR / "enregistraments"
-        enregistraments_dir.mkdir(parents=True, exist_ok=True)
-        filename = f"enregistrament_{datetime.now().strftime('%Y%m%d_%H%M%S')}.wav"
-        rel_path = Path("enregistraments") / filename
-        self.last_recording_path_relatiu = str(rel_path)
-        cami_absolut = SCRIPT_DIR / rel_path
+        LOG.info("Arxiu desat a: %s", enregistrador.cami)
+        avis = ""
+        if enregistrador.frames_perduts or enregistrador.overflows:
+            avis = (f"\n\nAtenció: s'han perdut {enregistrador.frames_perduts} frames "
+                    f"i hi ha hagut {enregistrador.overflows} overflows d'entrada.")
+        if enregistrador.mesurador.retalls:
+            avis += f"\n\nAtenció: {enregistrador.mesurador.retalls} blocs amb retall (clipping)."
+        # Preguntem si volem assignar al primer botó buit
+        self.demanar_desar_enregistrament(avis, enregistrador.mesurador)
+
+    def commutar_captura_continua(self):
+        if self.var_captura_continua.get():
+            captura = CapturaContinua()
+            try:
+                captura.iniciar()
+            except Exception as e:
+                LOG.exception("Error obrint la captura contínua: %s", e)
+                self.var_captura_continua.set(False)
+                messagebox.showerror("Error d'enregistrament", f"No s'ha pogut accedir al micròfon:\n{e}", parent=self.finestra)
+                return
+            self.captura_continua = captura
+            LOG.info("Captura contínua activada: es guarden els últims %d s.", captura.segons)
+        elif self.captura_continua is not None:
+            if self.captura_continua.receptor is not None:
+                # L'enregistrament en curs rep el so a través d'aquesta captura
+                self.var_captura_continua.set(True)
+                messagebox.showinfo("Captura contínua", "Atura l'enregistrament abans de desactivar la captura contínua.", parent=self.finestra)
+                return
+            self.captura_continua.aturar()
+            self.captura_continua = None
+            LOG.info("Captura contínua desactivada.")
 
+    def desar_captura_continua(self, segons: int):
+        """Desa els últims `segons` de la captura contínua i segueix el mateix camí que un enregistrament."""
+        captura = self.captura_continua
+        if captura is None:
+            messagebox.showinfo("Captura contínua", "Activa primer la captura contínua al menú Captura.", parent=self.finestra)
+            return
+        dades = captura.ultims(segons)
+        if not len(dades):
+            LOG.info("La captura contínua encara no té res.")
+            return
+        rel_path = self._nou_cami_enregistrament("captura")
         try:
-            sf.write(str(cami_absolut), recording, SAMPLERATE)
-            LOG.info("Arxiu desat a: %s", cami_absolut)
+            sf.write(str(SCRIPT_DIR / rel_path), dades, captura.samplerate)
         except Exception as e:
-            LOG.exception("Error desant arxiu: %s", e)
+            LOG.exception("Error desant la captura contínua: %s", e)
             messagebox.showerror("Error en desar", f"No s'ha pogut desar l'arxiu .wav:\n{e}", parent=self.finestra)
             return
+        LOG.info("Captura contínua desada a: %s (%.1f s)", rel_path, len(dades) / captura.samplerate)
+        mesurador = MesuradorEntrada()
+        for i in range(0, len(dades), FRAMES_PER_BUFFER):
+            mesurador.afegir(dades[i:i + FRAMES_PER_BUFFER])
+        self.last_recording_path_relatiu = str(rel_path)
+        avis = ""
+        if mesurador.retalls:
+            avis = f"\n\nAtenció: {mesurador.retalls} blocs amb retall (clipping)."
+        self.demanar_desar_enregistrament(avis, mesurador)
 
-        # Preguntem si volem assignar al primer botó buit
-        self.demanar_desar_enregistrament()
-
-    def demanar_desar_enregistrament(self):
-        conservar = messagebox.askyesno("Enregistrament finalitzat", "Enregistrament completat!\n\nVols assignar aquest enregistrament al primer botó buit?", parent=self.finestra)
+    def demanar_desar_enregistrament(self, avis: str = "", mesurador: Optional[MesuradorEntrada] = None):
+        previsualitzacio = self.mostrar_forma_ona(mesurador) if mesurador is not None else None
+        conservar = messagebox.askyesno("Enregistrament finalitzat", f"Enregistrament completat!{avis}\n\nVols assignar aquest enregistrament al primer botó buit?",
+                                        parent=previsualitzacio or self.finestra)
+        if previsualitzacio is not None:
+            previsualitzacio.destroy()
         if conservar:
             self.afegir_enregistrament_a_boto()
         else:
@@ -776,22 +4252,66 @@ class BotoneraApp:
                 LOG.debug("No s'ha pogut esborrar l'arxiu descartat.")
 
     def afegir_enregistrament_a_boto(self):
-        index_buit = -1
-        for i, cfg in enumerate(self.totes_les_configuracions):
-            if not cfg.arxiu and cfg.nom == "Buit":
-                index_buit = i
-                break
-        if index_buit == -1:
-            messagebox.showwarning("Graella plena", "No s'ha trobat cap botó buit. L'enregistrament s'ha desat a la carpeta 'enregistraments'.", parent=self.finestra)
-            return
-        cfg = self.totes_les_configuracions[index_buit]
+        # Primer un botó buit visible; si no n'hi ha, el primer de qualsevol pàgina; si no, una pàgina nova
+        candidats = [b.config for b in self.botons_widgets] + self.totes_les_configuracions
+        cfg = next((c for c in candidats if not c.arxiu and c.nom == "Buit"), None)
+        if cfg is None:
+            cfg = self.configs_de_pagina(self.nombre_pagines)[0]
         cfg.arxiu = self.last_recording_path_relatiu
         cfg.nom = Path(self.last_recording_path_relatiu).stem
         cfg.emoji = "🎙️"
         cfg.color = COLOR_LILA
-        # regen to show changes
-        self.on_format_graella_canvia()
-        LOG.info("Enregistrament assignat al botó %d", index_buit + 1)
+        # Només cal redibuixar el botó afectat
+        btn = self._boto_per_id(cfg.id)
+        if btn is not None:
+            btn.actualitzar(cfg)
+            self.precarregar_boto(btn)
+        self.analitzar_loudness([cfg])
+        self.invalidar_cerca()
+        self.registrar_canvi(cfg)
+        if btn is None:
+            self._actualitzar_etiqueta_pagina()
+        LOG.info("Enregistrament assignat a un botó de la pàgina %d", cfg.pagina + 1)
+
+    def _actualitzar_vumetre(self):
+        enregistrador = self.enregistrador
+        amplada = int(self.canvas_nivell.cget("width"))
+        alcada = int(self.canvas_nivell.cget("height"))
+        self.canvas_nivell.delete("all")
+        if not self.is_recording or enregistrador is None:
+            return  # quan no s'enregistra, no es programa cap refresc
+
+        pic, rms = enregistrador.mesurador.llegir_nivells()
+
+        def a_pixels(valor: float) -> int:
+            db = max(a_dbfs(valor), DB_MINIM_VUMETRE)
+            return int(amplada * (1.0 - db / DB_MINIM_VUMETRE))
+
+        x_rms = a_pixels(rms)
+        self.canvas_nivell.create_rectangle(0, 0, x_rms, alcada, fill=COLOR_VERD if x_rms < amplada * 0.9 else COLOR_TARONJA, width=0)
+        x_pic = a_pixels(pic)
+        color_pic = COLOR_VERMELL if pic >= MesuradorEntrada.LLINDAR_RETALL else "white"
+        self.canvas_nivell.create_line(x_pic, 0, x_pic, alcada, fill=color_pic, width=2)
+        self.finestra.after(INTERVAL_VUMETRE_MS, self._actualitzar_vumetre)
+
+    def mostrar_forma_ona(self, mesurador: MesuradorEntrada) -> Toplevel:
+        """Finestra amb el resum mínim/màxim de l'enregistrament per veure retalls i silencis."""
+        amplada, alcada = 600, 160
+        top = Toplevel(self.finestra)
+        top.title("Previsualització de l'enregistrament")
+        top.config(bg="#333")
+        top.attributes("-topmost", True)
+        canvas = tk.Canvas(top, width=amplada, height=alcada, bg="#222", highlightthickness=0)
+        canvas.pack(padx=15, pady=15)
+
+        mig = alcada / 2
+        canvas.create_line(0, mig, amplada, mig, fill=COLOR_GRIS)
+        mins, maxs = mesurador.forma_ona(amplada)
+        for x, (mn, mx) in enumerate(zip(mins.tolist(), maxs.tolist())):
+            retalla = max(mx, -mn) >= MesuradorEntrada.LLINDAR_RETALL
+            canvas.create_line(x, mig - mx * mig, x, mig - mn * mig + 1, fill=COLOR_VERMELL if retalla else COLOR_TURQUESA)
+        top.update_idletasks()
+        return top
 
     def _iniciar_blink(self):
         self.blink_on = True
@@ -818,6 +4338,109 @@ class BotoneraApp:
         except tk.TclError:
             self.blink_on = False
 
+    # ---------- Llançador ----------
+    def invalidar_cerca(self):
+        """Les configuracions han canviat: l'índex del llançador es reconstruirà en obrir-lo."""
+        self._signatura_cerca = None
+
+    def _carpetes_cerca(self) -> List[Path]:
+        return [PERFILS_DIR, SCRIPT_DIR / "enregistraments"]
+
+    def _arxius_cerca(self) -> Tuple[Tuple[Path, Path], ...]:
+        """(arxiu, carpeta) de cada so de les carpetes de cerca, subcarpetes incloses."""
+        arxius = []
+        for carpeta in self._carpetes_cerca():
+            if carpeta.is_dir():
+                arxius += [(cami, carpeta) for cami in sorted(carpeta.rglob("*")) if cami.suffix.lower() in EXTENSIONS_SO]
+        return tuple(arxius)
+
+    def _actualitzar_index_cerca(self):
+        """Reconstrueix l'índex si les configuracions o els arxius de les carpetes han canviat."""
+        # La mtime d'una carpeta no canvia quan s'afegeix un arxiu a una subcarpeta: es compara la llista sencera
+        signatura = self._arxius_cerca()
+        if signatura == self._signatura_cerca:
+            return
+        self.carregar_totes_les_pagines()
+        t0 = time.perf_counter()
+        entrades: List[EntradaCerca] = []
+        assignats = set()
+        for cfg in self.totes_les_configuracions:
+            if not cfg.arxiu:
+                continue
+            assignats.add(resoldre_cami(cfg.arxiu))
+            text = f"{cfg.emoji} {cfg.nom} {Path(cfg.arxiu).name}"
+            entrades.append(EntradaCerca(normalitzar_cerca(text), f"{cfg.emoji} {cfg.nom}  · pàg. {cfg.pagina + 1}", cfg.id))
+        self.configs_efimeres.clear()
+        for cami, carpeta in signatura:
+            if cami in assignats:
+                continue
+            id_efimer = -(len(self.configs_efimeres) + 1)
+            self.configs_efimeres[id_efimer] = ButtonConfig(id=id_efimer, nom=cami.stem, arxiu=str(cami))
+            entrades.append(EntradaCerca(normalitzar_cerca(f"{cami.name} {carpeta.name}"),
+                                         f"📄 {cami.name}  · {carpeta.name}", id_efimer))
+        if self.index_cerca is None:
+            self.index_cerca = IndexCerca()
+        self.index_cerca.reconstruir(entrades)
+        self._signatura_cerca = signatura
+        LOG.info("Índex del llançador: %d entrades (%.1f ms)", len(entrades), (time.perf_counter() - t0) * 1000.0)
+
+    def obrir_llancador(self):
+        """Paleta de cerca: escriure filtra, ↑/↓ tria i Retorn dispara com un clic al botó."""
+        if getattr(self, "top_llancador", None) is not None and self.top_llancador.winfo_exists():
+            self.top_llancador.deiconify()
+            self.top_llancador.focus_force()
+            return
+        self._actualitzar_index_cerca()
+
+        top = Toplevel(self.finestra)
+        self.top_llancador = top
+        top.title("Llançador")
+        top.config(bg="#333")
+        top.attributes("-topmost", True)
+        entrada = tk.Entry(top, font=("Arial", 16), width=40)
+        entrada.pack(padx=10, pady=(10, 5), fill="x")
+        llista = tk.Listbox(top, font=("Segoe UI Emoji", 12), height=IndexCerca.MAX_RESULTATS, bg="#222", fg="white",
+                            selectbackground=COLOR_BLAU, activestyle="none", relief="flat")
+        llista.pack(padx=10, pady=(0, 10), fill="both", expand=True)
+        resultats: List[EntradaCerca] = []
+
+        def filtrar(*_):
+            resultats[:] = self.index_cerca.cercar(entrada.get())
+            llista.delete(0, tk.END)
+            for r in resultats:
+                llista.insert(tk.END, r.etiqueta)
+            if resultats:
+                llista.selection_set(0)
+
+        def moure(delta: int):
+            if not resultats:
+                return "break"
+            actual = llista.curselection()
+            nou = max(0, min(len(resultats) - 1, (actual[0] if actual else 0) + delta))
+            llista.selection_clear(0, tk.END)
+            llista.selection_set(nou)
+            llista.see(nou)
+            return "break"
+
+        def disparar(_event=None):
+            seleccio = llista.curselection()
+            if resultats and seleccio:
+                # El mateix camí que SoundButton.reproduir
+                self.despatxador.disparar(resultats[seleccio[0]].id_boto)
+            top.destroy()
+
+        entrada.bind("<KeyRelease>", lambda e: None if e.keysym in ("Up", "Down", "Return", "Escape") else filtrar())
+        entrada.bind("<Up>", lambda e: moure(-1))
+        entrada.bind("<Down>", lambda e: moure(1))
+        entrada.bind("<Return>", disparar)
+        llista.bind("<Double-Button-1>", disparar)
+        top.bind("<Escape>", lambda e: top.destroy())
+        top.update_idletasks()
+        x = self.finestra.winfo_rootx() + (self.finestra.winfo_width() - top.winfo_reqwidth()) // 2
+        top.geometry(f"+{max(x, 0)}+{self.finestra.winfo_rooty() + 60}")
+        top.focus_force()
+        entrada.focus_set()
+
     # ---------- About ----------
     def mostrar_about(self):
         text_about = """BOTONERA VIRTUAL DE SONS v1.0
@@ -831,17 +4454,119 @@ La nota de copyright anterior i aquest avís de permís s'han d'incloure en tote
 EL PROGRAMARI ES PROPORCIONA "TAL QUAL", SENSE CAP GARANTIA DE CAP MENA, EXPRESSA O IMPLÍCITA, INCLOSA PERÒ NO LIMITADA A LES GARANTIES DE COMERCIALITZACIÓ, ADEQUACIÓ PER A UN PROPÒSIT PARTICULAR I NO VIOLACIÓ DE DRETS. EN CAP CAS ELS AUTORS O TITULARS DEL COPYRIGHT SERAN RESPONSABLES PER RECLAMACIONS, DANYS O ALTRES RESPONSABILITATS, SIGUI EN UNA ACCIÓ CONTRACTUAL, AGREUJANT O ALTRA, PROCEDENTS DE, O RELACIONADES AMB EL PROGRAMARI O L'ÚS O ALTRES OPERACIONS EN EL PROGRAMARI."""
         messagebox.showinfo("Quant a Botonera", text_about, parent=self.finestra)
 
+    # ---------- Estadístiques ----------
+    def commutar_panell_estadistiques(self):
+        if self.panell_estadistiques is not None:
+            self._tancar_panell_estadistiques()
+            return
+        top = Toplevel(self.finestra)
+        top.title("Estadístiques")
+        top.config(bg="#333")
+        top.attributes("-topmost", True)
+        top.protocol("WM_DELETE_WINDOW", self._tancar_panell_estadistiques)
+        self.panell_estadistiques = top
+        self.etiqueta_estadistiques = tk.Label(top, font=("Consolas", 10), fg="white", bg="#222", justify="left",
+                                               anchor="nw", width=52, height=12)
+        self.etiqueta_estadistiques.pack(padx=10, pady=(10, 5))
+        tk.Checkbutton(top, text=f"Continuar registrant a {ARXIU_ESTADISTIQUES.name} amb el panell tancat",
+                       variable=self.var_registre_permanent, fg="white", bg="#333", selectcolor="#333",
+                       activebackground="#333", activeforeground="white").pack(padx=10, pady=(0, 10), anchor="w")
+        self._activar_instrumentacio()
+        self._refrescar_panell_estadistiques()
+
+    def _tancar_panell_estadistiques(self):
+        if self.panell_estadistiques is not None:
+            self.panell_estadistiques.destroy()
+            self.panell_estadistiques = None
+        if self.estadistiques_after_id:
+            self.finestra.after_cancel(self.estadistiques_after_id)
+            self.estadistiques_after_id = None
+        self.despatxador.instrumentacio.activa = self.var_registre_permanent.get()
+        if not self.despatxador.instrumentacio.activa and self.lag_tk_after_id:
+            self.finestra.after_cancel(self.lag_tk_after_id)
+            self.lag_tk_after_id = None
+
+    def _activar_instrumentacio(self):
+        instrumentacio = self.despatxador.instrumentacio
+        if instrumentacio.activa:
+            return
+        instrumentacio.activa = True
+        self._mesurar_lag_tk(None)
+
+    def _mesurar_lag_tk(self, previst: Optional[float]):
+        """Compara quan s'executa un after() amb quan s'havia demanat: és el retard del bucle de Tk."""
+        instrumentacio = self.despatxador.instrumentacio
+        if not instrumentacio.activa:
+            return
+        if previst is not None:
+            instrumentacio.registrar_lag_tk(max(0.0, (time.perf_counter() - previst) * 1000.0))
+        previst = time.perf_counter() + INTERVAL_LAG_TK_MS / 1000.0
+        self.lag_tk_after_id = self.finestra.after(INTERVAL_LAG_TK_MS, lambda: self._mesurar_lag_tk(previst))
+
+    def _refrescar_panell_estadistiques(self):
+        if self.panell_estadistiques is None:
+            return
+        # L'ocupació de la sortida es consulta al fil del despatxador, com qualsevol altra crida d'àudio
+        self.despatxador.executar(lambda: (self.despatxador.nombre_veus(), self.despatxador.sortida.ocupacio()),
+                                  self._mostrar_estadistiques)
+        self.estadistiques_after_id = self.finestra.after(250, self._refrescar_panell_estadistiques)
+
+    def _mostrar_estadistiques(self, ocupacio: Tuple[int, Tuple[int, int]]):
+        if self.panell_estadistiques is None:
+            return
+        veus, (ocupats, capacitat) = ocupacio
+        resum = self.despatxador.instrumentacio.resum()
+        linies = [f"Disparaments recents: {resum['n']}", "           p50       p95       màx"]
+        for tram in ("total", "cua", "mostra", "play"):
+            t = resum[tram]
+            linies.append(f"  {tram:<7}{t['p50']:>6.1f} ms{t['p95']:>7.1f} ms{t['max']:>7.1f} ms")
+        ultim = resum["ultim"]
+        if ultim is not None:
+            dades = ultim.to_dict()
+            robada = ", veu robada" if ultim.robada else ""
+            linies.append(f"Últim: botó {ultim.id_boto}, {dades['total_ms']:.1f} ms ({ultim.motiu}{robada})")
+        linies.append(f"Bucle Tk: retard {resum['lag_tk']['ultim']:.0f} ms, màx {resum['lag_tk']['max']:.0f} ms")
+        linies.append(f"Veus actives: {veus}   Sortida: {ocupats}/{capacitat} ocupats")
+        linies.append(f"Memòria cau: {self.cache_mostres.bytes_totals / 2 ** 20:.0f}/"
+                      f"{self.cache_mostres.pressupost_bytes / 2 ** 20:.0f} MB")
+        self.etiqueta_estadistiques.config(text="\n".join(linies))
+
+    # ---------- Control remot ----------
+    def iniciar_control_remot(self, host: str = HOST_CONTROL, port_http: int = PORT_HTTP_CONTROL,
+                              port_udp: int = PORT_UDP_CONTROL, token: Optional[str] = None):
+        servidor = ServidorControl(self, host, port_http, port_udp, token)
+        try:
+            servidor.iniciar()
+        except Exception as e:
+            LOG.error("No s'ha pogut iniciar el control remot a %s:%d: %s", host, port_http, e)
+            messagebox.showerror("Control remot", f"No s'ha pogut iniciar el control remot:\n{e}", parent=self.finestra)
+            return
+        self.servidor_control = servidor
+
     # ---------- Tancar ----------
     def en_tancar(self):
         LOG.info("Tancant l'aplicació...")
+        self._tancant = True
+        self._avis_ui.set()  # el despertador de la interfície acaba
+        if self.servidor_control is not None:
+            self.servidor_control.aturar()
         self.is_recording = False
-        try:
-            if MIXER_OK:
-                pygame.mixer.quit()
-        except Exception:
-            LOG.debug("Error tancant mixer", exc_info=True)
+        if self.enregistrador is not None:
+            self.enregistrador.aturar()
+        if self.captura_continua is not None:
+            self.captura_continua.aturar()
+        self.executor_precarrega.shutdown(wait=False, cancel_futures=True)
+        self.executor_loudness.shutdown(wait=False, cancel_futures=True)
+        self.index_loudness.desar()
+        self.despatxador.tancar()  # tanca també la sortida d'àudio
+        self.cache_mostres.buidar()
 
         # eliminar hotkeys
+        if self._handle_llancador is not None:
+            try:
+                keyboard.remove_hotkey(self._handle_llancador)
+            except Exception:
+                pass
         for tecla, info in list(self.hotkey_registry.items()):
             try:
                 handle = info.get("handle")
@@ -857,6 +4582,27 @@ EL PROGRAMARI ES PROPORCIONA "TAL QUAL", SENSE CAP GARANTIA DE CAP MENA, EXPRESS
 
 # --- Main ---
 def main():
+    parser = argparse.ArgumentParser(description="Botonera virtual de sons")
+    parser.add_argument("--control-remot", action="store_true", help="obre el servidor de control remot (HTTP i UDP)")
+    parser.add_argument("--host", default=HOST_CONTROL, help="adreça del control remot; 0.0.0.0 per a tota la xarxa local")
+    parser.add_argument("--port-http", type=int, default=PORT_HTTP_CONTROL)
+    parser.add_argument("--port-udp", type=int, default=PORT_UDP_CONTROL)
+    parser.add_argument("--token", default=os.environ.get("BOTONERA_TOKEN"),
+                        help="testimoni que ha de portar cada ordre del control remot (o BOTONERA_TOKEN)")
+    parser.add_argument("--renderitzar", metavar="ESCALETA", help="mescla una escaleta en un WAV i surt, sense obrir la finestra")
+    parser.add_argument("--wav", help="WAV de sortida de --renderitzar (per defecte, al costat de l'escaleta)")
+    parser.add_argument("--frequencia", type=int, default=SAMPLERATE, help="freqüència del WAV de --renderitzar")
+    parser.add_argument("--llindar-flux-mb", type=int, default=ConfiguracioMixer.llindar_flux_mb,
+                        help="com a la configuració del mixer: els sons més grans es llegeixen mapats des de disc")
+    args = parser.parse_args()
+
+    if args.renderitzar:
+        escaleta = Path(args.renderitzar)
+        cfg = ConfiguracioMixer(frequencia=args.frequencia, llindar_flux_mb=args.llindar_flux_mb)
+        resultat = renderitzar_escaleta(escaleta, Path(args.wav) if args.wav else escaleta.with_suffix(".wav"), cfg)
+        print(json.dumps(resultat, indent=2, ensure_ascii=False))
+        return
+
     # comprova si som admin per a mostrar missatge; no fem obligatori però informem
     is_admin = False
     try:
@@ -872,8 +4618,11 @@ def main():
     if not is_admin:
         LOG.info("Alerta: l'aplicació no s'està executant com a Administrador. Les tecles globals podrien no funcionar.")
 
+    marcar_fase("moduls")
     root = tk.Tk()
     app = BotoneraApp(root)
+    if args.control_remot:
+        app.iniciar_control_remot(args.host, args.port_http, args.port_udp, args.token)
     root.mainloop()
 
 
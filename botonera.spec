@@ -6,7 +6,7 @@ a = Analysis(
     pathex=[],
     binaries=[],
     datas=[('perfils', 'perfils'), ('enregistraments', 'enregistraments')],
-    hiddenimports=[],
+    hiddenimports=['pygame', 'keyboard', 'numpy', 'sounddevice', 'soundfile'],  # s'importen de manera mandrosa
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
@@ -0,0 +1,50 @@
+"""L'índex del llançador veu els arxius nous de les subcarpetes."""
+
+import tempfile
+import unittest
+from pathlib import Path
+
+import botonera
+
+
+def app_de_cerca(carpeta: Path) -> botonera.BotoneraApp:
+    app = botonera.BotoneraApp.__new__(botonera.BotoneraApp)
+    app.totes_les_configuracions = [botonera.ButtonConfig(id=1, nom="Gong", arxiu=str(carpeta / "gong.wav"))]
+    app.configs_efimeres = {}
+    app.index_cerca = None
+    app._signatura_cerca = None
+    app._carpetes_cerca = lambda: [carpeta]
+    app.carregar_totes_les_pagines = lambda: None
+    return app
+
+
+class ProvaIndexCerca(unittest.TestCase):
+    def setUp(self):
+        carpeta = tempfile.TemporaryDirectory()
+        self.addCleanup(carpeta.cleanup)
+        self.carpeta = Path(carpeta.name)
+        (self.carpeta / "efectes").mkdir()
+        (self.carpeta / "gong.wav").touch()
+        (self.carpeta / "efectes" / "pluja.wav").touch()
+        self.app = app_de_cerca(self.carpeta)
+
+    def noms(self):
+        return {Path(c.arxiu).name for c in self.app.configs_efimeres.values()}
+
+    def test_arxiu_nou_en_una_subcarpeta(self):
+        self.app._actualitzar_index_cerca()
+        self.assertEqual(self.noms(), {"pluja.wav"})  # gong.wav ja té botó
+        entrades = self.app.index_cerca.entrades
+
+        self.app._actualitzar_index_cerca()
+        self.assertIs(self.app.index_cerca.entrades, entrades)  # res no ha canviat: no es reconstrueix
+
+        (self.carpeta / "efectes" / "trons.mp3").touch()
+        (self.carpeta / "efectes" / "pluja.wav").rename(self.carpeta / "efectes" / "pluja forta.wav")
+        self.app._actualitzar_index_cerca()
+        self.assertEqual(self.noms(), {"pluja forta.wav", "trons.mp3"})
+        self.assertEqual(len(self.app.index_cerca.entrades), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,20 @@
+"""Compatibilitat de ButtonConfig amb perfils desats per versions anteriors."""
+
+import unittest
+
+import botonera
+
+
+class ProvaButtonConfig(unittest.TestCase):
+    def test_perfil_antic_no_activa_la_normalitzacio(self):
+        cfg = botonera.ButtonConfig.from_dict({"id": 3, "nom": "Gong", "arxiu": "sons/gong.wav"})
+        self.assertFalse(cfg.normalitzar)
+
+    def test_anada_i_tornada_conserva_la_normalitzacio(self):
+        cfg = botonera.ButtonConfig(id=3)
+        self.assertTrue(cfg.normalitzar)
+        self.assertTrue(botonera.ButtonConfig.from_dict(cfg.to_dict()).normalitzar)
+
+
+if __name__ == "__main__":
+    unittest.main()
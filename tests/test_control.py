@@ -0,0 +1,161 @@
+"""El servidor de control remot, amb un client HTTP i UDP local sobre ports efímers."""
+
+import http.client
+import json
+import socket
+import struct
+import threading
+import time
+import unittest
+
+import botonera
+
+
+class DespatxadorFals:
+    def __init__(self):
+        self.observadors = []
+
+    def ids_sonant(self):
+        return set()
+
+
+class AppFalsa:
+    def __init__(self):
+        self.despatxador = DespatxadorFals()
+        self.configs_per_id = {
+            1: botonera.ButtonConfig(id=1, nom="Gong", arxiu="sons/gong.wav"),
+            2: botonera.ButtonConfig(id=2, nom="Aplaudiments", arxiu="sons/aplaudiments.wav"),
+        }
+        self.disparats = []
+        self.aturat = threading.Event()
+
+    def _config_per_id(self, id_boto):
+        return self.configs_per_id.get(id_boto)
+
+    def _play_by_config(self, cfg):
+        self.disparats.append(cfg.id)
+
+    def _executar_a_ui(self, funcio):
+        funcio()
+
+    def parar_tots_els_sons(self):
+        self.aturat.set()
+
+    def fondre_tots_els_sons(self):
+        pass
+
+    def get_volum_actual(self):
+        return 0.8
+
+
+def osc(adreca: str, tipus: str, *dades: bytes) -> bytes:
+    def cadena(text: str) -> bytes:
+        b = text.encode("utf-8") + b"\0"
+        return b + b"\0" * (-len(b) % 4)
+    return cadena(adreca) + cadena("," + tipus) + b"".join(dades)
+
+
+class ProvaControl(unittest.TestCase):
+    token = None
+
+    def setUp(self):
+        self.app = AppFalsa()
+        self.servidor = botonera.ServidorControl(self.app, "127.0.0.1", 0, 0, self.token)
+        self.servidor.iniciar()
+        self.addCleanup(self.servidor.aturar)
+        self.udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.addCleanup(self.udp.close)
+
+    def peticio(self, metode, cami, capcaleres=None):
+        connexio = http.client.HTTPConnection("127.0.0.1", self.servidor.port_http, timeout=5)
+        self.addCleanup(connexio.close)
+        connexio.request(metode, cami, headers=capcaleres or {})
+        resposta = connexio.getresponse()
+        return resposta, json.loads(resposta.read())
+
+    def enviar_udp(self, dades: bytes):
+        self.udp.sendto(dades, ("127.0.0.1", self.servidor.port_udp))
+
+    def esperar_disparats(self, n: int):
+        limit = time.monotonic() + 2
+        while len(self.app.disparats) < n and time.monotonic() < limit:
+            time.sleep(0.01)
+        return self.app.disparats
+
+
+class ProvaHttp(ProvaControl):
+    def test_les_accions_van_per_post(self):
+        resposta, cos = self.peticio("POST", "/disparar/gong")
+        self.assertEqual((resposta.status, cos["id"]), (200, 1))
+        self.assertIsNone(resposta.getheader("Access-Control-Allow-Origin"))
+
+        resposta, _cos = self.peticio("GET", "/disparar/1")
+        self.assertEqual(resposta.status, 405)
+        self.assertEqual(resposta.getheader("Allow"), "POST")
+        self.assertEqual(self.app.disparats, [1])
+
+    def test_estat_per_get(self):
+        resposta, cos = self.peticio("GET", "/estat")
+        self.assertEqual((resposta.status, cos["volum"]), (200, 80))
+
+    def test_un_altre_origen_es_rebutja(self):
+        resposta, _cos = self.peticio("POST", "/aturar", {"Origin": "http://pagina.example"})
+        self.assertEqual(resposta.status, 403)
+        self.assertFalse(self.app.aturat.is_set())
+
+    def test_esdeveniments(self):
+        connexio = http.client.HTTPConnection("127.0.0.1", self.servidor.port_http, timeout=5)
+        self.addCleanup(connexio.close)
+        connexio.request("GET", "/esdeveniments")
+        resposta = connexio.getresponse()
+        self.assertEqual(resposta.getheader("Content-Type"), "text/event-stream")
+        self.assertEqual(resposta.fp.readline(), b"event: estat\n")
+        resposta.fp.readline()
+        resposta.fp.readline()
+        for observador in self.app.despatxador.observadors:
+            observador(2, True)
+        self.assertEqual(resposta.fp.readline(), b"event: boto\n")
+        self.assertEqual(json.loads(resposta.fp.readline()[5:]), {"id": 2, "sonant": True})
+
+
+class ProvaUdp(ProvaControl):
+    def test_text_i_osc(self):
+        self.enviar_udp(b"/disparar 1\ndisparar Aplaudiments")
+        self.enviar_udp(osc("/disparar", "i", struct.pack(">i", 2)))
+        self.assertEqual(self.esperar_disparats(3), [1, 2, 2])
+
+    def test_un_osc_truncat_s_ignora(self):
+        self.enviar_udp(osc("/volum", "f", b"\0\0"))
+        self.enviar_udp(osc("/disparar", "i", b"\0"))
+        self.enviar_udp(b"/disparar 1")
+        self.assertEqual(self.esperar_disparats(1), [1])
+
+    def test_llegir_osc_rebutja_arguments_truncats(self):
+        for tipus in "if":
+            with self.assertRaises(ValueError):
+                botonera._llegir_osc(osc("/volum", tipus, b"\0\0"))
+
+
+class ProvaTestimoni(ProvaControl):
+    token = "secret"
+
+    def test_http_amb_testimoni(self):
+        resposta, _cos = self.peticio("POST", "/disparar/1")
+        self.assertEqual(resposta.status, 401)
+        resposta, _cos = self.peticio("POST", "/disparar/1", {"Authorization": "Bearer secret"})
+        self.assertEqual(resposta.status, 200)
+        resposta, _cos = self.peticio("GET", "/estat?token=secret")
+        self.assertEqual(resposta.status, 200)
+        self.assertEqual(self.app.disparats, [1])
+
+    def test_udp_amb_testimoni(self):
+        self.enviar_udp(b"/disparar 1")
+        self.enviar_udp(b"/altre/disparar 1")
+        self.enviar_udp(b"/secret/disparar 2")
+        self.assertEqual(self.esperar_disparats(1), [2])
+        time.sleep(0.1)
+        self.assertEqual(self.app.disparats, [2])
+
+
+if __name__ == "__main__":
+    unittest.main()
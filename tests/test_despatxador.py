@@ -0,0 +1,185 @@
+"""El despatxador d'àudio: disparaments pendents de precàrrega i errors de la sortida."""
+
+import tempfile
+import threading
+import unittest
+from concurrent.futures import Future
+from pathlib import Path
+from unittest import mock
+
+import botonera
+
+
+class SortidaFalsa:
+    """Sortida sense àudio: només recorda quines veus sonen."""
+
+    capacitat = 8
+
+    def __init__(self):
+        self.sonants = set()
+        self.engegades = 0
+
+    def reproduir(self, _mostra, _guany, _volum, _bucle, _fosa_ms):
+        self.engegades += 1
+        self.sonants.add(self.engegades)
+        return self.engegades
+
+    def sonant(self, handle):
+        return handle in self.sonants
+
+    def aturar(self, handle, _fosa_ms=0):
+        self.sonants.discard(handle)
+
+    def durada(self, _mostra):
+        return 1.0
+
+    def ocupacio(self):
+        return len(self.sonants), self.capacitat
+
+    def alimentar(self, _veus):
+        return None
+
+    def canviar_volum(self, _volum, _veus):
+        pass
+
+    def aturar_tot(self):
+        self.sonants.clear()
+
+    def tancar(self):
+        pass
+
+
+class SortidaQueFalla(SortidaFalsa):
+    """La primera alimentació llança una excepció, com un memmap il·legible."""
+
+    def __init__(self):
+        super().__init__()
+        self.errors = 1
+
+    def alimentar(self, _veus):
+        if self.errors:
+            self.errors -= 1
+            raise OSError("lectura fallida")
+        return None
+
+
+class CacheFalsa:
+    def __init__(self):
+        self.precarrega = None
+
+    def pendent(self, _cami):
+        return self.precarrega
+
+    def conte(self, _cami):
+        return True
+
+    def obtenir(self, _cami):
+        return object()
+
+
+class AppFalsa:
+    def __init__(self, cfg: botonera.ButtonConfig):
+        self.cfg = cfg
+        self.cache_mostres = CacheFalsa()
+
+    def _config_per_id(self, _id_boto):
+        return self.cfg
+
+    def get_volum_actual(self):
+        return 1.0
+
+    def _executar_a_ui(self, _funcio):
+        pass
+
+
+class ProvaDespatxador(unittest.TestCase):
+    """Un despatxador de debò, amb el seu fil, davant d'una sortida i una aplicació falses."""
+
+    sortida_class = SortidaFalsa
+
+    def setUp(self):
+        carpeta = tempfile.TemporaryDirectory()
+        self.addCleanup(carpeta.cleanup)
+        for nom, valor in (("MIXER_OK", True), ("ESCALETES_DIR", Path(carpeta.name))):
+            patcher = mock.patch.object(botonera, nom, valor)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.app = AppFalsa(botonera.ButtonConfig(id=5, arxiu="sons/gong.wav", mode="commutar", normalitzar=False))
+        self.sortida = self.sortida_class()
+        self.despatxador = botonera.DespatxadorAudio(self.app, self.sortida)
+        self.addCleanup(self.despatxador.tancar)
+
+    def esperar(self):
+        """Espera que el fil d'àudio hagi processat tot el que hi ha a la cua."""
+        fet = threading.Event()
+        self.despatxador.executar(fet.set)
+        self.assertTrue(fet.wait(2))
+
+    def acabar_precarrega(self, precarrega: Future):
+        # Com CacheMostres: primer deixa de ser pendent i després s'avisa qui l'esperava
+        self.app.cache_mostres.precarrega = None
+        precarrega.set_result(None)
+        self.esperar()
+
+
+class ProvaDisparamentPendent(ProvaDespatxador):
+    def test_pulsacions_repetides_disparen_un_sol_cop(self):
+        precarrega = Future()
+        self.app.cache_mostres.precarrega = precarrega
+        self.despatxador.disparar(5)
+        self.despatxador.disparar(5)
+        self.esperar()
+        self.acabar_precarrega(precarrega)
+
+        self.assertEqual(self.sortida.engegades, 1)
+        self.assertEqual(len(self.sortida.sonants), 1)
+
+    def test_una_pulsacio_abans_del_disparament_encuat_el_deixa_sense_efecte(self):
+        precarrega = Future()
+        self.app.cache_mostres.precarrega = precarrega
+        self.despatxador.disparar(5)
+        self.esperar()
+        # La precàrrega ja no és pendent però el disparament encara no s'ha encuat
+        self.app.cache_mostres.precarrega = None
+        self.despatxador.disparar(5)
+        self.esperar()
+        precarrega.set_result(None)
+        self.esperar()
+
+        self.assertEqual(self.sortida.engegades, 1)
+        self.assertEqual(len(self.sortida.sonants), 1)
+
+    def test_una_precarrega_nova_torna_a_esperar(self):
+        primera = Future()
+        self.app.cache_mostres.precarrega = primera
+        self.despatxador.disparar(5)
+        self.esperar()
+        self.acabar_precarrega(primera)
+        self.despatxador.executar(lambda: self.despatxador._acabar_boto(5))
+
+        segona = Future()
+        self.app.cache_mostres.precarrega = segona
+        self.despatxador.disparar(5)
+        self.esperar()
+        self.acabar_precarrega(segona)
+
+        self.assertEqual(self.sortida.engegades, 2)
+
+
+class ProvaBucle(ProvaDespatxador):
+    sortida_class = SortidaQueFalla
+
+    def test_un_error_de_la_sortida_no_atura_el_fil(self):
+        with self.assertLogs("Botonera", "ERROR"):
+            self.despatxador.disparar(5)  # programa una alimentació, que falla
+            self.esperar()
+        self.assertEqual(self.sortida.errors, 0)
+
+        self.despatxador.executar(lambda: self.despatxador._acabar_boto(5))  # sense veus, el proper disparament engega
+        self.despatxador.disparar(5)
+        self.esperar()
+        self.assertTrue(self.despatxador._fil.is_alive())
+        self.assertEqual(self.sortida.engegades, 2)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,150 @@
+"""El diari d'autodesat ha de guardar la configuració del botó després de tots els canvis."""
+
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import botonera
+
+
+class Camp:
+    """Substitut mínim d'un widget de Tk: només el valor que en llegeix SoundButton."""
+
+    def __init__(self, valor=None):
+        self.valor = valor
+        self.opcions = {}
+
+    def get(self):
+        return self.valor
+
+    def config(self, **opcions):
+        self.opcions.update(opcions)
+
+    def delete(self, *_args):
+        self.valor = ""
+
+    def insert(self, _posicio, text):
+        self.valor = text
+
+    def destroy(self):
+        pass
+
+
+class AppDiari:
+    def __init__(self, diari: botonera.DiariPerfil):
+        self.diari = diari
+        self.totes_les_configuracions = []
+        self.cache_mostres = botonera.CacheMostres(0)
+
+    def registrar_canvi(self, cfg):
+        self.diari.afegir(cfg)
+
+    def invalidar_cerca(self):
+        pass
+
+    def precarregar_boto(self, _boto):
+        pass
+
+    def analitzar_loudness(self, _configs):
+        pass
+
+    def refrescar_hotkeys(self):
+        pass
+
+
+def boto_de_prova(app: AppDiari) -> botonera.SoundButton:
+    boto = botonera.SoundButton.__new__(botonera.SoundButton)
+    boto.app = app
+    boto.config = botonera.ButtonConfig(id=7)
+    boto.is_playing = False
+    boto._signatura = boto.signatura()
+    boto.top_config = Camp()
+    for nom in ("frame", "label_emoji", "label_nom", "label_carrega", "label_tecla"):
+        setattr(boto, nom, Camp())
+    return boto
+
+
+class ProvaDiari(unittest.TestCase):
+    def setUp(self):
+        carpeta = tempfile.TemporaryDirectory()
+        self.addCleanup(carpeta.cleanup)
+        self.carpeta = Path(carpeta.name)
+        self.diari = botonera.DiariPerfil(self.carpeta / "perfil.json")
+        self.boto = boto_de_prova(AppDiari(self.diari))
+
+    def test_assignar_arxiu_desa_el_nom_nou(self):
+        arxiu = self.carpeta / "aplaudiments.wav"
+        with mock.patch.object(botonera.filedialog, "askopenfilename", return_value=str(arxiu)):
+            self.boto.assignar_arxiu()
+        canvis = self.diari.llegir()
+        self.assertEqual(len(canvis), 1)
+        self.assertEqual(canvis[-1].arxiu, str(arxiu))
+        self.assertEqual(canvis[-1].nom, "aplaudiments")
+
+    def test_desar_configuracio_desa_tots_els_camps(self):
+        b = self.boto
+        b.combo_emoji = Camp("🎉")
+        b.entry_nom = Camp("Festa")
+        b.combo_color = Camp(next(iter(botonera.PALETA_COLORS_DICT)))
+        b.scale_guany = Camp(80)
+        b.var_normalitzar = Camp(False)
+        b.var_tecla_global = Camp(b.config.tecla_global)
+        b.combo_mode = Camp(botonera.MODES_REPRODUCCIO["polifonic"])
+        b.spin_max_veus = Camp("3")
+        b.spin_fosa_entrada = Camp("200")
+        b.spin_fosa_sortida = Camp("500")
+        b.entry_grup = Camp("musica")
+        b.desar_configuracio()
+
+        cfg = self.diari.llegir()[-1]
+        self.assertEqual((cfg.emoji, cfg.nom, cfg.color), ("🎉", "Festa", next(iter(botonera.PALETA_COLORS_DICT.values()))))
+        self.assertAlmostEqual(cfg.guany, 0.8)
+        self.assertFalse(cfg.normalitzar)
+        self.assertEqual((cfg.mode, cfg.max_veus, cfg.fosa_entrada_ms, cfg.fosa_sortida_ms, cfg.grup),
+                         ("polifonic", 3, 200, 500, "musica"))
+
+
+class ProvaArxiuDiari(unittest.TestCase):
+    def setUp(self):
+        carpeta = tempfile.TemporaryDirectory()
+        self.addCleanup(carpeta.cleanup)
+        self.diari = botonera.DiariPerfil(Path(carpeta.name) / "perfil.json")
+
+    def test_anada_i_tornada(self):
+        canvis = [botonera.ButtonConfig(id=1, nom="Gong", arxiu="sons/gong.wav", guany=0.5),
+                  botonera.ButtonConfig(id=2, nom="Ploure", mode="polifonic", pagina=3, tecla_assignada="ctrl+1"),
+                  botonera.ButtonConfig(id=1, nom="Gong fort", arxiu="sons/gong.wav")]
+        for cfg in canvis:
+            self.diari.afegir(cfg)
+        self.assertEqual(self.diari.cami.name, "perfil.json.diari")
+        self.assertEqual([c.to_dict() for c in self.diari.llegir()], [c.to_dict() for c in canvis])
+
+        self.diari.esborrar()
+        self.assertEqual(self.diari.llegir(), [])
+        self.diari.esborrar()  # esborrar un diari que no hi és no falla
+
+    def test_una_linia_tallada_s_ignora(self):
+        self.diari.afegir(botonera.ButtonConfig(id=1, nom="Gong"))
+        with open(self.diari.cami, "a", encoding="utf-8") as f:
+            f.write('{"config": {"id": 2, "no')  # una caiguda a mitja escriptura
+        with self.assertLogs("Botonera", "WARNING"):
+            canvis = self.diari.llegir()
+        self.assertEqual([c.nom for c in canvis], ["Gong"])
+
+
+class ProvaRedibuixat(unittest.TestCase):
+    def test_boto_editat_in_situ_es_buida_en_canviar_de_configuracio(self):
+        boto = boto_de_prova(AppDiari(botonera.DiariPerfil(Path(tempfile.gettempdir()) / "no_es_desa.json")))
+        boto.entry_nom = Camp("")
+        with mock.patch.object(botonera.filedialog, "askopenfilename", return_value="gong.wav"), \
+                mock.patch.object(botonera.DiariPerfil, "afegir"):
+            boto.assignar_arxiu()
+        self.assertEqual(boto.label_nom.opcions["text"], "gong")
+
+        self.assertTrue(boto.actualitzar(botonera.ButtonConfig(id=99)))
+        self.assertEqual(boto.label_nom.opcions["text"], "Buit")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,130 @@
+"""L'escaleta del show i la seva mescla fora de línia."""
+
+import json
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+import numpy as np
+import soundfile as sf
+
+import botonera
+
+FREQUENCIA = 8000  # 8 frames per ms: els temps de l'escaleta cauen en frames exactes
+
+
+class ProvaEscaleta(unittest.TestCase):
+    def setUp(self):
+        carpeta = tempfile.TemporaryDirectory()
+        self.addCleanup(carpeta.cleanup)
+        self.carpeta = Path(carpeta.name)
+        self.cfg = botonera.ConfiguracioMixer(frequencia=FREQUENCIA)
+
+    def so(self, nom: str, frames: int, valor: float) -> str:
+        cami = self.carpeta / nom
+        sf.write(str(cami), np.full((frames, 2), valor, dtype=np.float32), FREQUENCIA, subtype="FLOAT")
+        return str(cami)
+
+    def escaleta(self, *esdeveniments, volum: float = 1.0) -> Path:
+        cami = self.carpeta / ("show" + botonera.EXTENSIO_ESCALETA)
+        linies = [{"versio": botonera.VERSIO_ESCALETA, "volum": volum}] + list(esdeveniments)
+        cami.write_text("".join(json.dumps(e) + "\n" for e in linies), encoding="utf-8")
+        return cami
+
+    def renderitzar(self, escaleta: Path, **kwargs):
+        desti = self.carpeta / "mescla.wav"
+        resultat = botonera.renderitzar_escaleta(escaleta, desti, self.cfg, **kwargs)
+        dades, sr = sf.read(str(desti), dtype="float32")
+        self.assertEqual(sr, FREQUENCIA)
+        return resultat, dades
+
+
+class ProvaRender(ProvaEscaleta):
+    def show(self) -> Path:
+        return self.escaleta(
+            ["a", 0, self.so("gong.wav", 4000, 0.25)],
+            [0, "+", 1, 0, 1, 0.5, 0, 0],  # 0-500 ms, a mig guany
+            ["a", 1, self.so("pluja.wav", 100, 0.1)],
+            [250, "+", 2, 1, 2, 1.0, 1, 0],  # bucle des dels 250 ms
+            ["a", 2, str(self.carpeta / "no_hi_es.wav")],
+            [300, "+", 3, 2, 3, 1.0, 0, 0],
+            [750, "v", 0.5],
+            [1000, "-", 2, 0],
+        )
+
+    def test_mescla_guanys_bucles_i_volum(self):
+        resultat, dades = self.renderitzar(self.show())
+        self.assertEqual(len(dades), 8000)
+        self.assertEqual((resultat["durada_s"], resultat["veus"]), (1.0, 3))
+        self.assertEqual(resultat["omesos"], [str(self.carpeta / "no_hi_es.wav")])
+        for inici, fi, esperat in ((0, 2000, 0.125), (2000, 4000, 0.225), (4000, 6000, 0.1), (6000, 8000, 0.05)):
+            np.testing.assert_allclose(dades[inici:fi], esperat, atol=1e-3, err_msg=f"frames {inici}-{fi}")
+
+    def test_el_resultat_no_depen_de_la_mida_del_tros(self):
+        _resultat, per_defecte = self.renderitzar(self.show())
+        _resultat, petit = self.renderitzar(self.show(), frames_tros=botonera.FRAMES_PER_BUFFER)
+        np.testing.assert_array_equal(petit, per_defecte)
+
+    def test_foses(self):
+        escaleta = self.escaleta(
+            ["a", 0, self.so("gong.wav", 8000, 0.5)],
+            [0, "+", 1, 0, 1, 1.0, 0, 125],  # fade-in de 1000 frames
+            [500, "-", 1, 250],  # fade-out de 2000 frames des del frame 4000
+        )
+        _resultat, dades = self.renderitzar(escaleta)
+        self.assertEqual(len(dades), 6000)
+        esquerre = dades[:, 0]
+        self.assertTrue((np.diff(esquerre[:1000]) >= 0).all())
+        np.testing.assert_allclose(esquerre[1000:4000], 0.5, atol=1e-3)
+        self.assertTrue((np.diff(esquerre[4000:]) <= 0).all())
+        np.testing.assert_allclose(esquerre[[500, 5000]], 0.25, atol=1e-3)
+        self.assertLess(esquerre[-1], 0.001)
+
+    def test_el_limitador_no_deixa_saturar(self):
+        so = self.so("fort.wav", 8000, 0.9)
+        escaleta = self.escaleta(["a", 0, so], [0, "+", 1, 0, 1, 1.0, 0, 0], [0, "+", 2, 0, 2, 1.0, 0, 0])
+        _resultat, dades = self.renderitzar(escaleta)
+        self.assertLessEqual(np.abs(dades).max(), botonera.MotorMescla.SOSTRE + 1e-3)
+
+
+class ProvaRegistre(ProvaEscaleta):
+    def test_el_registre_es_llegeix_tal_com_s_ha_escrit(self):
+        registre = botonera.RegistreEscaleta(lambda: 0.8, self.carpeta)
+        veu = registre.inici(time.perf_counter(), "sons/gong.wav", 4, 0.5, True, 100)
+        registre.inici(time.perf_counter(), "sons/gong.wav", 5, 1.0, False, 0)
+        registre.volum(0.6)
+        registre.aturar(veu, 200)
+        registre.tancar()
+
+        capcalera, veus, volums = botonera.llegir_escaleta(registre.cami, 1000)
+        self.assertEqual(capcalera["volum"], 0.8)
+        self.assertEqual([v for _, v in volums], [0.8, 0.6])
+        self.assertEqual([(v.arxiu, v.guany, v.bucle) for v in veus],
+                         [("sons/gong.wav", 0.5, True), ("sons/gong.wav", 1.0, False)])
+        self.assertEqual((veus[0].fosa_entrada, veus[0].fosa_sortida), (100, 200))
+        self.assertIsNotNone(veus[1].parada)  # el tancament atura el que encara sona
+
+    def test_una_sessio_sense_sons_no_deixa_escaleta(self):
+        registre = botonera.RegistreEscaleta(lambda: 1.0, self.carpeta / "escaletes")
+        registre.volum(0.5)
+        registre.tancar()
+        self.assertIsNone(registre.cami)
+        self.assertFalse((self.carpeta / "escaletes").exists())
+
+    def test_una_linia_a_mitges_s_ignora(self):
+        escaleta = self.escaleta(["a", 0, "sons/gong.wav"], [0, "+", 1, 0, 1, 1.0, 0, 0])
+        with open(escaleta, "a", encoding="utf-8") as f:
+            f.write('[120,"+",2,')
+        _capcalera, veus, _volums = botonera.llegir_escaleta(escaleta, 1000)
+        self.assertEqual(len(veus), 1)
+
+    def test_rebutja_una_versio_futura(self):
+        cami = self.carpeta / ("futur" + botonera.EXTENSIO_ESCALETA)
+        cami.write_text(json.dumps({"versio": botonera.VERSIO_ESCALETA + 1}) + "\n", encoding="utf-8")
+        with self.assertRaises(ValueError):
+            botonera.llegir_escaleta(cami, 1000)
+
+
+if __name__ == "__main__":
+    unittest.main()
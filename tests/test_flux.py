@@ -0,0 +1,46 @@
+"""Sons llargs en flux amb pygame: el fade-in continua de tros en tros."""
+
+import os
+import unittest
+
+import numpy as np
+
+import botonera
+
+
+class ProvaFosaEnFlux(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+        try:
+            botonera.pygame.mixer.init(frequency=44100, size=-16, channels=2)
+        except Exception as e:
+            raise unittest.SkipTest(f"pygame.mixer no s'ha pogut iniciar: {e}")
+        cls.addClassCleanup(botonera.pygame.mixer.quit)
+
+    def trossos(self, fosa_ms: int, segons: float):
+        flux = botonera.MostraFlux(np.full((int(segons * 44100), 2), 10000, dtype=np.int16), 44100)
+        veu = botonera.VeuPygame(None, None, 1.0, flux=flux, fosa_frames=fosa_ms * 44100 // 1000)
+        sortida = botonera.SortidaPygame()
+        trossos = []
+        while (so := sortida._tros(veu)) is not None:
+            trossos.append(np.frombuffer(so.get_raw(), dtype=np.int16).reshape(-1, 2)[:, 0])
+        return np.concatenate(trossos), len(trossos)
+
+    def test_la_fosa_passa_d_un_tros_a_l_altre(self):
+        senyal, n = self.trossos(8000, 12)
+        self.assertEqual(n, 3)
+        frames_tros = int(botonera.SEGONS_TROS_FLUX * 44100)
+        # Al límit entre trossos la rampa continua: cap salt
+        self.assertLess(abs(int(senyal[frames_tros]) - int(senyal[frames_tros - 1])), 2)
+        self.assertAlmostEqual(senyal[4 * 44100] / 10000, 0.5, places=2)
+        self.assertEqual(senyal[0], 0)
+        self.assertTrue((senyal[8 * 44100:] == 10000).all())
+
+    def test_sense_fosa_els_trossos_no_canvien(self):
+        senyal, _n = self.trossos(0, 6)
+        self.assertTrue((senyal == 10000).all())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+"""El magatzem PCM dels sons llargs no creix sense límit."""
+
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+import soundfile as sf
+
+import botonera
+
+
+class ProvaMagatzemPCM(unittest.TestCase):
+    def setUp(self):
+        carpeta = tempfile.TemporaryDirectory()
+        self.addCleanup(carpeta.cleanup)
+        self.carpeta = Path(carpeta.name)
+        self.sons = []
+        for i in range(3):
+            cami = self.carpeta / f"so{i}.wav"
+            sf.write(str(cami), np.zeros((44100, 2), dtype=np.float32), 44100)
+            self.sons.append(cami)
+        # Cada còpia float32 d'un segon fa 352.800 bytes (més la capçalera): n'hi caben dues
+        self.magatzem = botonera.MagatzemPCM(self.carpeta / "pcm", pressupost_bytes=800_000)
+
+    def copies(self):
+        return sorted(self.magatzem.carpeta.glob("*.npy"))
+
+    def test_el_pressupost_esborra_la_copia_usada_fa_mes_temps(self):
+        self.magatzem.obtenir(self.sons[0], 44100, "float32")
+        self.magatzem.obtenir(self.sons[1], 44100, "float32")
+        for copia in self.copies():
+            os.utime(copia, (1, 1))  # totes dues velles...
+        self.magatzem.obtenir(self.sons[0], 44100, "float32")  # ...però el so 0 s'acaba de fer servir
+        self.magatzem.obtenir(self.sons[2], 44100, "float32")
+
+        restants = self.copies()
+        self.assertEqual(len(restants), 2)
+        prefixos = {p.name.split("_")[0] for p in restants}
+        self.assertNotIn(self.prefix(self.sons[1]), prefixos)
+
+    def test_netejar_esborra_les_copies_d_originals_esborrats(self):
+        self.magatzem.obtenir(self.sons[0], 44100, "float32")
+        self.magatzem.obtenir(self.sons[0], 44100, "int16")
+        self.magatzem.obtenir(self.sons[1], 44100, "float32")
+        (self.magatzem.carpeta / "mig.npy.tmp").write_bytes(b"x")
+        self.sons[0].unlink()
+
+        self.assertGreater(self.magatzem.netejar(), 0)
+        self.assertEqual([p.name.split("_")[0] for p in self.copies()], [self.prefix(self.sons[1])])
+        self.assertEqual(list(self.magatzem.carpeta.glob("*.tmp")), [])
+
+    @staticmethod
+    def prefix(cami: Path) -> str:
+        return botonera.hashlib.sha1(str(cami).encode("utf-8")).hexdigest()[:16]
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,46 @@
+"""El resum de forma d'ona de l'entrada té una mida fixa, duri el que duri l'enregistrament."""
+
+import unittest
+
+import numpy as np
+
+import botonera
+
+
+class ProvaMesuradorEntrada(unittest.TestCase):
+    def test_la_memoria_no_creix(self):
+        mesurador = botonera.MesuradorEntrada(columnes=64)
+        mins, maxs = mesurador._mins, mesurador._maxs
+        bloc = np.zeros((256, 1), dtype=np.float32)
+        for _ in range(10_000):
+            mesurador.afegir(bloc)
+        self.assertIs(mesurador._mins, mins)
+        self.assertIs(mesurador._maxs, maxs)
+        self.assertEqual(len(mesurador.forma_ona(1000)[0]), mesurador._columnes + (1 if mesurador._a_la_columna else 0))
+
+    def test_la_forma_d_ona_conserva_els_pics(self):
+        mesurador = botonera.MesuradorEntrada(columnes=16)
+        senyal = np.zeros(1000, dtype=np.float32)
+        senyal[137], senyal[800] = 0.9, -0.7
+        for valor in senyal:
+            mesurador.afegir(np.full((4, 1), valor, dtype=np.float32))
+        mins, maxs = mesurador.forma_ona(8)
+        self.assertEqual(len(mins), 8)
+        self.assertAlmostEqual(float(maxs.max()), 0.9, places=6)
+        self.assertAlmostEqual(float(mins.min()), -0.7, places=6)
+        # El pic positiu cau al primer quart del senyal i el negatiu, a l'últim
+        self.assertLess(int(np.argmax(maxs)), 3)
+        self.assertGreater(int(np.argmin(mins)), 5)
+
+    def test_retalls_i_nivells(self):
+        mesurador = botonera.MesuradorEntrada()
+        mesurador.afegir(np.full((8, 1), 1.0, dtype=np.float32))
+        mesurador.afegir(np.full((8, 1), 0.5, dtype=np.float32))
+        self.assertEqual(mesurador.retalls, 1)
+        pic, rms = mesurador.llegir_nivells()
+        self.assertEqual((pic, rms), (1.0, 0.5))
+        self.assertEqual(mesurador.llegir_nivells()[0], 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
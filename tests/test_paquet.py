@@ -0,0 +1,93 @@
+"""Exportar un perfil a paquet i tornar-lo a importar, sense la interfície."""
+
+import json
+import tempfile
+import unittest
+import zipfile
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import soundfile as sf
+
+import botonera
+
+
+class ProvaPaquet(unittest.TestCase):
+    def setUp(self):
+        carpeta = tempfile.TemporaryDirectory()
+        self.addCleanup(carpeta.cleanup)
+        self.carpeta = Path(carpeta.name)
+        for nom, valor in (("SCRIPT_DIR", self.carpeta), ("PAQUETS_DIR", self.carpeta / "paquets")):
+            patcher = mock.patch.object(botonera, nom, valor)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        (self.carpeta / "sons").mkdir()
+        self.gong = np.tile(np.linspace(-0.5, 0.5, 22050, dtype=np.float32)[:, None], (1, 2))
+        sf.write(str(self.carpeta / "sons" / "gong.wav"), self.gong, 22050, subtype="FLOAT")
+        sf.write(str(self.carpeta / "sons" / "pluja.wav"), np.zeros((4410, 2), dtype=np.float32), 44100)
+
+        self.index = botonera.IndexLoudness(self.carpeta / "loudness.json")
+        self.index.registrar(self.carpeta / "sons" / "gong.wav", -6.0, -18.5)
+        self.configs = [
+            botonera.ButtonConfig(id=0, nom="Gong", arxiu="sons/gong.wav", guany=0.5),
+            botonera.ButtonConfig(id=1, nom="Gong fort", arxiu="sons/gong.wav", pagina=1),
+            botonera.ButtonConfig(id=2, nom="Pluja", arxiu="sons/pluja.wav", mode="bucle"),
+            botonera.ButtonConfig(id=3),
+        ]
+        self.dades = botonera.dades_perfil(botonera.FORMAT_PER_DEFECTE, 64, botonera.ConfiguracioMixer(), 1, 4)
+
+    def exportar(self, motor: str) -> Path:
+        cami = self.carpeta / ("perfil" + botonera.EXTENSIO_PAQUET)
+        cfg_mixer = botonera.ConfiguracioMixer(motor=motor)
+        self.assertEqual(botonera.exportar_paquet(self.dades, self.configs, cami, cfg_mixer, self.index), 2)
+        return cami
+
+    def test_el_paquet_no_es_comprimeix(self):
+        with zipfile.ZipFile(self.exportar("pygame")) as zf:
+            self.assertEqual({i.compress_type for i in zf.infolist()}, {zipfile.ZIP_STORED})
+            self.assertEqual(sorted(zf.namelist()), ["perfil.json", "so/0000@44100.npy", "so/0001@44100.npy"])
+
+    def test_anada_i_tornada(self):
+        cami_perfil = botonera.importar_paquet(self.exportar("numpy"), self.index)
+        self.assertEqual(cami_perfil, self.carpeta / "paquets" / "perfil" / "perfil.json")
+
+        dades, configs, _lector = botonera.llegir_perfil(cami_perfil)
+        self.assertEqual(dades["pagina_actual"], 1)
+        self.assertNotIn("loudness", dades)
+        self.assertEqual([c.nom for c in configs], ["Gong", "Gong fort", "Pluja", "Buit"])
+        self.assertEqual(configs[0].arxiu, configs[1].arxiu)  # un sol arxiu per a dos botons
+        self.assertIsNone(configs[3].arxiu)
+        self.assertEqual((configs[0].guany, configs[1].pagina, configs[2].mode), (0.5, 1, "bucle"))
+
+        # La mostra ja és float32 estèreo a la freqüència de sortida i es llegeix mapada
+        dades_so, sr = botonera.llegir_mostra_paquet(botonera.resoldre_cami(configs[0].arxiu))
+        self.assertIsInstance(dades_so, np.memmap)
+        self.assertEqual((sr, dades_so.dtype, dades_so.shape), (44100, np.float32, (44100, 2)))
+        np.testing.assert_allclose(dades_so[::2], self.gong, atol=1e-4)
+
+        # El loudness viatja amb el paquet: el so importat no s'ha de tornar a analitzar
+        importat = self.index.consultar(botonera.resoldre_cami(configs[0].arxiu))
+        self.assertEqual((importat["pic_dbfs"], importat["lufs"]), (-6.0, -18.5))
+        self.assertIsNone(self.index.consultar(botonera.resoldre_cami(configs[2].arxiu)))
+        with open(self.index.cami, encoding="utf-8") as f:
+            self.assertIn(str(botonera.resoldre_cami(configs[0].arxiu)), json.load(f))
+
+    def test_pygame_exporta_int16(self):
+        with zipfile.ZipFile(self.exportar("pygame")) as zf:
+            with zf.open("so/0001@44100.npy") as f:
+                self.assertEqual(np.load(f).dtype, np.int16)
+
+    def test_importar_ignora_camins_de_fora(self):
+        cami = self.exportar("numpy")
+        with zipfile.ZipFile(cami, "a") as zf:
+            zf.writestr("so/../../fora.npy", b"x")
+            zf.writestr("altres/res.npy", b"x")
+        cami_perfil = botonera.importar_paquet(cami, self.index)
+        self.assertFalse((self.carpeta / "fora.npy").exists())
+        self.assertEqual(sorted(p.name for p in cami_perfil.parent.rglob("*") if p.is_file()),
+                         ["0000@44100.npy", "0001@44100.npy", "perfil.json"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+"""Desar i tornar a obrir perfils en els dos formats, sense la interfície."""
+
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+import botonera
+
+
+def configs_de_prova():
+    return [botonera.ButtonConfig(id=i, nom=f"So {i}", arxiu=f"sons/{i}.wav", pagina=i // 2) for i in range(6)]
+
+
+class ProvaPerfil(unittest.TestCase):
+    def setUp(self):
+        carpeta = tempfile.TemporaryDirectory()
+        self.addCleanup(carpeta.cleanup)
+        self.carpeta = Path(carpeta.name)
+        self.dades = botonera.dades_perfil(botonera.FORMAT_PER_DEFECTE, 64, botonera.ConfiguracioMixer(), 1, 6)
+
+    def test_json(self):
+        cami = self.carpeta / "perfil.json"
+        botonera.escriure_perfil(cami, self.dades, configs_de_prova())
+        dades, configs, lector = botonera.llegir_perfil(cami)
+        self.assertIsNone(lector)
+        self.assertEqual(dades["pagina_actual"], 1)
+        self.assertEqual([c.to_dict() for c in configs], [c.to_dict() for c in configs_de_prova()])
+
+    def test_compacte_llegeix_per_pagines(self):
+        cami = self.carpeta / ("perfil" + botonera.EXTENSIO_COMPACTA)
+        botonera.escriure_perfil(cami, self.dades, configs_de_prova())
+        dades, configs, lector = botonera.llegir_perfil(cami)
+        self.assertEqual(configs, [])
+        self.assertEqual(dades["seguent_id"], 6)
+        self.assertEqual(set(lector.pagines), {0, 1, 2})
+        self.assertEqual([c.id for c in lector.llegir_pagina(1)], [2, 3])
+
+    def test_compacte_copia_les_pagines_no_obertes(self):
+        original = self.carpeta / ("original" + botonera.EXTENSIO_COMPACTA)
+        botonera.escriure_perfil(original, self.dades, configs_de_prova())
+        lector = botonera.PerfilCompacte(original)
+
+        cami = self.carpeta / ("copia" + botonera.EXTENSIO_COMPACTA)
+        obertes = [c for c in configs_de_prova() if c.pagina == 0]
+        botonera.escriure_perfil(cami, self.dades, obertes, {p: lector.bloc(p) for p in (1, 2)})
+        _dades, _configs, copia = botonera.llegir_perfil(cami)
+        self.assertEqual([c.id for p in (0, 1, 2) for c in copia.llegir_pagina(p)], list(range(6)))
+
+    def test_compacte_conserva_tots_els_camps(self):
+        configs = [botonera.ButtonConfig(id=1, emoji="🎉", nom="Festa", arxiu="sons/festa.ogg", tecla_assignada="ctrl+f1",
+                                         guany=0.7, mode="polifonic", max_veus=3, grup="musica", fosa_entrada_ms=200,
+                                         fosa_sortida_ms=500, normalitzar=False, pagina=4, tecla_global=True)]
+        cami = self.carpeta / ("perfil" + botonera.EXTENSIO_COMPACTA)
+        botonera.escriure_perfil(cami, self.dades, configs)
+        dades, _configs, lector = botonera.llegir_perfil(cami)
+        self.assertEqual(dades, self.dades)
+        self.assertEqual([c.to_dict() for c in lector.llegir_pagina(4)], [c.to_dict() for c in configs])
+        self.assertEqual(list(self.carpeta.iterdir()), [cami])  # no queda cap temporal
+
+    def test_compacte_rebutja_un_altre_arxiu(self):
+        cami = self.carpeta / ("perfil" + botonera.EXTENSIO_COMPACTA)
+        cami.write_bytes(b"{}")
+        with self.assertRaises(ValueError):
+            botonera.llegir_perfil(cami)
+
+    def test_migra_un_perfil_antic(self):
+        cami = self.carpeta / "antic.json"
+        cami.write_text(json.dumps({"configuracions": [{"id": 0, "nom": "Gong"}]}), encoding="utf-8")
+        dades, configs, _lector = botonera.llegir_perfil(cami)
+        self.assertEqual((dades["versio"], dades["pagina_actual"]), (botonera.VERSIO_PERFIL, 0))
+        self.assertEqual((configs[0].nom, configs[0].pagina), ("Gong", 0))
+
+    def test_rebutja_una_versio_futura(self):
+        cami = self.carpeta / "futur.json"
+        cami.write_text(json.dumps({"versio": botonera.VERSIO_PERFIL + 1}), encoding="utf-8")
+        with self.assertRaises(ValueError):
+            botonera.llegir_perfil(cami)
+
+
+if __name__ == "__main__":
+    unittest.main()
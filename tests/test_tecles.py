@@ -0,0 +1,38 @@
+"""La forma canònica de les combinacions de tecles, que fa de clau de l'índex de tecles globals."""
+
+import unittest
+
+import botonera
+
+
+class ProvaNormalitzarTecla(unittest.TestCase):
+    def test_alies_i_majuscules(self):
+        self.assertEqual(botonera.normalitzar_tecla("Control + F5"), "ctrl+f5")
+        self.assertEqual(botonera.normalitzar_tecla("Escape"), "esc")
+        self.assertEqual(botonera.normalitzar_tecla("right alt+a"), "alt gr+a")
+
+    def test_els_modificadors_van_primer_en_ordre_fix(self):
+        self.assertEqual(botonera.normalitzar_tecla("shift+ctrl+1"), "ctrl+shift+1")
+        self.assertEqual(botonera.normalitzar_tecla("1+shift+ctrl"), "ctrl+shift+1")
+        self.assertEqual(botonera.normalitzar_tecla("win+alt+x"), "alt+windows+x")
+
+    def test_sense_repeticions(self):
+        self.assertEqual(botonera.normalitzar_tecla("ctrl+control+a+a"), "ctrl+a")
+
+    def test_la_tecla_mes(self):
+        self.assertEqual(botonera.normalitzar_tecla("+"), "plus")
+        self.assertEqual(botonera.normalitzar_tecla("ctrl++"), "ctrl+plus")
+
+    def test_es_idempotent(self):
+        for tecla in ("Control + F5", "shift+ctrl+1", "ctrl++", "Maj+Supr"):
+            canonica = botonera.normalitzar_tecla(tecla)
+            self.assertEqual(botonera.normalitzar_tecla(canonica), canonica)
+
+    def test_es_modificador(self):
+        self.assertTrue(botonera.es_modificador("Control"))
+        self.assertTrue(botonera.es_modificador("right shift"))
+        self.assertFalse(botonera.es_modificador("f5"))
+
+
+if __name__ == "__main__":
+    unittest.main()